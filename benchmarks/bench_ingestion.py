@@ -0,0 +1,141 @@
+"""Run the ingestion Cloud Function against the fixture server and an in-memory Pub/Sub
+
+The first run publishes everything in the (scaled) feeds; later runs
+measure the steady state where most events are unchanged. Raw payloads can
+be offloaded to a local content-addressed store and messages zstd-encoded
+to compare Pub/Sub bytes.
+
+A final check revises a few USGS events and fails their publish, then
+runs again and fails the suite unless those events are republished rather
+than hidden behind a 304 from the now-unchanged feed.
+
+    python benchmarks/bench_ingestion.py --usgs-features 5000 --eonet-events 500 --runs 3
+    python benchmarks/bench_ingestion.py --raw-data-store local --message-encoding zstd
+    python benchmarks/bench_ingestion.py --feeds usgs_all_hour,eonet,gdacs,tsunami
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from report import add_component_paths, emit, latency_summary, peak_rss_mb
+
+add_component_paths()
+
+from fakes import FixtureServer, InMemoryPublisher
+from feeds import DEFAULT_FEEDS
+from raw_payloads import decode_message
+
+
+def check_failed_publish_retried(server, ingestion, publisher, revised=2):
+    """Fail the publish of `revised` revised USGS events, then check the next run sends them"""
+    feed = json.loads(server.usgs)
+    event_ids = set()
+    for feature in feed['features'][:revised]:
+        feature['properties']['updated'] += 1
+        event_ids.add(f"usgs_{feature['id']}")
+    server.set_feed('usgs', feed)
+
+    publisher.reject = lambda data: decode_message(data)['event_id'] in event_ids
+    ingestion.ingest_disaster_data(None)
+    publisher.reject = None
+
+    before = len(publisher.messages)
+    ingestion.ingest_disaster_data(None)
+    retried = {decode_message(data)['event_id'] for _, data, _ in publisher.messages[before:]}
+    if retried != event_ids:
+        raise RuntimeError(f"Failed events not republished on the next run: {sorted(event_ids - retried)}")
+    return len(retried)
+
+
+def run(usgs_features=2000, eonet_events=200, runs=3, feed_latency_ms=50.0, publish_ms=0.0,
+        raw_data_store='inline', message_encoding='json', feeds=None):
+    server = FixtureServer(
+        latency_seconds=feed_latency_ms / 1000,
+        usgs_features=usgs_features,
+        eonet_events=eonet_events
+    ).start()
+
+    workdir = tempfile.mkdtemp(prefix='bench-ingestion-')
+    os.environ.update({
+        'GOOGLE_CLOUD_PROJECT': 'bench',
+        'PUBSUB_TOPIC': 'bench',
+        'USGS_API_BASE_URL': f"{server.url}/usgs",
+        'NASA_EONET_API_BASE_URL': f"{server.url}/eonet",
+        'GDACS_API_BASE_URL': f"{server.url}/gdacs",
+        'TSUNAMI_FEED_URL': f"{server.url}/tsunami/atom.xml",
+        'SEEN_EVENTS_PATH': os.path.join(workdir, 'seen_events.json'),
+        'RAW_DATA_STORE': raw_data_store,
+        'RAW_DATA_PATH': os.path.join(workdir, 'raw_payloads'),
+        'MESSAGE_ENCODING': message_encoding
+    })
+    if feeds:
+        os.environ['FEEDS'] = feeds
+    # Every run polls every feed; the scheduler's cadence is not what is measured here
+    os.environ['FEED_INTERVALS'] = ','.join(f"{name}=0" for name in (feeds or DEFAULT_FEEDS).split(','))
+    os.environ.pop('INGESTION_STATE_BUCKET', None)
+    # Lets the module-level PublisherClient be built without credentials; it is replaced below
+    os.environ.setdefault('PUBSUB_EMULATOR_HOST', 'localhost:8085')
+
+    import main as ingestion
+
+    publisher = InMemoryPublisher(publish_seconds=publish_ms / 1000)
+    ingestion.publisher = publisher
+    ingestion.topic_path = publisher.topic_path('bench', 'bench')
+
+    durations, published, published_bytes = [], [], []
+    for _ in range(runs):
+        before = len(publisher.messages)
+        start = time.perf_counter()
+        ingestion.ingest_disaster_data(None)
+        durations.append(time.perf_counter() - start)
+        published.append(len(publisher.messages) - before)
+        published_bytes.append(sum(len(data) for _, data, _ in publisher.messages[before:]))
+    failed_publish_retried = check_failed_publish_retried(server, ingestion, publisher)
+    server.stop()
+
+    feed_events = usgs_features + eonet_events
+    return {
+        'feed_events': feed_events,
+        'runs': runs,
+        'first_run_seconds': round(durations[0], 3),
+        'first_run_events_per_sec': round(feed_events / durations[0], 1),
+        'published_per_run': published,
+        'first_run_published_mb': round(published_bytes[0] / (1024 * 1024), 3),
+        'bytes_per_message': round(published_bytes[0] / max(published[0], 1), 1),
+        'run_latency': latency_summary(durations),
+        'feed_requests': {route: count for route, count in server.requests.items() if route != 'geocode'},
+        'feed_not_modified': server.not_modified,
+        'failed_publish_retried': failed_publish_retried,
+        'peak_rss_mb': round(peak_rss_mb(), 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--usgs-features', type=int, default=2000)
+    parser.add_argument('--eonet-events', type=int, default=200)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--feed-latency-ms', type=float, default=50.0)
+    parser.add_argument('--publish-ms', type=float, default=0.0)
+    parser.add_argument('--raw-data-store', choices=['inline', 'local'], default='inline')
+    parser.add_argument('--message-encoding', choices=['json', 'zstd'], default='json')
+    parser.add_argument('--feeds', help=f"Comma-separated feed adapters (default {DEFAULT_FEEDS})")
+    parser.add_argument('--output', help='Write the result as JSON')
+    args = parser.parse_args()
+
+    emit('ingestion', run(
+        usgs_features=args.usgs_features,
+        eonet_events=args.eonet_events,
+        runs=args.runs,
+        feed_latency_ms=args.feed_latency_ms,
+        publish_ms=args.publish_ms,
+        raw_data_store=args.raw_data_store,
+        message_encoding=args.message_encoding,
+        feeds=args.feeds
+    ), args.output)
+
+
+if __name__ == '__main__':
+    main()
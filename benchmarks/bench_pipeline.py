@@ -0,0 +1,170 @@
+"""Run the streaming pipeline's transforms on DirectRunner against local stand-ins
+
+A synthetic storm of Pub/Sub payloads goes through parse, dedup, geocoding
+(against the fixture server), demographics (a side input loaded from a
+SQLite BigQuery stand-in), scoring (FakeEndpoint or local model artifacts) and a
+SQLite sink. Reports events/sec, p50/p99 stage completion times (when each
+stage finished an event's bundle, relative to the previous stage; not
+per-event latency) and peak RSS.
+
+    python benchmarks/bench_pipeline.py --events 20000 --geocode-latency-ms 20
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from report import add_component_paths, emit, latency_summary, peak_rss_mb
+
+add_component_paths()
+
+import apache_beam as beam
+from apache_beam.options.pipeline_options import PipelineOptions
+
+import stamps
+import storm
+from fakes import FakeEndpoint, FixtureServer, SqliteBigQuery
+from pipeline import DeduplicateEvents, EnrichEvents, GeocodeEvents, ParseMessage, ScoreEvents
+from sinks import load_table_schema
+
+
+class WriteToStandIn(beam.DoFn):
+    """Buffered inserts of schema columns into the SQLite stand-in"""
+
+    def __init__(self, client, table, columns, batch_size=500):
+        self.client = client
+        self.table = table
+        self.columns = columns
+        self.batch_size = batch_size
+
+    def start_bundle(self):
+        self.rows = []
+
+    def process(self, event):
+        self.rows.append({column: event.get(column) for column in self.columns})
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def finish_bundle(self):
+        self.flush()
+
+    def flush(self):
+        if self.rows:
+            self.client.insert_rows_json(self.table, self.rows)
+            stamps.record('write', [row['event_id'] for row in self.rows])
+            self.rows = []
+
+
+def run(events=5000, duplicate_rate=0.1, geocode_latency_ms=0.0, demographics=20000,
+        scoring='fake', model_dir=None, enrich_batch_size=100, scoring_batch_size=64):
+    workdir = tempfile.mkdtemp(prefix='bench-pipeline-')
+    server = FixtureServer(latency_seconds=geocode_latency_ms / 1000).start()
+
+    bq = SqliteBigQuery(os.path.join(workdir, 'bigquery.db'))
+    bq.execute(
+        'CREATE TABLE demographics (latitude, longitude, population_density, '
+        'hospitals_count, schools_count, last_updated)'
+    )
+    bq.execute('INSERT INTO demographics VALUES (?, ?, ?, ?, ?, ?)', storm.demographics_rows(demographics))
+    columns = [field['name'] for field in load_table_schema()['fields']]
+    bq.execute(f'CREATE TABLE disaster_events ({", ".join(columns)})')
+
+    messages = storm.storm_messages(events, duplicate_rate=duplicate_rate)
+    stamps.reset()
+
+    options = PipelineOptions([
+        '--runner=DirectRunner',
+        '--direct_running_mode=in_memory',
+        '--direct_num_workers=1'
+    ])
+    pipeline = beam.Pipeline(options=options)
+    enriched = (
+        pipeline
+        | 'Storm' >> beam.Create(messages)
+        | 'Parse Messages' >> beam.ParDo(ParseMessage())
+        | 'Stamp Parse' >> beam.ParDo(stamps.Stamp('parse'))
+        | 'Deduplicate Events' >> DeduplicateEvents(ttl_seconds=172800)
+        | 'Stamp Dedup' >> beam.ParDo(stamps.Stamp('dedup'))
+        | 'Geocode Events' >> GeocodeEvents(
+            batch_size=enrich_batch_size,
+            geocoding_api_key='bench',
+            geocoding_url=f"{server.url}/geocode/json"
+        )
+        | 'Stamp Geocode' >> beam.ParDo(stamps.Stamp('geocode'))
+        | 'Enrich Events' >> EnrichEvents(table='bench.bench.demographics', refresh_seconds=0, bigquery_client=bq)
+        | 'Stamp Enrich' >> beam.ParDo(stamps.Stamp('enrich'))
+    )
+
+    stages = ['parse', 'dedup', 'geocode', 'enrich']
+    if scoring != 'none':
+        endpoint = FakeEndpoint() if scoring == 'fake' else None
+        enriched = (
+            enriched
+            | 'Calculate Impact Score' >> ScoreEvents(
+                batch_size=scoring_batch_size, endpoint=endpoint, model_dir=model_dir
+            )
+            | 'Stamp Score' >> beam.ParDo(stamps.Stamp('score'))
+        )
+        stages.append('score')
+    stages.append('write')
+
+    enriched | 'Write to Stand-in' >> beam.ParDo(WriteToStandIn(bq, 'disaster_events', columns))
+
+    start = time.perf_counter()
+    result = pipeline.run()
+    result.wait_until_finish()
+    seconds = time.perf_counter() - start
+    server.stop()
+
+    written = next(iter(bq.query('SELECT COUNT(*) AS n FROM disaster_events').result()))['n']
+    metrics = result.metrics().query()
+    counters = {counter.key.metric.name: counter.committed for counter in metrics['counters']}
+    distributions = {
+        distribution.key.metric.name: {
+            'count': distribution.committed.count,
+            'mean': round(distribution.committed.mean, 3),
+            'max': distribution.committed.max
+        }
+        for distribution in metrics['distributions'] if distribution.committed
+    }
+    completion_times = stamps.stage_completion_times(stages)
+    return {
+        'events': events,
+        'events_written': written,
+        'seconds': round(seconds, 3),
+        'events_per_sec': round(events / seconds, 1),
+        'stage_completion': {stage: latency_summary(values) for stage, values in completion_times.items()},
+        'geocode_requests': server.requests['geocode'],
+        'counters': counters,
+        'distributions': distributions,
+        'peak_rss_mb': round(peak_rss_mb(), 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--events', type=int, default=5000)
+    parser.add_argument('--duplicate-rate', type=float, default=0.1)
+    parser.add_argument('--geocode-latency-ms', type=float, default=0.0)
+    parser.add_argument('--demographics', type=int, default=20000)
+    parser.add_argument('--scoring', choices=['fake', 'local', 'none'], default='fake')
+    parser.add_argument('--model-dir', help='Model artifacts for --scoring local')
+    parser.add_argument('--enrich-batch-size', type=int, default=100)
+    parser.add_argument('--scoring-batch-size', type=int, default=64)
+    parser.add_argument('--output', help='Write the result as JSON')
+    args = parser.parse_args()
+
+    emit('pipeline', run(
+        events=args.events,
+        duplicate_rate=args.duplicate_rate,
+        geocode_latency_ms=args.geocode_latency_ms,
+        demographics=args.demographics,
+        scoring=args.scoring,
+        model_dir=args.model_dir,
+        enrich_batch_size=args.enrich_batch_size,
+        scoring_batch_size=args.scoring_batch_size
+    ), args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""Run the events sink on DirectRunner against the SQLite BigQuery stand-in
+
+A synthetic storm, with timestamps already normalized the way ParseMessage
+leaves them, goes through sinks.WriteEvents in each write mode with the
+stand-in injected as its client. This covers schema projection, typed row
+encoding, micro-batched inserts and dead-lettering of invalid events. It
+does not cover the BigQuery write itself. Reports events/sec, rows written
+and dead letters per mode, and peak RSS.
+
+    python benchmarks/bench_sink.py --events 50000 --batch-size 500 --invalid-rate 0.01
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from report import add_component_paths, emit, peak_rss_mb
+
+add_component_paths()
+
+import apache_beam as beam
+from apache_beam.options.pipeline_options import PipelineOptions
+
+import storm
+from fakes import SqliteBigQuery
+from pipeline import normalize_timestamp
+from sinks import InsertRows, WriteEvents, load_table_schema
+
+MODES = ['append', 'storage', 'upsert', 'load']
+
+
+def sink_events(n_events, invalid_rate=0.01, seed=11):
+    """Storm events as they reach the sink, with `invalid_rate` missing a required field"""
+    events = storm.storm_events(n_events, duplicate_rate=0.0)
+    for event in events:
+        event['event_time'] = normalize_timestamp(event['event_time'])
+        event['detected_time'] = normalize_timestamp(event['detected_time'])
+        event['impact_score'] = 0.5
+    rng = np.random.default_rng(seed)
+    for i in np.flatnonzero(rng.random(len(events)) < invalid_rate):
+        del events[i]['title']
+    return events
+
+
+def run_mode(mode, events, workdir, batch_size):
+    bq = SqliteBigQuery(os.path.join(workdir, f'{mode}.db'))
+    columns = [field['name'] for field in load_table_schema()['fields']]
+    bq.execute(f'CREATE TABLE disaster_events ({", ".join(columns)})')
+    bq.execute('CREATE TABLE dead_letter (failed_time, stage, event_id, error, payload)')
+    options = PipelineOptions([
+        '--runner=DirectRunner',
+        '--direct_running_mode=in_memory',
+        '--direct_num_workers=1'
+    ])
+    pipeline = beam.Pipeline(options=options)
+    (
+        pipeline
+        | 'Storm' >> beam.Create(events)
+        | 'Write Events' >> WriteEvents(
+            table='bench.bench.disaster_events', mode=mode, bigquery_client=bq, batch_size=batch_size
+        )
+        | 'Batch Dead Letters' >> beam.BatchElements(min_batch_size=1, max_batch_size=batch_size)
+        | 'Write Dead Letters' >> beam.ParDo(InsertRows(bq, 'dead_letter'))
+    )
+
+    start = time.perf_counter()
+    pipeline.run().wait_until_finish()
+    seconds = time.perf_counter() - start
+
+    counts = {
+        table: next(iter(bq.query(f'SELECT COUNT(*) AS n FROM {table}').result()))['n']
+        for table in ('disaster_events', 'dead_letter')
+    }
+    return {
+        'seconds': round(seconds, 3),
+        'events_per_sec': round(len(events) / seconds, 1),
+        'rows_written': counts['disaster_events'],
+        'dead_letters': counts['dead_letter']
+    }
+
+
+def run(events=20000, batch_size=500, invalid_rate=0.01, modes=MODES):
+    workdir = tempfile.mkdtemp(prefix='bench-sink-')
+    storm_events = sink_events(events, invalid_rate=invalid_rate)
+    return {
+        'events': events,
+        'batch_size': batch_size,
+        'invalid_events': sum('title' not in event for event in storm_events),
+        'modes': {mode: run_mode(mode, storm_events, workdir, batch_size) for mode in modes},
+        'peak_rss_mb': round(peak_rss_mb(), 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--events', type=int, default=20000)
+    parser.add_argument('--batch-size', type=int, default=500, help='Rows per stand-in insert')
+    parser.add_argument('--invalid-rate', type=float, default=0.01)
+    parser.add_argument('--modes', default=','.join(MODES))
+    parser.add_argument('--output', help='Write the result as JSON')
+    args = parser.parse_args()
+    modes = [mode for mode in args.modes.split(',') if mode]
+    unknown = set(modes) - set(MODES)
+    if unknown:
+        parser.error(f"unknown modes: {', '.join(sorted(unknown))}")
+
+    emit('sink', run(
+        events=args.events,
+        batch_size=args.batch_size,
+        invalid_rate=args.invalid_rate,
+        modes=modes
+    ), args.output)
+
+
+if __name__ == '__main__':
+    main()
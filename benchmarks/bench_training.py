@@ -0,0 +1,89 @@
+"""Time the training path end to end against a local Parquet event store
+
+Covers streaming rows into the feature cache, fitting the default forest,
+the flat export and single-event scoring with both model formats.
+
+    python benchmarks/bench_training.py --events 500000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from report import add_component_paths, emit, latency_summary, peak_rss_mb
+
+add_component_paths()
+
+import numpy as np
+
+import storm
+
+
+def run(events=200000, scoring_repeats=500):
+    workdir = tempfile.mkdtemp(prefix='bench-training-')
+    path = os.path.join(workdir, 'disaster_events.parquet')
+    storm.events_frame(events).to_parquet(path)
+    os.environ.update({'EVENT_STORE': 'parquet', 'EVENT_STORE_PATH': path})
+
+    from sklearn.preprocessing import StandardScaler
+
+    import train_model
+    from features import FeatureCache
+    from scoring import FlatModel, LocalModel
+
+    cache = FeatureCache(os.path.join(workdir, 'feature_cache'))
+    start = time.perf_counter()
+    rows = cache.update(train_model.load_training_batches('bench', 'bench'))
+    cache_seconds = time.perf_counter() - start
+
+    X, y = cache.matrix()
+    start = time.perf_counter()
+    scaler = StandardScaler().fit(X)
+    X_scaled = scaler.transform(X)
+    model = train_model.RandomForestRegressor(n_estimators=100, max_depth=10, random_state=42, n_jobs=-1)
+    model.fit(X_scaled, y)
+    fit_seconds = time.perf_counter() - start
+
+    model_dir = os.path.join(workdir, 'model')
+    train_model.save_model(model, scaler, model_dir)
+
+    start = time.perf_counter()
+    joblib_model = LocalModel.load(model_dir, flat=False)
+    joblib_load = time.perf_counter() - start
+    start = time.perf_counter()
+    flat_model = FlatModel.load(os.path.join(model_dir, 'flat'))
+    flat_load = time.perf_counter() - start
+
+    rows_for_scoring = np.asarray(X[:scoring_repeats], dtype=np.float64)
+    scoring = {}
+    for name, scorer in (('joblib', joblib_model), ('flat', flat_model)):
+        durations = []
+        for row in rows_for_scoring:
+            start = time.perf_counter()
+            scorer.predict([row])
+            durations.append(time.perf_counter() - start)
+        scoring[name] = latency_summary(durations)
+
+    return {
+        'events': events,
+        'training_rows': rows,
+        'cache_rows_per_sec': round(rows / cache_seconds, 1),
+        'fit_seconds': round(fit_seconds, 3),
+        'joblib_load_ms': round(joblib_load * 1000, 3),
+        'flat_load_ms': round(flat_load * 1000, 3),
+        'single_event_scoring': scoring,
+        'peak_rss_mb': round(peak_rss_mb(), 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--events', type=int, default=200000)
+    parser.add_argument('--output', help='Write the result as JSON')
+    args = parser.parse_args()
+
+    emit('training', run(events=args.events), args.output)
+
+
+if __name__ == '__main__':
+    main()
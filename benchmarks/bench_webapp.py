@@ -0,0 +1,69 @@
+"""Time the dashboard's read and render path against a local Parquet event store
+
+    python benchmarks/bench_webapp.py --events 200000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from report import add_component_paths, emit, latency_summary, peak_rss_mb
+
+add_component_paths()
+
+import storm
+
+
+def timed(fn, repeats):
+    durations = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        durations.append(time.perf_counter() - start)
+    return result, latency_summary(durations)
+
+
+def run(events=100000, repeats=5):
+    path = os.path.join(tempfile.mkdtemp(prefix='bench-webapp-'), 'disaster_events.parquet')
+    storm.events_frame(events).to_parquet(path)
+    os.environ.update({'EVENT_STORE': 'parquet', 'EVENT_STORE_PATH': path})
+
+    import app
+
+    frame, load = timed(lambda: app.load_disaster_data(app.MAX_HOURS), repeats)
+    since = frame['detected_time'].max() - app.pd.Timedelta(minutes=5)
+    _, incremental = timed(lambda: app.load_disaster_data(since=since), repeats)
+    filtered, filtering = timed(
+        lambda: app.filter_events(frame, 24, ['earthquake', 'volcanoes'], ['high', 'critical']), repeats
+    )
+    _, aggregate = timed(lambda: app.aggregate_cells(frame, zoom=2), repeats)
+    _, render_map = timed(lambda: app.create_map(frame, 2), repeats)
+    _, summary = timed(lambda: app.create_summary_stats(frame), repeats)
+
+    return {
+        'events': events,
+        'frame_mb': round(frame.memory_usage(deep=True).sum() / 1e6, 1),
+        'load_rows_per_sec': round(len(frame) / (load['p50_ms'] / 1000), 1),
+        'load': load,
+        'incremental_load': incremental,
+        'filter': filtering,
+        'filtered_rows': len(filtered),
+        'aggregate_cells': aggregate,
+        'create_map': render_map,
+        'summary_stats': summary,
+        'peak_rss_mb': round(peak_rss_mb(), 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--events', type=int, default=100000)
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--output', help='Write the result as JSON')
+    args = parser.parse_args()
+
+    emit('webapp', run(events=args.events, repeats=args.repeats), args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,330 @@
+"""Local stand-ins for the external services the components talk to
+
+- FixtureServer: HTTP server replaying the recorded USGS, EONET, GDACS,
+  tsunami bulletin and geocoding responses in fixtures/, optionally scaled up to a storm of
+  features and with an artificial per-request latency. Feeds carry ETag /
+  Last-Modified validators and answer conditional requests with a 304.
+- InMemoryPublisher: drop-in for pubsub_v1.PublisherClient.
+- SqliteBigQuery: the subset of bigquery.Client used by the pipeline
+  (query().result() / to_dataframe(), insert_rows_json) backed by SQLite.
+- FakeEndpoint: aiplatform.Endpoint stand-in with a fixed prediction latency.
+"""
+import copy
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import Future
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Shape of aiplatform.Endpoint.predict() results
+Prediction = namedtuple('Prediction', ['predictions'])
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name)) as f:
+        return json.load(f)
+
+
+def scale_usgs(feed, n_features, seed=0):
+    """Replicate the recorded USGS features into a feed of n_features"""
+    import random
+    rng = random.Random(seed)
+    features = []
+    for i in range(n_features):
+        feature = copy.deepcopy(feed['features'][i % len(feed['features'])])
+        feature['id'] = f"{feature['id']}-{i}"
+        feature['properties']['mag'] = round(rng.uniform(0.5, 7.5), 2)
+        feature['properties']['updated'] += i
+        feature['geometry']['coordinates'][:2] = [rng.uniform(-180, 180), rng.uniform(-60, 70)]
+        features.append(feature)
+    return {**feed, 'features': features, 'metadata': {**feed['metadata'], 'count': n_features}}
+
+
+def scale_eonet(feed, n_events, seed=0):
+    """Replicate the recorded EONET events into a feed of n_events"""
+    import random
+    rng = random.Random(seed)
+    events = []
+    for i in range(n_events):
+        event = copy.deepcopy(feed['events'][i % len(feed['events'])])
+        event['id'] = f"{event['id']}-{i}"
+        for point in event['geometry']:
+            point['coordinates'] = [rng.uniform(-180, 180), rng.uniform(-60, 70)]
+        events.append(event)
+    return {**feed, 'events': events}
+
+
+class FixtureServer:
+    """Threaded HTTP server for the feeds and the reverse geocoder
+
+    Routes:
+      /usgs/summary/<feed>.geojson    (USGS_API_BASE_URL=<url>/usgs; every feed gets the same features)
+      /eonet/events                   (NASA_EONET_API_BASE_URL=<url>/eonet)
+      /gdacs/events/geteventlist/MAP  (GDACS_API_BASE_URL=<url>/gdacs)
+      /tsunami/atom.xml               (TSUNAMI_FEED_URL=<url>/tsunami/atom.xml)
+      /geocode/json                   (geocoding_url=<url>/geocode/json)
+
+    Feed responses carry an ETag (a digest of the body) and a Last-Modified
+    of when the body was set. A request whose If-None-Match matches, or
+    without one whose If-Modified-Since is not older, gets a 304.
+    set_feed() replaces a feed's body, as if the source had changed.
+    """
+
+    def __init__(self, latency_seconds=0.0, usgs_features=None, eonet_events=None):
+        usgs = load_fixture('usgs_all_hour.geojson')
+        eonet = load_fixture('eonet_events.json')
+        self.latency_seconds = latency_seconds
+        self.usgs = json.dumps(scale_usgs(usgs, usgs_features) if usgs_features else usgs).encode('utf-8')
+        self.eonet = json.dumps(scale_eonet(eonet, eonet_events) if eonet_events else eonet).encode('utf-8')
+        self.gdacs = json.dumps(load_fixture('gdacs_events.json')).encode('utf-8')
+        with open(os.path.join(FIXTURES_DIR, 'tsunami_atom.xml'), 'rb') as f:
+            self.tsunami = f.read()
+        self.geocode = load_fixture('geocode.json')
+        self.requests = {'usgs': 0, 'eonet': 0, 'gdacs': 0, 'tsunami': 0, 'geocode': 0}
+        self.not_modified = {'usgs': 0, 'eonet': 0, 'gdacs': 0, 'tsunami': 0}
+        self.modified = {route: formatdate(usegmt=True) for route in self.not_modified}
+        self._lock = threading.Lock()
+        self._server = None
+
+    def set_feed(self, route, body):
+        """Replace a feed's body (bytes, or an object to serialize as JSON) and its validators"""
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode('utf-8')
+        with self._lock:
+            setattr(self, route, body)
+            self.modified[route] = formatdate(usegmt=True)
+
+    def validators(self, route, body):
+        """ETag and Last-Modified of a feed body"""
+        return f'"{hashlib.sha256(body).hexdigest()[:16]}"', self.modified[route]
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                if parsed.path.startswith('/usgs/'):
+                    route, body = 'usgs', server.usgs
+                elif parsed.path.startswith('/eonet/'):
+                    route, body = 'eonet', server.eonet
+                elif parsed.path.startswith('/gdacs/'):
+                    route, body = 'gdacs', server.gdacs
+                elif parsed.path.startswith('/tsunami/'):
+                    route, body = 'tsunami', server.tsunami
+                elif parsed.path.startswith('/geocode/'):
+                    route, body = 'geocode', server.geocode_body(parse_qs(parsed.query))
+                else:
+                    self.send_error(404)
+                    return
+
+                with server._lock:
+                    server.requests[route] += 1
+                if server.latency_seconds:
+                    time.sleep(server.latency_seconds)
+
+                etag = last_modified = None
+                if route in server.not_modified:
+                    etag, last_modified = server.validators(route, body)
+                    if_none_match = self.headers.get('If-None-Match')
+                    if (if_none_match == etag if if_none_match
+                            else _not_modified_since(self.headers.get('If-Modified-Since'), last_modified)):
+                        with server._lock:
+                            server.not_modified[route] += 1
+                        self.send_response(304)
+                        self.send_header('ETag', etag)
+                        self.end_headers()
+                        return
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/atom+xml' if route == 'tsunami' else 'application/json')
+                if etag:
+                    self.send_header('ETag', etag)
+                    self.send_header('Last-Modified', last_modified)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def geocode_body(self, query):
+        latlng = query.get('latlng', ['0,0'])[0]
+        response = copy.deepcopy(self.geocode)
+        response['results'][0]['formatted_address'] = f"Near {latlng}"
+        return json.dumps(response).encode('utf-8')
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+def _not_modified_since(if_modified_since, last_modified):
+    if not if_modified_since:
+        return False
+    try:
+        return parsedate_to_datetime(if_modified_since) >= parsedate_to_datetime(last_modified)
+    except (TypeError, ValueError):
+        return False
+
+
+class InMemoryPublisher:
+    """Stand-in for pubsub_v1.PublisherClient that keeps messages in a list
+
+    Messages for which `reject(data)` is true fail their future instead.
+    """
+
+    def __init__(self, publish_seconds=0.0, reject=None):
+        self.publish_seconds = publish_seconds
+        self.reject = reject
+        self.messages = []
+        self._lock = threading.Lock()
+
+    def topic_path(self, project, topic):
+        return f"projects/{project}/topics/{topic}"
+
+    def publish(self, topic, data, **attributes):
+        if self.publish_seconds:
+            time.sleep(self.publish_seconds)
+        future = Future()
+        if self.reject is not None and self.reject(data):
+            future.set_exception(RuntimeError('Publish rejected'))
+            return future
+        with self._lock:
+            self.messages.append((topic, data, attributes))
+            message_id = str(len(self.messages))
+        future.set_result(message_id)
+        return future
+
+
+class _Row(dict):
+    """Row supporting both attribute access and .items(), like bigquery.Row"""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+class _QueryJob:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def result(self):
+        return iter(self._rows)
+
+    def to_dataframe(self):
+        import pandas as pd
+        return pd.DataFrame(list(self._rows))
+
+
+class SqliteBigQuery:
+    """bigquery.Client stand-in backed by a SQLite file
+
+    Backticked `project.dataset.table` references are rewritten to the bare
+    table name. The connection is opened lazily per thread, so instances
+    pickle into Beam DoFns.
+    """
+
+    TABLE_REF = re.compile(r"`(?:[\w-]+\.)*([\w-]+)`")
+
+    def __init__(self, path):
+        self.path = path
+        self._local = None
+
+    def __getstate__(self):
+        return {'path': self.path}
+
+    def __setstate__(self, state):
+        self.path = state['path']
+        self._local = None
+
+    @property
+    def connection(self):
+        if self._local is None:
+            self._local = threading.local()
+        if not hasattr(self._local, 'connection'):
+            self._local.connection = sqlite3.connect(self.path, timeout=30)
+            self._local.connection.row_factory = sqlite3.Row
+        return self._local.connection
+
+    def query(self, query, job_config=None):
+        sql = self.TABLE_REF.sub(r'"\1"', query)
+        params = {}
+        for param in getattr(job_config, 'query_parameters', None) or []:
+            sql = sql.replace(f"@{param.name}", f":{param.name}")
+            params[param.name] = param.value
+        cursor = self.connection.execute(sql, params)
+        return _QueryJob([_Row(zip(row.keys(), row)) for row in cursor.fetchall()])
+
+    def execute(self, sql, rows=()):
+        with self.connection:
+            if rows:
+                self.connection.executemany(sql, rows)
+            else:
+                self.connection.execute(sql)
+
+    def insert_rows_json(self, table, rows):
+        if not rows:
+            return []
+        table = str(table).split('.')[-1]
+        columns = sorted({key for row in rows for key in row})
+        self.execute(
+            f'CREATE TABLE IF NOT EXISTS "{table}" ({", ".join(columns)})'
+        )
+        self.execute(
+            f'INSERT INTO "{table}" ({", ".join(columns)}) VALUES ({", ".join("?" for _ in columns)})',
+            [tuple(_sqlite_value(row.get(column)) for column in columns) for row in rows]
+        )
+        return []
+
+
+def _sqlite_value(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+
+class FakeEndpoint:
+    """Local stand-in for aiplatform.Endpoint used to measure batching
+
+    Each predict call sleeps for a fixed round-trip plus a small per-instance
+    cost and returns a deterministic score, so batch size effects can be
+    measured without a deployed model.
+    """
+
+    def __init__(self, round_trip_seconds=0.05, per_instance_seconds=0.0005):
+        self.round_trip_seconds = round_trip_seconds
+        self.per_instance_seconds = per_instance_seconds
+        self.calls = 0
+
+    def predict(self, instances):
+        self.calls += 1
+        time.sleep(self.round_trip_seconds + self.per_instance_seconds * len(instances))
+        return Prediction(predictions=[
+            min(1.0, 0.1 * features[0] + 0.00001 * features[1] + 0.3 * features[2])
+            for features in instances
+        ])
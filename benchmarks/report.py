@@ -0,0 +1,67 @@
+"""Shared measurement and reporting helpers for the benchmarks"""
+import json
+import os
+import resource
+import sys
+
+import numpy as np
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def add_component_paths():
+    """Make the component modules importable the way their own entry points see them"""
+    for component in ('dataflow-pipeline', 'data-ingestion', 'ml-model', 'webapp', 'shared'):
+        path = os.path.join(REPO_ROOT, component)
+        if path not in sys.path:
+            sys.path.append(path)
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KB on Linux and bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def latency_summary(seconds):
+    """p50/p99/max in milliseconds of a list of durations in seconds"""
+    if not len(seconds):
+        return {'count': 0}
+    ms = np.asarray(seconds) * 1000
+    return {
+        'count': int(len(ms)),
+        'p50_ms': round(float(np.percentile(ms, 50)), 3),
+        'p99_ms': round(float(np.percentile(ms, 99)), 3),
+        'max_ms': round(float(ms.max()), 3)
+    }
+
+
+def emit(name, result, output=None):
+    """Print a result and optionally write it as JSON for run.py"""
+    print(f"== {name} ==")
+    print(json.dumps(result, indent=2))
+    if output:
+        with open(output, 'w') as f:
+            json.dump(result, f, indent=2)
+
+
+def regressions(current, baseline, tolerance=0.2, path=''):
+    """Metrics that got worse than the baseline by more than `tolerance`
+
+    Keys ending in _per_sec are throughputs (higher is better); p50/p99
+    latencies and keys ending in _seconds or _mb are costs (lower is
+    better). Other keys, including max latencies, are ignored.
+    """
+    found = []
+    for key, value in current.items():
+        name = f"{path}.{key}" if path else key
+        old = baseline.get(key) if isinstance(baseline, dict) else None
+        if isinstance(value, dict):
+            found.extend(regressions(value, old or {}, tolerance, name))
+        elif isinstance(value, (int, float)) and isinstance(old, (int, float)) and old > 0:
+            if key.endswith('_per_sec') and value < old * (1 - tolerance):
+                found.append(f"{name}: {value:g} < {old:g}")
+            elif key.endswith(('p50_ms', 'p99_ms', '_seconds', '_mb')) and value > old * (1 + tolerance):
+                found.append(f"{name}: {value:g} > {old:g}")
+    return found
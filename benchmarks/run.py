@@ -0,0 +1,75 @@
+"""Run every benchmark in its own process and compare against a baseline
+
+Each suite runs in a fresh interpreter so peak RSS is attributed to it
+alone. With --baseline, metrics that regressed by more than --tolerance
+are listed and the exit status is non-zero.
+
+    python benchmarks/run.py --output bench.json
+    python benchmarks/run.py --baseline bench.json --tolerance 0.2
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from report import regressions
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SUITES = {
+    'pipeline': ['bench_pipeline.py', '--events', '5000', '--geocode-latency-ms', '5'],
+    'sink': ['bench_sink.py', '--events', '20000'],
+    'ingestion': ['bench_ingestion.py', '--usgs-features', '2000', '--eonet-events', '200'],
+    'training': ['bench_training.py', '--events', '100000'],
+    'webapp': ['bench_webapp.py', '--events', '100000']
+}
+
+
+def run_suite(name):
+    script, *args = SUITES[name]
+    with tempfile.NamedTemporaryFile(suffix='.json') as output:
+        completed = subprocess.run(
+            [sys.executable, os.path.join(BENCH_DIR, script), *args, '--output', output.name],
+            cwd=BENCH_DIR
+        )
+        if completed.returncode != 0:
+            return {'error': f"exit status {completed.returncode}"}
+        with open(output.name) as f:
+            return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('suites', nargs='*', help=f"Suites to run (default all): {', '.join(SUITES)}")
+    parser.add_argument('--output', help='Write all results as JSON')
+    parser.add_argument('--baseline', help='Previous results to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args()
+    unknown = set(args.suites) - set(SUITES)
+    if unknown:
+        parser.error(f"unknown suites: {', '.join(sorted(unknown))}")
+
+    results = {name: run_suite(name) for name in (args.suites or SUITES)}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    failed = [name for name, result in results.items() if 'error' in result]
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        found = regressions(results, baseline, args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}")
+        if found:
+            failed.append('regressions')
+
+    if failed:
+        print(f"Benchmarks failed: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
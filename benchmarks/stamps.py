@@ -0,0 +1,53 @@
+"""Per-event stage exit times, recorded in-process
+
+DirectRunner's in_memory mode runs every DoFn in this process, so a module
+global is visible to both the pipeline and the benchmark reading it.
+
+On a bounded DirectRunner pipeline each stage processes a whole bundle
+before the next stage sees it, so the gap between two stamps of an event is
+when the later stage finished that event's bundle, not how long the event
+itself took. Read the results as stage completion times.
+"""
+import threading
+import time
+
+import apache_beam as beam
+
+STAMPS = {}
+_lock = threading.Lock()
+
+
+def reset():
+    with _lock:
+        STAMPS.clear()
+
+
+def record(stage, event_ids):
+    """Record that `event_ids` left `stage` now; the first delivery of an id wins"""
+    now = time.perf_counter()
+    with _lock:
+        stamps = STAMPS.setdefault(stage, {})
+        for event_id in event_ids:
+            stamps.setdefault(event_id, now)
+
+
+class Stamp(beam.DoFn):
+    """Record when each event leaves `stage` and pass it through"""
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def process(self, event):
+        record(self.stage, [event['event_id']])
+        yield event
+
+
+def stage_completion_times(stages):
+    """Seconds from each event leaving a stage to it leaving the next, keyed by the later stage"""
+    latencies = {}
+    for previous, stage in zip(stages, stages[1:]):
+        before, after = STAMPS.get(previous, {}), STAMPS.get(stage, {})
+        latencies[stage] = [after[key] - before[key] for key in after if key in before]
+    first, last = STAMPS.get(stages[0], {}), STAMPS.get(stages[-1], {})
+    latencies['end_to_end'] = [last[key] - first[key] for key in last if key in first]
+    return latencies
@@ -0,0 +1,98 @@
+"""Synthetic event storms and reference data for the benchmarks"""
+import json
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+EVENT_TYPES = ['earthquake', 'wildfires', 'severe storms', 'volcanoes']
+SEVERITIES = ['low', 'medium', 'high', 'critical']
+SOURCES = ['USGS', 'NASA']
+
+
+def storm_events(n_events, duplicate_rate=0.1, hotspots=50, hotspot_share=0.7, seed=42):
+    """Ingestion-shaped event dicts for a storm
+
+    `hotspot_share` of the events cluster around a few locations (aftershock
+    sequences, fire complexes) so geocode caching is exercised, and
+    `duplicate_rate` of them are re-deliveries of an earlier event.
+    """
+    rng = np.random.default_rng(seed)
+    centres = np.column_stack([rng.uniform(-60, 70, hotspots), rng.uniform(-180, 180, hotspots)])
+    now = datetime.now(timezone.utc)
+
+    n_unique = max(1, int(n_events * (1 - duplicate_rate)))
+    in_hotspot = rng.random(n_unique) < hotspot_share
+    picks = rng.integers(0, hotspots, n_unique)
+    lats = np.where(in_hotspot, centres[picks, 0] + rng.normal(0, 0.01, n_unique), rng.uniform(-60, 70, n_unique))
+    lngs = np.where(in_hotspot, centres[picks, 1] + rng.normal(0, 0.01, n_unique), rng.uniform(-180, 180, n_unique))
+    magnitudes = rng.uniform(0.5, 8.5, n_unique)
+    event_types = rng.choice(EVENT_TYPES, n_unique)
+    severities = rng.choice(SEVERITIES, n_unique)
+    offsets = rng.uniform(0, 3600, n_unique)
+
+    events = []
+    for i in range(n_unique):
+        event_time = now - timedelta(seconds=float(offsets[i]))
+        events.append({
+            'event_id': f"storm_{seed}_{i}",
+            'event_type': str(event_types[i]),
+            'title': f"Synthetic event {i}",
+            'description': '',
+            'latitude': float(lats[i]),
+            'longitude': float(lngs[i]),
+            'magnitude': float(magnitudes[i]),
+            'severity': str(severities[i]),
+            'event_time': event_time.isoformat(),
+            'detected_time': (event_time + timedelta(seconds=30)).isoformat(),
+            'source': SOURCES[i % len(SOURCES)],
+            'raw_data': json.dumps({'mag': float(magnitudes[i])})
+        })
+
+    duplicates = rng.integers(0, n_unique, n_events - n_unique)
+    return events + [dict(events[i]) for i in duplicates]
+
+
+def storm_messages(n_events, **kwargs):
+    """Pub/Sub message payloads for a storm"""
+    return [json.dumps(event).encode('utf-8') for event in storm_events(n_events, **kwargs)]
+
+
+def demographics_rows(n_locations, seed=7):
+    """Rows for the demographics table"""
+    rng = np.random.default_rng(seed)
+    updated = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    return [
+        (float(lat), float(lng), float(density), int(hospitals), int(schools), updated)
+        for lat, lng, density, hospitals, schools in zip(
+            rng.uniform(-60, 70, n_locations),
+            rng.uniform(-180, 180, n_locations),
+            rng.lognormal(4, 1.5, n_locations),
+            rng.integers(0, 20, n_locations),
+            rng.integers(0, 80, n_locations)
+        )
+    ]
+
+
+def events_frame(n_events, hours=168, seed=3):
+    """disaster_events-shaped DataFrame (enriched and scored) for read-side benchmarks"""
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    now = pd.Timestamp.now(tz='UTC')
+    detected = now - pd.to_timedelta(rng.uniform(0, hours * 3600, n_events), unit='s')
+    return pd.DataFrame({
+        'event_id': [f"evt_{i}" for i in range(n_events)],
+        'event_type': rng.choice(EVENT_TYPES, n_events),
+        'title': [f"Synthetic event {i}" for i in range(n_events)],
+        'description': '',
+        'latitude': rng.uniform(-60, 70, n_events),
+        'longitude': rng.uniform(-180, 180, n_events),
+        'address': 'Somewhere',
+        'magnitude': rng.uniform(0.5, 8.5, n_events),
+        'severity': rng.choice(SEVERITIES, n_events),
+        'event_time': detected - pd.Timedelta(seconds=30),
+        'detected_time': detected,
+        'source': rng.choice(SOURCES, n_events),
+        'population_density': rng.lognormal(4, 1.5, n_events),
+        'impact_score': rng.uniform(0, 1, n_events)
+    })
@@ -0,0 +1,448 @@
+"""Feed adapters, the normalized event record and the per-source poll schedule
+
+Each adapter knows one source: where to fetch it, how often to poll it and
+how to turn its payload into FeedEvent records. All adapters share one
+FeedClient, a pooled HTTP session that remembers ETag / Last-Modified
+validators so an unchanged feed costs a 304 once its events are published.
+The FeedScheduler decides which adapters are due on a run, so high-churn
+feeds can be polled every minute while slow ones are fetched every half
+hour.
+"""
+import os
+import random
+import re
+import threading
+import time
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+@dataclass(slots=True)
+class FeedEvent:
+    """A source event normalized to the fields the pipeline expects
+
+    `version` changes whenever the source revises the event and `track`
+    holds the full geometry of EONET events in track mode.
+    """
+    event_id: str
+    event_type: str
+    title: str
+    description: str
+    latitude: float
+    longitude: float
+    severity: str
+    event_time: str
+    detected_time: str
+    source: str
+    raw_data: object
+    magnitude: float = None
+    version: object = ''
+    track: list = None
+
+    def to_event(self):
+        """Message dict with the private keys SeenEvents and track trimming consume"""
+        event = {
+            'event_id': self.event_id,
+            'event_type': self.event_type,
+            'title': self.title,
+            'description': self.description,
+            'latitude': self.latitude,
+            'longitude': self.longitude,
+            'severity': self.severity,
+            'event_time': self.event_time,
+            'detected_time': self.detected_time,
+            'source': self.source,
+            'raw_data': self.raw_data,
+            '_version': self.version
+        }
+        if self.magnitude is not None:
+            event['magnitude'] = self.magnitude
+        if self.track is not None:
+            event['_track'] = self.track
+        return event
+
+
+def now_iso():
+    return datetime.now(timezone.utc).isoformat()
+
+
+class FeedClient:
+    """Pooled HTTP session shared by all adapters, with conditional GETs
+
+    Validators from a 200 response stay pending until commit(feed), which the
+    caller does once that feed's events are published and the seen-event
+    state is saved. Until then the feed is fetched with the previous
+    validators, so events that failed to publish are not hidden by a 304.
+    """
+
+    def __init__(self, pool_maxsize=10):
+        self.session = requests.Session()
+        retries = Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=['GET']
+        )
+        self.session.mount('https://', HTTPAdapter(pool_maxsize=pool_maxsize, max_retries=retries))
+        self.session.mount('http://', HTTPAdapter(pool_maxsize=pool_maxsize, max_retries=retries))
+        # ETag / Last-Modified validators from the last committed fetch of each feed URL
+        self.validators = {}
+        # Validators fetched on this run, per feed, waiting for commit() or discard()
+        self.pending = {}
+        self._lock = threading.Lock()
+
+    def fetch(self, url, params=None, feed=None):
+        """GET a feed, returning None when it has not changed since the last committed fetch"""
+        key = (url, tuple(sorted((params or {}).items())))
+        feed = feed or url
+        headers = {}
+        etag, last_modified = self.validators.get(key, (None, None))
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+
+        response = self.session.get(url, params=params, headers=headers, timeout=30)
+        if response.status_code == 304:
+            with self._lock:
+                self.pending.get(feed, {}).pop(key, None)
+            print(f"Feed not modified: {url}")
+            return None
+        response.raise_for_status()
+
+        with self._lock:
+            self.pending.setdefault(feed, {})[key] = (response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        return response
+
+    def commit(self, feed):
+        """Keep the validators fetched for a feed whose events all made it"""
+        with self._lock:
+            self.validators.update(self.pending.pop(feed, {}))
+
+    def discard(self, feed):
+        """Forget a feed's validators so its next fetch is unconditional"""
+        with self._lock:
+            for key in self.pending.pop(feed, {}):
+                self.validators.pop(key, None)
+
+
+class FeedAdapter:
+    """One polled source; subclasses implement parse()
+
+    window_hours is how far back the feed reports events. Seen-event state
+    must be kept at least that long, or unchanged old events come back as new.
+    """
+
+    name = None
+    interval_seconds = 300
+    window_hours = 48
+
+    def __init__(self, interval_seconds=None):
+        if interval_seconds is not None:
+            self.interval_seconds = interval_seconds
+
+    def url(self):
+        raise NotImplementedError
+
+    def params(self):
+        return None
+
+    def poll(self, client):
+        """Fetch the feed and return its FeedEvents ([] when unchanged)"""
+        response = client.fetch(self.url(), params=self.params(), feed=self.name)
+        if response is None:
+            return []
+        return self.parse(response)
+
+    def parse(self, response):
+        raise NotImplementedError
+
+
+def get_earthquake_severity(magnitude):
+    """Determine severity based on earthquake magnitude"""
+    if magnitude is None:
+        return 'unknown'
+    elif magnitude >= 8.0:
+        return 'critical'
+    elif magnitude >= 6.0:
+        return 'high'
+    elif magnitude >= 4.0:
+        return 'medium'
+    else:
+        return 'low'
+
+
+class UsgsFeed(FeedAdapter):
+    """A USGS GeoJSON summary feed (all_hour, significant_day, all_week, ...)"""
+
+    WINDOW_HOURS = {'hour': 1, 'day': 24, 'week': 168, 'month': 744}
+
+    def __init__(self, feed, interval_seconds=None):
+        super().__init__(interval_seconds)
+        self.feed = feed
+        self.name = f"usgs_{feed}"
+        self.window_hours = self.WINDOW_HOURS.get(feed.rsplit('_', 1)[-1], self.window_hours)
+
+    def url(self):
+        return f"{os.getenv('USGS_API_BASE_URL')}/summary/{self.feed}.geojson"
+
+    def parse(self, response):
+        events = []
+        detected_time = now_iso()
+        for feature in response.json().get('features', []):
+            properties = feature.get('properties', {})
+            geometry = feature.get('geometry', {})
+
+            # The event id is the feature id (properties only carry net + code); a
+            # made-up id would change every poll and defeat deduplication
+            if feature.get('id') and geometry.get('type') == 'Point' and geometry.get('coordinates'):
+                coords = geometry['coordinates']
+                events.append(FeedEvent(
+                    event_id=f"usgs_{feature['id']}",
+                    event_type='earthquake',
+                    title=properties.get('title', 'Earthquake'),
+                    description=properties.get('title', ''),
+                    latitude=coords[1],
+                    longitude=coords[0],
+                    magnitude=properties.get('mag'),
+                    severity=get_earthquake_severity(properties.get('mag')),
+                    event_time=datetime.fromtimestamp(properties.get('time', 0) / 1000, tz=timezone.utc).isoformat(),
+                    detected_time=detected_time,
+                    source='USGS',
+                    raw_data=properties,
+                    version=properties.get('updated')
+                ))
+        return events
+
+
+def get_nasa_severity(event):
+    """Determine severity for NASA events"""
+    # Simple heuristic based on event type
+    event_type = event.get('categories', [{}])[0].get('title', '').lower()
+
+    if 'severe' in event_type:
+        return 'high'
+    elif 'volcano' in event_type:
+        return 'high'
+    elif 'wildfire' in event_type:
+        return 'medium'
+    else:
+        return 'low'
+
+
+class EonetFeed(FeedAdapter):
+    """NASA EONET natural events, optionally with their full geometry track"""
+
+    name = 'eonet'
+    interval_seconds = 600
+
+    def __init__(self, interval_seconds=None, track_mode=False):
+        super().__init__(interval_seconds)
+        self.track_mode = track_mode
+
+    def url(self):
+        return f"{os.getenv('NASA_EONET_API_BASE_URL')}/events"
+
+    def params(self):
+        return {
+            'limit': 50,
+            'days': 1,
+            'category': 'severe-storms,volcanoes,wildfires'
+        }
+
+    def parse(self, response):
+        events = []
+        detected_time = now_iso()
+        for event in response.json().get('events', []):
+            geometry = event.get('geometry', [])
+
+            if event.get('id') and geometry and len(geometry) > 0:
+                # Tracks are positioned at their latest point, otherwise at the first one
+                coords = geometry[-1 if self.track_mode else 0].get('coordinates', [])
+
+                if len(coords) >= 2 and not isinstance(coords[0], list):
+                    events.append(FeedEvent(
+                        event_id=f"nasa_{event['id']}",
+                        event_type=event.get('categories', [{}])[0].get('title', 'natural-event').lower(),
+                        title=event.get('title', 'Natural Event'),
+                        description=event.get('description', ''),
+                        latitude=coords[1],
+                        longitude=coords[0],
+                        severity=get_nasa_severity(event),
+                        event_time=geometry[0].get('date', detected_time),
+                        detected_time=detected_time,
+                        source='NASA',
+                        raw_data=event,
+                        version=f"{len(geometry)}:{geometry[-1].get('date')}:{event.get('closed')}",
+                        track=geometry if self.track_mode else None
+                    ))
+        return events
+
+
+class GdacsFeed(FeedAdapter):
+    """GDACS multi-hazard alerts (earthquakes, cyclones, floods, volcanoes, droughts, fires)"""
+
+    name = 'gdacs'
+    interval_seconds = 900
+    window_hours = 168
+
+    EVENT_TYPES = {
+        'EQ': 'earthquake',
+        'TC': 'severe storms',
+        'FL': 'flood',
+        'VO': 'volcanoes',
+        'DR': 'drought',
+        'WF': 'wildfires'
+    }
+    SEVERITIES = {'green': 'low', 'orange': 'high', 'red': 'critical'}
+
+    def url(self):
+        return f"{os.getenv('GDACS_API_BASE_URL', 'https://www.gdacs.org/gdacsapi/api')}/events/geteventlist/MAP"
+
+    def parse(self, response):
+        events = []
+        detected_time = now_iso()
+        for feature in response.json().get('features', []):
+            properties = feature.get('properties', {})
+            geometry = feature.get('geometry', {})
+
+            if geometry.get('type') == 'Point' and geometry.get('coordinates'):
+                coords = geometry['coordinates']
+                severity_data = properties.get('severitydata') or {}
+                events.append(FeedEvent(
+                    event_id=f"gdacs_{properties.get('eventtype')}{properties.get('eventid')}",
+                    event_type=self.EVENT_TYPES.get(properties.get('eventtype'), 'natural-event'),
+                    title=properties.get('name') or properties.get('description', 'GDACS Event'),
+                    description=properties.get('htmldescription') or properties.get('description', ''),
+                    latitude=coords[1],
+                    longitude=coords[0],
+                    magnitude=severity_data.get('severity'),
+                    severity=self.SEVERITIES.get(str(properties.get('alertlevel', '')).lower(), 'low'),
+                    event_time=properties.get('fromdate', detected_time),
+                    detected_time=detected_time,
+                    source='GDACS',
+                    raw_data=properties,
+                    version=f"{properties.get('episodeid')}:{properties.get('datemodified')}"
+                ))
+        return events
+
+
+class TsunamiFeed(FeedAdapter):
+    """NOAA tsunami warning center bulletins (Atom feed with GeoRSS points)"""
+
+    name = 'tsunami'
+    interval_seconds = 300
+    window_hours = 168
+
+    NAMESPACES = {'atom': 'http://www.w3.org/2005/Atom', 'geo': 'http://www.w3.org/2003/01/geo/wgs84_pos#'}
+    # Bulletin levels in decreasing order of urgency
+    SEVERITIES = [('warning', 'critical'), ('advisory', 'high'), ('watch', 'medium')]
+
+    def __init__(self, interval_seconds=None, feed_url=None):
+        super().__init__(interval_seconds)
+        self.feed_url = feed_url
+
+    def url(self):
+        return self.feed_url or os.getenv('TSUNAMI_FEED_URL', 'https://www.tsunami.gov/events/xml/PAAQAtom.xml')
+
+    def parse(self, response):
+        events = []
+        detected_time = now_iso()
+        root = ET.fromstring(response.content)
+        for entry in root.findall('atom:entry', self.NAMESPACES):
+            text = self._texts(entry)
+            lat, lng = text('geo:lat'), text('geo:long')
+            if not lat or not lng:
+                continue
+
+            title = text('atom:title')
+            severity = next((level for word, level in self.SEVERITIES if word in title.lower()), 'low')
+            events.append(FeedEvent(
+                event_id=f"tsunami_{text('atom:id').replace('urn:uuid:', '').rsplit('/', 1)[-1]}",
+                event_type='tsunami',
+                title=title or 'Tsunami Bulletin',
+                description=text('atom:summary'),
+                latitude=float(lat),
+                longitude=float(lng),
+                severity=severity,
+                event_time=text('atom:updated') or detected_time,
+                detected_time=detected_time,
+                source='NOAA',
+                raw_data={'id': text('atom:id'), 'title': title, 'updated': text('atom:updated'),
+                          'summary': text('atom:summary')},
+                version=text('atom:updated')
+            ))
+        return events
+
+    def _texts(self, entry):
+        return lambda path: (entry.findtext(path, default='', namespaces=self.NAMESPACES) or '').strip()
+
+
+# Adapters available to FEEDS, with their default poll intervals
+ADAPTERS = {
+    'usgs_all_hour': lambda: UsgsFeed('all_hour', interval_seconds=60),
+    'usgs_significant_day': lambda: UsgsFeed('significant_day', interval_seconds=300),
+    'usgs_all_week': lambda: UsgsFeed('all_week', interval_seconds=1800),
+    'eonet': lambda: EonetFeed(track_mode=os.getenv('EONET_TRACKS', 'false').lower() == 'true'),
+    'gdacs': GdacsFeed,
+    'tsunami': TsunamiFeed
+}
+
+DEFAULT_FEEDS = 'usgs_all_hour,usgs_significant_day,usgs_all_week,eonet'
+
+
+def _split_list(value):
+    # Commas or semicolons; semicolons survive gcloud's comma-separated --set-env-vars
+    return [item for item in re.split(r'[,;\s]+', value) if item]
+
+
+def configured_adapters():
+    """Adapters named in FEEDS, with intervals overridden by FEED_INTERVALS (name=seconds;...)"""
+    intervals = {}
+    for item in _split_list(os.getenv('FEED_INTERVALS', '')):
+        name, seconds = item.split('=')
+        intervals[name] = int(seconds)
+
+    adapters = []
+    for name in _split_list(os.getenv('FEEDS', DEFAULT_FEEDS)):
+        if name not in ADAPTERS:
+            raise ValueError(f"Unknown feed: {name}")
+        adapter = ADAPTERS[name]()
+        if name in intervals:
+            adapter.interval_seconds = intervals[name]
+        adapters.append(adapter)
+    return adapters
+
+
+class FeedScheduler:
+    """Decides which adapters are due, spreading polls with jitter
+
+    `next_poll` maps adapter names to the epoch second they are due next and
+    is persisted with the ingestion state, so the schedule survives cold
+    starts. After a successful poll an adapter is due again after its
+    interval, scaled by a random factor within +/- `jitter`, so feeds with
+    the same interval don't stay in lockstep. A failed poll leaves the
+    adapter due on the next run. Runs are triggered on a fixed period, so an
+    adapter that comes due within `grace_seconds` after a run is polled on
+    that run rather than a whole period late.
+    """
+
+    def __init__(self, adapters, next_poll, jitter=0.1, grace_seconds=10):
+        self.adapters = adapters
+        self.next_poll = next_poll
+        self.jitter = jitter
+        self.grace_seconds = grace_seconds
+
+    def due(self, now=None):
+        now = time.time() if now is None else now
+        return [adapter for adapter in self.adapters if self.next_poll.get(adapter.name, 0) <= now + self.grace_seconds]
+
+    def mark_polled(self, adapter, now=None):
+        now = time.time() if now is None else now
+        spread = random.uniform(1 - self.jitter, 1 + self.jitter) if self.jitter else 1
+        self.next_poll[adapter.name] = int(now + adapter.interval_seconds * spread)
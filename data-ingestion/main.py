@@ -1,154 +1,204 @@
 import functions_framework
-import requests
-import json
-import uuid
-from datetime import datetime, timezone
+import time
+from concurrent.futures import ThreadPoolExecutor
 from google.cloud import pubsub_v1
 import os
+import sys
+from feeds import FeedClient, FeedScheduler, configured_adapters
+from seen_events import SeenEvents
 
-# Initialize Pub/Sub client
-publisher = pubsub_v1.PublisherClient()
+# shared/raw_payloads.py is copied next to main.py at deploy time; locally it sits in ../shared
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'shared'))
+from raw_payloads import encode_message, get_payload_store, serialize_payload
+
+# Initialize Pub/Sub client with client-side batching and flow control
+publisher = pubsub_v1.PublisherClient(
+    batch_settings=pubsub_v1.types.BatchSettings(
+        max_messages=100,
+        max_bytes=1024 * 1024,
+        max_latency=0.05
+    ),
+    publisher_options=pubsub_v1.types.PublisherOptions(
+        flow_control=pubsub_v1.types.PublishFlowControl(
+            message_limit=1000,
+            byte_limit=10 * 1024 * 1024,
+            limit_exceeded_behavior=pubsub_v1.types.LimitExceededBehavior.BLOCK
+        )
+    )
+)
 topic_path = publisher.topic_path(os.getenv('GOOGLE_CLOUD_PROJECT'), os.getenv('PUBSUB_TOPIC'))
 
+# Pooled HTTP client shared by all feed adapters, kept warm across invocations
+feed_client = FeedClient()
+
+# Feed adapters enabled by FEEDS, each polled at its own interval
+adapters = configured_adapters()
+
+# Content-addressed store for raw payloads; None keeps raw_data inline in messages
+payload_store = get_payload_store()
+
 @functions_framework.cloud_event
 def ingest_disaster_data(cloud_event):
-    """Cloud Function to ingest disaster data from USGS and NASA APIs"""
+    """Cloud Function to ingest disaster data from the configured feeds"""
     
     try:
-        # Fetch earthquake data from USGS
-        earthquake_data = fetch_usgs_earthquakes()
+        seen_events = SeenEvents(
+            bucket=os.getenv('INGESTION_STATE_BUCKET'),
+            path=os.getenv('SEEN_EVENTS_PATH', '/tmp/seen_events.json'),
+            # Remember events at least as long as the longest feed window reports them
+            retention_hours=max(
+                int(os.getenv('SEEN_EVENTS_RETENTION_HOURS', '48')),
+                max((adapter.window_hours for adapter in adapters), default=0)
+            )
+        ).load()
+        
+        # Poll the feeds that are due on this run concurrently
+        scheduler = FeedScheduler(adapters, seen_events.next_poll, jitter=float(os.getenv('FEED_JITTER', '0.1')))
+        all_events, polled = poll_feeds(scheduler)
         
-        # Fetch natural events from NASA EONET
-        nasa_data = fetch_nasa_eonet()
+        # Publish only events that are new or modified since the last run
+        new_events = seen_events.filter(all_events)
+        trim_tracks(new_events, seen_events)
+        store_raw_data(new_events)
         
-        # Combine and publish all data
-        all_events = earthquake_data + nasa_data
+        published, failed = publish_events(new_events)
+        if failed:
+            print(f"Failed to publish {len(failed)} events: {', '.join(failed)}")
         
-        for event in all_events:
-            publish_event(event)
+        seen_events.mark_published(new_events, failed)
+        try:
+            seen_events.save()
+            saved = True
+        except Exception as e:
+            print(f"Error saving seen-event state: {str(e)}")
+            saved = False
+        settle_validators(polled, failed, saved)
             
-        print(f"Successfully processed {len(all_events)} disaster events")
+        print(f"Successfully processed {published} of {len(new_events)} new disaster events "
+              f"({len(all_events) - len(new_events)} unchanged skipped)")
         
     except Exception as e:
         print(f"Error in disaster data ingestion: {str(e)}")
         raise
 
-def fetch_usgs_earthquakes():
-    """Fetch recent earthquake data from USGS API"""
-    try:
-        url = f"{os.getenv('USGS_API_BASE_URL')}/summary/all_hour.geojson"
-        response = requests.get(url, timeout=30)
-        response.raise_for_status()
-        
-        data = response.json()
-        events = []
-        
-        for feature in data.get('features', []):
-            properties = feature.get('properties', {})
-            geometry = feature.get('geometry', {})
-            
-            if geometry.get('type') == 'Point' and geometry.get('coordinates'):
-                coords = geometry['coordinates']
-                
-                event = {
-                    'event_id': f"usgs_{properties.get('id', str(uuid.uuid4()))}",
-                    'event_type': 'earthquake',
-                    'title': properties.get('title', 'Earthquake'),
-                    'description': properties.get('title', ''),
-                    'latitude': coords[1],
-                    'longitude': coords[0],
-                    'magnitude': properties.get('mag'),
-                    'severity': get_earthquake_severity(properties.get('mag')),
-                    'event_time': datetime.fromtimestamp(properties.get('time', 0) / 1000, tz=timezone.utc).isoformat(),
-                    'detected_time': datetime.now(timezone.utc).isoformat(),
-                    'source': 'USGS',
-                    'raw_data': json.dumps(properties)
-                }
-                events.append(event)
-        
-        return events
-        
-    except Exception as e:
-        print(f"Error fetching USGS data: {str(e)}")
-        return []
+def poll_feeds(scheduler):
+    """Poll every due adapter concurrently and return their events as message dicts
+    
+    Also returns the ids of the events each polled adapter reported, keyed
+    by adapter name. An adapter that fails is logged and stays due, so it is
+    retried on the next run without holding back the other feeds.
+    """
+    now = time.time()
+    due = scheduler.due(now)
+    if not due:
+        return [], {}
+    
+    events = []
+    polled = {}
+    with ThreadPoolExecutor(max_workers=len(due)) as executor:
+        futures = [(adapter, executor.submit(adapter.poll, feed_client)) for adapter in due]
+        for adapter, future in futures:
+            try:
+                records = future.result()
+            except Exception as e:
+                print(f"Error polling feed {adapter.name}: {str(e)}")
+                continue
+            scheduler.mark_polled(adapter, now)
+            polled[adapter.name] = {record.event_id for record in records}
+            events.extend(record.to_event() for record in records)
+    
+    print(f"Polled {', '.join(adapter.name for adapter in due)}")
+    return events, polled
 
-def fetch_nasa_eonet():
-    """Fetch natural events from NASA EONET API"""
-    try:
-        url = f"{os.getenv('NASA_EONET_API_BASE_URL')}/events"
-        params = {
-            'limit': 50,
-            'days': 1,
-            'category': 'severe-storms,volcanoes,wildfires'
-        }
-        
-        response = requests.get(url, params=params, timeout=30)
-        response.raise_for_status()
+def settle_validators(polled, failed_ids, saved):
+    """Commit the conditional-request validators of feeds whose events all made it
+    
+    A feed that reported a failed event, or every feed when the seen-event
+    state could not be saved, has its validators dropped. Its next fetch is
+    then a full 200 and the failed events are filtered in again, instead of
+    a 304 hiding them until the feed changes.
+    """
+    failed_ids = set(failed_ids)
+    for feed, event_ids in polled.items():
+        if saved and not event_ids & failed_ids:
+            feed_client.commit(feed)
+        else:
+            feed_client.discard(feed)
+
+def trim_tracks(events, seen_events):
+    """Reduce each EONET track to the geometry points not published yet
+    
+    The new points travel as track_points (with their index in the full
+    track) and the raw payload only carries those points, so a long-lived
+    storm or fire does not re-send its whole history on every update.
+    """
+    for event in events:
+        geometry = event.pop('_track', None)
+        if geometry is None:
+            continue
         
-        data = response.json()
-        events = []
+        start = seen_events.track_start(event['event_id'], [point.get('date') for point in geometry])
+        event['track_points'] = [
+            {
+                'point_index': index,
+                'point_time': point.get('date'),
+                'latitude': point['coordinates'][1],
+                'longitude': point['coordinates'][0],
+                'magnitude': point.get('magnitudeValue')
+            }
+            for index, point in enumerate(geometry[start:], start)
+            if point.get('type') == 'Point' and len(point.get('coordinates') or []) >= 2
+        ]
+        event['raw_data'] = dict(event['raw_data'], geometry=geometry[start:])
+
+def store_raw_data(events):
+    """Serialize each event's raw payload, offloading it to the payload store when configured
+    
+    Only events about to be published get here, so unchanged events never
+    cost an upload. With a store, raw_data becomes a 'sha256:<hex>' reference.
+    """
+    payloads = [serialize_payload(event['raw_data']) for event in events]
+    if payload_store is None:
+        for event, data in zip(events, payloads):
+            event['raw_data'] = data.decode('utf-8')
+        return
+    
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        references = list(executor.map(payload_store.put, payloads))
+    for event, reference in zip(events, references):
+        event['raw_data'] = reference
+
+def publish_events(events, max_attempts=3):
+    """Publish events to Pub/Sub in bulk and wait on all futures together
+    
+    Returns the number of published events and the ids of events that still
+    failed after max_attempts. Only failed events are retried.
+    """
+    pending = events
+    published = 0
+    encoding = os.getenv('MESSAGE_ENCODING', 'json')
+    
+    for attempt in range(1, max_attempts + 1):
+        futures = [
+            (event, publisher.publish(topic_path, data=encode_message(event, encoding)))
+            for event in pending
+        ]
         
-        for event in data.get('events', []):
-            geometry = event.get('geometry', [])
-            
-            if geometry and len(geometry) > 0:
-                coords = geometry[0].get('coordinates', [])
-                
-                if len(coords) >= 2:
-                    event_data = {
-                        'event_id': f"nasa_{event.get('id', str(uuid.uuid4()))}",
-                        'event_type': event.get('categories', [{}])[0].get('title', 'natural-event').lower(),
-                        'title': event.get('title', 'Natural Event'),
-                        'description': event.get('description', ''),
-                        'latitude': coords[1],
-                        'longitude': coords[0],
-                        'severity': get_nasa_severity(event),
-                        'event_time': event.get('geometry', [{}])[0].get('date', datetime.now(timezone.utc).isoformat()),
-                        'detected_time': datetime.now(timezone.utc).isoformat(),
-                        'source': 'NASA',
-                        'raw_data': json.dumps(event)
-                    }
-                    events.append(event_data)
+        failed = []
+        errors = {}
+        for event, future in futures:
+            try:
+                future.result()
+                published += 1
+            except Exception as e:
+                failed.append(event)
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
         
-        return events
+        if failed:
+            print(f"Publish attempt {attempt}: {len(failed)} of {len(futures)} events failed {errors}")
         
-    except Exception as e:
-        print(f"Error fetching NASA data: {str(e)}")
-        return []
-
-def get_earthquake_severity(magnitude):
-    """Determine severity based on earthquake magnitude"""
-    if magnitude is None:
-        return 'unknown'
-    elif magnitude >= 8.0:
-        return 'critical'
-    elif magnitude >= 6.0:
-        return 'high'
-    elif magnitude >= 4.0:
-        return 'medium'
-    else:
-        return 'low'
-
-def get_nasa_severity(event):
-    """Determine severity for NASA events"""
-    # Simple heuristic based on event type
-    event_type = event.get('categories', [{}])[0].get('title', '').lower()
+        pending = failed
+        if not pending:
+            break
     
-    if 'severe' in event_type:
-        return 'high'
-    elif 'volcano' in event_type:
-        return 'high'
-    elif 'wildfire' in event_type:
-        return 'medium'
-    else:
-        return 'low'
-
-def publish_event(event):
-    """Publish event to Pub/Sub topic"""
-    try:
-        message = json.dumps(event).encode('utf-8')
-        future = publisher.publish(topic_path, data=message)
-        future.result()
-        print(f"Published event: {event['event_id']}")
-    except Exception as e:
-        print(f"Error publishing event {event['event_id']}: {str(e)}") 
\ No newline at end of file
+    return published, [event['event_id'] for event in pending]
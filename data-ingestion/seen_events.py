@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import time
+
+
+class SeenEvents:
+    """Persisted fingerprint set of events already published
+
+    A fingerprint is a 64-bit hash of the event id plus its source version
+    (USGS `updated`, EONET geometry count and last date), so an event is
+    re-emitted only when the source revises it. State lives in a GCS object
+    when a bucket is configured, otherwise in a local file that survives
+    warm Cloud Function instances.
+
+    For EONET tracks the state also keeps, per event, how many geometry
+    points were published and the date of the last one, so later runs only
+    send newly appended points. The feed scheduler's next poll time per
+    adapter is persisted alongside.
+    """
+
+    def __init__(self, bucket=None, blob_name='ingestion/seen_events.json',
+                 path='/tmp/seen_events.json', retention_hours=48):
+        self.bucket = bucket
+        self.blob_name = blob_name
+        self.path = path
+        self.retention_seconds = retention_hours * 3600
+        self.seen = {}
+        self.tracks = {}
+        self.next_poll = {}
+        self._pending = {}
+        self._pending_tracks = {}
+
+    @staticmethod
+    def fingerprint(event_id, version):
+        digest = hashlib.blake2b(f"{event_id}|{version}".encode('utf-8'), digest_size=8)
+        return digest.hexdigest()
+
+    def load(self):
+        """Load the previous run's state; a missing or unreadable state starts empty"""
+        try:
+            raw = self._read()
+            if raw:
+                state = json.loads(raw)
+                self.seen = state.get('seen', {})
+                self.tracks = state.get('tracks', {})
+                self.next_poll = state.get('next_poll', {})
+        except Exception as e:
+            print(f"Could not load seen-event state, starting fresh: {str(e)}")
+            self.seen = {}
+            self.tracks = {}
+            self.next_poll = {}
+        return self
+
+    def filter(self, events):
+        """Return only events that are new or modified since they were last published
+
+        An event reported by several feeds in the same run (e.g. USGS
+        all_hour and all_week) is only returned once.
+        """
+        new_events = []
+        for event in events:
+            key = self.fingerprint(event['event_id'], event.pop('_version', ''))
+            if key in self.seen or self._pending.get(event['event_id']) == key:
+                continue
+            self._pending[event['event_id']] = key
+            new_events.append(event)
+        return new_events
+
+    def track_start(self, event_id, dates):
+        """Index of the first point of an event's track that was not published yet
+
+        `dates` are the track's point dates in feed order. When the points
+        already published are no longer a prefix of the track (the source
+        revised its history) the whole track is sent again.
+        """
+        sent, last_date = self.tracks.get(event_id, (0, None))[:2]
+        start = sent if 0 < sent <= len(dates) and dates[sent - 1] == last_date else 0
+        self._pending_tracks[event_id] = (len(dates), dates[-1] if dates else None)
+        return start
+
+    def mark_published(self, events, failed_ids=()):
+        """Record fingerprints of published events; failed events stay eligible for the next run"""
+        now = int(time.time())
+        failed_ids = set(failed_ids)
+        for event in events:
+            key = self._pending.pop(event['event_id'], None)
+            if key and event['event_id'] not in failed_ids:
+                self.seen[key] = now
+            track = self._pending_tracks.pop(event['event_id'], None)
+            if track and event['event_id'] not in failed_ids:
+                self.tracks[event['event_id']] = [track[0], track[1], now]
+
+    def save(self):
+        """Prune fingerprints past retention and persist"""
+        now = time.time()
+        cutoff = now - self.retention_seconds
+        self.seen = {key: ts for key, ts in self.seen.items() if ts >= cutoff}
+        self.tracks = {event_id: track for event_id, track in self.tracks.items() if track[2] >= cutoff}
+        self._write(json.dumps(
+            {'seen': self.seen, 'tracks': self.tracks, 'next_poll': self.next_poll},
+            separators=(',', ':')
+        ))
+
+    def _read(self):
+        if self.bucket:
+            blob = self._blob()
+            return blob.download_as_text() if blob.exists() else None
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                return f.read()
+        return None
+
+    def _write(self, data):
+        if self.bucket:
+            self._blob().upload_from_string(data, content_type='application/json')
+            return
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
+
+    def _blob(self):
+        from google.cloud import storage
+        return storage.Client().bucket(self.bucket).blob(self.blob_name)
@@ -0,0 +1,237 @@
+"""Batch backfill / replay of historical events through the streaming pipeline's transforms
+
+Reads events from the BigQuery events table (a detected_time range), or from
+JSONL files of Pub/Sub message payloads on GCS or local disk, and runs them
+through the same geocode, enrich and scoring transforms as the streaming
+job with batch settings: large scoring batches, a geocode cache warmed in
+bulk from addresses already known in the input, demographics loaded once,
+and BigQuery file-loads writes, or upserts when re-processing rows of the
+events table itself. Any argument not listed below
+is passed on as a Beam pipeline option.
+
+    # Re-score yesterday's events with a new model, replacing their rows
+    python backfill.py --source bigquery --start 2024-10-16 --end 2024-10-17 \\
+        --model-dir gs://bucket/model --write-mode upsert \\
+        --runner DataflowRunner --project my-project --region us-central1 --temp_location gs://bucket/temp
+
+    # Local replay on DirectRunner: JSONL in, JSONL out
+    python backfill.py --source jsonl --input 'archive/*.jsonl' --output out/events \\
+        --demographics-csv demographics.csv --model-dir ./model --geocoding-url http://localhost:8080/geocode/json
+"""
+import argparse
+import json
+import logging
+import os
+from datetime import datetime, timezone
+
+import apache_beam as beam
+from apache_beam.io import ReadFromText, WriteToText
+from apache_beam.io.gcp.bigquery import ReadFromBigQuery, WriteToBigQuery
+from apache_beam.options.pipeline_options import PipelineOptions
+
+from pipeline import GEOCODING_URL, EnrichEvents, GeocodeEvents, ParseMessage, ScoreEvents, event_fingerprint, normalize_timestamp
+from rollups import HourlyRollups
+from sinks import WriteDeadLetters, WriteEvents
+from tracks import SplitTrackPoints, WriteTrackPoints
+
+
+class NormalizeRow(beam.DoFn):
+    """Turn an events-table row into the event dict ParseMessage would have produced"""
+
+    def process(self, row):
+        event = dict(row)
+        for field in ('event_time', 'detected_time'):
+            value = event.get(field)
+            if isinstance(value, datetime):
+                event[field] = value.astimezone(timezone.utc).strftime('%Y-%m-%d %H:%M:%S UTC')
+            elif value is not None:
+                event[field] = normalize_timestamp(str(value))
+        yield event
+
+
+def latest_detected(events):
+    """The copy with the latest detected_time; copies with one fingerprint differ in nothing else"""
+    return max(events, key=lambda event: event.get('detected_time') or '')
+
+
+class DeduplicateBatch(beam.PTransform):
+    """Keep one event per fingerprint across the whole bounded input
+
+    The most recently detected copy is kept, so reruns over the same input
+    write the same rows.
+    """
+
+    def expand(self, events):
+        return (
+            events
+            | 'Key by Fingerprint' >> beam.Map(lambda event: (event_fingerprint(event), event))
+            | 'Group Duplicates' >> beam.GroupByKey()
+            | 'Latest of Group' >> beam.Map(lambda item: latest_detected(item[1]))
+        )
+
+
+def known_address(event):
+    """(lat, lng, address) for events that were already geocoded"""
+    if event.get('address'):
+        yield event['latitude'], event['longitude'], event['address']
+
+
+def table_name(table):
+    return f"{os.getenv('GOOGLE_CLOUD_PROJECT')}.{os.getenv('BIGQUERY_DATASET')}.{table}"
+
+
+def read_events(pipeline, args):
+    if args.source == 'bigquery':
+        query = f"""
+        SELECT *
+        FROM `{table_name(os.getenv('BIGQUERY_TABLE_EVENTS', 'disaster_events'))}`
+        WHERE detected_time >= TIMESTAMP('{args.start}') AND detected_time < TIMESTAMP('{args.end}')
+        """
+        return (
+            pipeline
+            | 'Read from BigQuery' >> ReadFromBigQuery(
+                query=query, use_standard_sql=True, method=ReadFromBigQuery.Method.DIRECT_READ
+            )
+            | 'Normalize Rows' >> beam.ParDo(NormalizeRow())
+        )
+    return (
+        pipeline
+        | 'Read JSONL' >> ReadFromText(args.input)
+        | 'Parse Messages' >> beam.ParDo(ParseMessage())
+    )
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--source', choices=['bigquery', 'jsonl'], required=True)
+    parser.add_argument('--input', help='JSONL file pattern (local path or gs://) for --source jsonl')
+    parser.add_argument('--start', help='Inclusive detected_time lower bound for --source bigquery')
+    parser.add_argument('--end', help='Exclusive detected_time upper bound for --source bigquery')
+    parser.add_argument('--output', help='Write JSONL files with this prefix instead of BigQuery')
+    parser.add_argument('--output-table', help='Events table to write (default BIGQUERY_TABLE_EVENTS)')
+    parser.add_argument('--write-mode', choices=['load', 'storage', 'upsert'],
+                        help='load appends through load jobs, storage through the Storage Write API; '
+                             'upsert replaces each event\'s current row (default for --source bigquery, '
+                             'otherwise load)')
+    parser.add_argument('--geocoding-url', default=GEOCODING_URL)
+    parser.add_argument('--geocode-batch-size', type=int, default=500)
+    parser.add_argument('--demographics-csv', help='Local demographics export instead of the BigQuery table')
+    parser.add_argument('--scoring', choices=['local', 'remote', 'none'], default='local')
+    parser.add_argument('--model-dir', default=os.getenv('MODEL_DIR'),
+                        help='Training artifacts: the model for --scoring local, the scaler for --scoring remote')
+    parser.add_argument('--scoring-batch-size', type=int, default=1000)
+    parser.add_argument('--rollups', action='store_true',
+                        help='Also write hourly rollups; they supersede the stored ones, so backfill whole hours')
+    return parser
+
+
+def run_backfill(argv=None):
+    args, beam_args = build_parser().parse_known_args(argv)
+    if args.source == 'jsonl' and not args.input:
+        raise ValueError("--input is required for --source jsonl")
+    if args.scoring == 'local' and not args.model_dir:
+        raise ValueError("--scoring local requires --model-dir or MODEL_DIR")
+    if args.source == 'bigquery':
+        if not (args.start and args.end):
+            raise ValueError("--start and --end are required for --source bigquery")
+        # Both end up in the query text, so only accept real timestamps
+        datetime.fromisoformat(args.start)
+        datetime.fromisoformat(args.end)
+        # Appending re-processed rows to the table they came from would duplicate them
+        if args.write_mode is None:
+            args.write_mode = 'upsert'
+        if args.write_mode != 'upsert' and not args.output and args.output_table in (
+            None, os.getenv('BIGQUERY_TABLE_EVENTS', 'disaster_events')
+        ):
+            raise ValueError("--source bigquery rewrites the events table; use --write-mode upsert or --output-table")
+    elif args.write_mode is None:
+        args.write_mode = 'load'
+
+    options = PipelineOptions(beam_args)
+
+    with beam.Pipeline(options=options) as pipeline:
+        split = (
+            read_events(pipeline, args)
+            | 'Deduplicate Events' >> DeduplicateBatch()
+            | 'Split Track Points' >> beam.ParDo(SplitTrackPoints()).with_outputs(
+                SplitTrackPoints.TRACK_POINTS, main='events'
+            )
+        )
+        events = split.events
+
+        # Addresses already in the input (e.g. re-scored table rows) warm the geocode cache in bulk
+        known_addresses = events | 'Known Addresses' >> beam.FlatMap(known_address)
+
+        processed = (
+            events
+            | 'Geocode Events' >> GeocodeEvents(
+                batch_size=args.geocode_batch_size,
+                max_wait_seconds=5.0,
+                known_addresses=known_addresses,
+                geocoding_api_key=os.getenv('GOOGLE_GEOCODING_API_KEY'),
+                geocoding_url=args.geocoding_url,
+                geocode_cache_precision=int(os.getenv('GEOCODE_CACHE_PRECISION', '3')),
+                geocode_cache_size=int(os.getenv('GEOCODE_CACHE_SIZE', '100000')),
+                geocode_cache_ttl_seconds=int(os.getenv('GEOCODE_CACHE_TTL_SECONDS', '86400')),
+                geocode_cache_path=os.getenv('GEOCODE_CACHE_PATH'),
+                geocode_concurrency=int(os.getenv('GEOCODE_CONCURRENCY', '16'))
+            )
+            | 'Enrich Events' >> EnrichEvents(
+                table=table_name(os.getenv('BIGQUERY_TABLE_DEMOGRAPHICS', 'demographics')),
+                project_id=os.getenv('GOOGLE_CLOUD_PROJECT'),
+                refresh_seconds=0,
+                csv_path=args.demographics_csv
+            )
+        )
+
+        if args.scoring != 'none':
+            processed = processed | 'Calculate Impact Score' >> ScoreEvents(
+                vertex_ai_endpoint=os.getenv('VERTEX_AI_ENDPOINT_NAME'),
+                model_dir=args.model_dir if args.scoring == 'local' else None,
+                scaler_dir=args.model_dir if args.scoring == 'remote' else None,
+                batch_size=args.scoring_batch_size,
+                max_wait_seconds=30.0
+            )
+
+        if args.output:
+            (
+                processed
+                | 'To JSON' >> beam.Map(lambda event: json.dumps(event, default=str))
+                | 'Write JSONL' >> WriteToText(args.output, file_name_suffix='.jsonl')
+            )
+            (
+                split[SplitTrackPoints.TRACK_POINTS]
+                | 'Track Points to JSON' >> beam.Map(json.dumps)
+                | 'Write Track Points JSONL' >> WriteToText(f"{args.output}_tracks", file_name_suffix='.jsonl')
+            )
+        else:
+            (
+                processed
+                | 'Write Events' >> WriteEvents(
+                    table=table_name(args.output_table or os.getenv('BIGQUERY_TABLE_EVENTS', 'disaster_events')),
+                    mode=args.write_mode
+                )
+                | 'Write Dead Letters' >> WriteDeadLetters(
+                    table=table_name(os.getenv('BIGQUERY_TABLE_DEAD_LETTER', 'disaster_events_dead_letter'))
+                )
+            )
+            split[SplitTrackPoints.TRACK_POINTS] | 'Write Track Points' >> WriteTrackPoints(
+                table=table_name(os.getenv('BIGQUERY_TABLE_TRACKS', 'disaster_event_tracks'))
+            )
+
+        if args.rollups and not args.output:
+            (
+                processed
+                | 'Hourly Rollups' >> HourlyRollups()
+                | 'Write Rollups' >> WriteToBigQuery(
+                    table=table_name(os.getenv('BIGQUERY_TABLE_ROLLUPS', 'disaster_event_rollups')),
+                    method=WriteToBigQuery.Method.FILE_LOADS,
+                    write_disposition=beam.io.BigQueryDisposition.WRITE_APPEND,
+                    create_disposition=beam.io.BigQueryDisposition.CREATE_NEVER
+                )
+            )
+
+
+if __name__ == '__main__':
+    logging.getLogger().setLevel(logging.INFO)
+    run_backfill()
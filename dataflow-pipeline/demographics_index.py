@@ -0,0 +1,169 @@
+import csv
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+DEFAULT_DEMOGRAPHICS = {'population_density': None, 'hospitals_count': 0, 'schools_count': 0}
+
+
+class DemographicsIndex:
+    """Grid-bucketed nearest-neighbour index over demographics locations
+
+    Locations are sorted by grid cell so every cell is a contiguous slice of
+    the coordinate arrays. A lookup only scans the 3x3 block of cells around
+    the query point, which keeps it well under a millisecond regardless of
+    table size.
+    """
+
+    def __init__(self, latitudes, longitudes, population_density, hospitals_count,
+                 schools_count, last_updated=None, max_distance=0.1):
+        self.max_distance = max_distance
+        self.last_updated = last_updated
+
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        rows = np.floor(latitudes / max_distance).astype(np.int64)
+        cols = np.floor(longitudes / max_distance).astype(np.int64)
+        order = np.lexsort((cols, rows))
+
+        self.latitudes = latitudes[order]
+        self.longitudes = longitudes[order]
+        self.population_density = np.asarray(population_density, dtype=np.float64)[order]
+        self.hospitals_count = np.asarray(hospitals_count, dtype=np.int64)[order]
+        self.schools_count = np.asarray(schools_count, dtype=np.int64)[order]
+
+        # Map each occupied cell to its [start, end) slice in the sorted arrays
+        self._cells = {}
+        if len(order):
+            rows, cols = rows[order], cols[order]
+            breaks = np.flatnonzero((np.diff(rows) != 0) | (np.diff(cols) != 0)) + 1
+            starts = np.concatenate(([0], breaks))
+            ends = np.concatenate((breaks, [len(order)]))
+            for start, end in zip(starts, ends):
+                self._cells[(int(rows[start]), int(cols[start]))] = (int(start), int(end))
+
+    def __len__(self):
+        return len(self.latitudes)
+
+    def lookup(self, lat, lng):
+        """Return demographics of the nearest location within max_distance degrees"""
+        row = math.floor(lat / self.max_distance)
+        col = math.floor(lng / self.max_distance)
+
+        best = None
+        best_distance = math.inf
+        for d_row in (-1, 0, 1):
+            for d_col in (-1, 0, 1):
+                span = self._cells.get((row + d_row, col + d_col))
+                if span is None:
+                    continue
+                start, end = span
+                d_lat = np.abs(self.latitudes[start:end] - lat)
+                d_lng = np.abs(self.longitudes[start:end] - lng)
+                # Same box filter and L1 ordering as the original BigQuery lookup
+                distance = np.where(
+                    (d_lat < self.max_distance) & (d_lng < self.max_distance),
+                    d_lat + d_lng,
+                    np.inf
+                )
+                i = int(np.argmin(distance))
+                if distance[i] < best_distance:
+                    best_distance = distance[i]
+                    best = start + i
+
+        if best is None:
+            return dict(DEFAULT_DEMOGRAPHICS)
+
+        density = self.population_density[best]
+        return {
+            'population_density': None if np.isnan(density) else float(density),
+            'hospitals_count': int(self.hospitals_count[best]),
+            'schools_count': int(self.schools_count[best])
+        }
+
+    @classmethod
+    def from_rows(cls, rows, max_distance=0.1):
+        """Build an index from an iterable of demographics rows (mappings)"""
+        latitudes, longitudes, density, hospitals, schools = [], [], [], [], []
+        last_updated = None
+        for row in rows:
+            latitudes.append(float(row['latitude']))
+            longitudes.append(float(row['longitude']))
+            value = row.get('population_density')
+            density.append(np.nan if value in (None, '') else float(value))
+            hospitals.append(int(row.get('hospitals_count') or 0))
+            schools.append(int(row.get('schools_count') or 0))
+            updated = row.get('last_updated')
+            if updated is not None and (last_updated is None or updated > last_updated):
+                last_updated = updated
+
+        return cls(latitudes, longitudes, density, hospitals, schools,
+                   last_updated=last_updated, max_distance=max_distance)
+
+    @classmethod
+    def from_bigquery(cls, client, table, max_distance=0.1):
+        """Load the full demographics table from BigQuery"""
+        query = f"""
+        SELECT
+            latitude,
+            longitude,
+            population_density,
+            hospitals_count,
+            schools_count,
+            last_updated
+        FROM `{table}`
+        """
+        rows = (dict(row.items()) for row in client.query(query).result())
+        return cls.from_rows(rows, max_distance=max_distance)
+
+    @classmethod
+    def from_csv(cls, path, max_distance=0.1):
+        """Load demographics from a local CSV export (same columns as the table)"""
+        with open(path, newline='') as f:
+            return cls.from_rows(csv.DictReader(f), max_distance=max_distance)
+
+
+def bigquery_last_updated(client, table):
+    """Return the newest last_updated value in the demographics table"""
+    query = f"SELECT MAX(last_updated) AS last_updated FROM `{table}`"
+    for row in client.query(query).result():
+        return row.last_updated
+    return None
+
+
+def benchmark(csv_path, n_lookups=100000):
+    """Time random lookups against an index loaded from a local CSV"""
+    start = time.perf_counter()
+    index = DemographicsIndex.from_csv(csv_path)
+    load_seconds = time.perf_counter() - start
+
+    if not len(index):
+        print(f"No locations found in {csv_path}")
+        return
+
+    rng = np.random.default_rng(42)
+    # Sample query points around known locations so the benchmark exercises hits and misses
+    picks = rng.integers(0, len(index), n_lookups)
+    lats = index.latitudes[picks] + rng.normal(0, 0.1, n_lookups)
+    lngs = index.longitudes[picks] + rng.normal(0, 0.1, n_lookups)
+
+    start = time.perf_counter()
+    hits = 0
+    for lat, lng in zip(lats.tolist(), lngs.tolist()):
+        if index.lookup(lat, lng)['population_density'] is not None:
+            hits += 1
+    lookup_seconds = time.perf_counter() - start
+
+    print(f"Loaded {len(index)} locations in {load_seconds * 1000:.1f} ms")
+    print(f"{n_lookups} lookups in {lookup_seconds:.2f} s "
+          f"({lookup_seconds / n_lookups * 1e6:.1f} us/lookup, {hits} hits)")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or not os.path.exists(sys.argv[1]):
+        print("Usage: python demographics_index.py <demographics.csv> [n_lookups]")
+        sys.exit(1)
+    benchmark(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 100000)
@@ -0,0 +1,120 @@
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class GeocodeCache:
+    """Reverse-geocode cache keyed on quantized lat/lng cells
+
+    Entries live in an in-memory LRU with a TTL. When a path is given they are
+    also written through to a SQLite file, so a restarted worker on the same
+    disk starts warm. Negative results (coordinates with no address, e.g. at
+    sea) are cached as well since they are just as repetitive.
+    """
+
+    def __init__(self, precision=3, max_size=10000, ttl_seconds=86400, path=None):
+        self.precision = precision
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+        self._scale = 10 ** precision
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+
+        if path:
+            try:
+                self._db = sqlite3.connect(path, check_same_thread=False)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS geocode "
+                    "(cell TEXT PRIMARY KEY, address TEXT, cached_at REAL NOT NULL)"
+                )
+                self._db.execute(
+                    "DELETE FROM geocode WHERE cached_at < ?",
+                    (time.time() - ttl_seconds,)
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                logging.warning(f"Geocode cache file {path} unavailable, using memory only: {str(e)}")
+                self._db = None
+
+    def cell(self, lat, lng):
+        """Quantize coordinates to the cache cell key"""
+        return f"{round(lat * self._scale)}:{round(lng * self._scale)}"
+
+    def get(self, lat, lng):
+        """Return (found, address) for the cell containing the coordinates"""
+        key = self.cell(lat, lng)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                address, cached_at = entry
+                if now - cached_at < self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    return True, address
+                del self._entries[key]
+
+            if self._db is None:
+                return False, None
+
+            row = self._db.execute(
+                "SELECT address, cached_at FROM geocode WHERE cell = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] >= self.ttl_seconds:
+                return False, None
+
+            # Promote persisted entries into the in-memory tier
+            self._remember(key, row[0], row[1])
+            return True, row[0]
+
+    def put(self, lat, lng, address):
+        key = self.cell(lat, lng)
+        now = time.time()
+
+        with self._lock:
+            self._remember(key, address, now)
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO geocode (cell, address, cached_at) VALUES (?, ?, ?)",
+                        (key, address, now)
+                    )
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    logging.warning(f"Geocode cache write failed: {str(e)}")
+
+    def put_many(self, entries):
+        """Bulk-load (lat, lng, address) entries, e.g. to warm the cache before a backfill"""
+        now = time.time()
+        rows = [(self.cell(lat, lng), address, now) for lat, lng, address in entries]
+
+        with self._lock:
+            for key, address, cached_at in rows:
+                self._remember(key, address, cached_at)
+            if self._db is not None:
+                try:
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO geocode (cell, address, cached_at) VALUES (?, ?, ?)", rows
+                    )
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    logging.warning(f"Geocode cache write failed: {str(e)}")
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remember(self, key, address, cached_at):
+        self._entries[key] = (address, cached_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
@@ -1,141 +1,450 @@
 import apache_beam as beam
+from apache_beam.coders import StrUtf8Coder
+from apache_beam.metrics import Metrics
 from apache_beam.options.pipeline_options import PipelineOptions
 from apache_beam.io import ReadFromPubSub
 from apache_beam.io.gcp.bigquery import WriteToBigQuery
 from apache_beam.io.gcp.bigquery import ReadFromBigQuery
+from apache_beam.transforms import window
+from apache_beam.transforms.periodicsequence import PeriodicImpulse
+from apache_beam.transforms.timeutil import TimeDomain
+from apache_beam.transforms.trigger import AccumulationMode, AfterCount, Repeatedly
+from apache_beam.transforms.userstate import ReadModifyWriteStateSpec, TimerSpec, on_timer
+from apache_beam.utils.timestamp import Duration, Timestamp
+import hashlib
 import json
+import orjson
+import re
 import requests
+from requests.adapters import HTTPAdapter
 import os
+import time
+import zstandard
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 import logging
+import sys
+# shared/raw_payloads.py is copied next to pipeline.py at deploy time; locally it sits in ../shared
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'shared'))
+from raw_payloads import decode_message
+from demographics_index import DEFAULT_DEMOGRAPHICS, DemographicsIndex, bigquery_last_updated
+from geocode_cache import GeocodeCache
+from scoring import LocalModel, ScaledEndpoint, load_scaler, prediction_value
+from rollups import HourlyRollups
+from sinks import WriteDeadLetters, WriteEvents
+from tracks import SplitTrackPoints, WriteTrackPoints
 
-class DisasterEventProcessor(beam.DoFn):
-    """Process and enrich disaster events"""
+# UTC (or offset-less) ISO-8601 timestamps, normalized without building datetimes
+ISO_UTC_TIMESTAMP = re.compile(r'(\d{4}-\d{2}-\d{2})[T ](\d{2}:\d{2}:\d{2})(?:\.\d+)?(?:Z|[+-]00:?00| UTC)?$')
+
+def normalize_timestamp(value):
+    """Convert an ISO-8601 timestamp string to 'YYYY-MM-DD HH:MM:SS UTC'
     
-    def __init__(self, geocoding_api_key, project_id, dataset_id):
-        self.geocoding_api_key = geocoding_api_key
-        self.project_id = project_id
-        self.dataset_id = dataset_id
+    Raises ValueError for missing values and strings that aren't ISO-8601.
+    """
+    if not isinstance(value, str):
+        raise ValueError(f"Not a timestamp: {value!r}")
+    match = ISO_UTC_TIMESTAMP.match(value)
+    if match:
+        return f"{match.group(1)} {match.group(2)} UTC"
+    dt = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc)
+    return dt.strftime('%Y-%m-%d %H:%M:%S UTC')
+
+class ParseMessage(beam.DoFn):
+    """Parse JSON or zstd-compressed JSON Pub/Sub messages into event dicts with normalized timestamps"""
+    
+    def __init__(self):
+        self.timestamp_fallbacks = Metrics.counter(self.__class__, 'timestamp_fallbacks')
         
     def setup(self):
-        # Initialize BigQuery client for demographics lookup
-        from google.cloud import bigquery
-        self.bq_client = bigquery.Client(project=self.project_id)
+        self.decompressor = zstandard.ZstdDecompressor()
         
     def process(self, element):
         try:
-            # Parse the Pub/Sub message
-            event = json.loads(element.decode('utf-8'))
+            event = decode_message(element, self.decompressor, orjson.loads)
+            missing = [field for field in ('event_id', 'latitude', 'longitude') if field not in event]
+            if missing:
+                raise ValueError(f"Missing fields: {', '.join(missing)}")
+        except Exception as e:
+            logging.error(f"Error parsing event: {str(e)}")
+            # Don't fail the pipeline, just log the error
+            return
             
-            # Geocode the location
-            address = self.geocode_location(event['latitude'], event['longitude'])
-            event['address'] = address
+        for field in ('event_time', 'detected_time'):
+            try:
+                event[field] = normalize_timestamp(event.get(field))
+            except ValueError:
+                self.timestamp_fallbacks.inc()
+                event[field] = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S UTC')
+        yield event
+
+def event_fingerprint(event):
+    """Hash of the event content, ignoring when our ingestion happened to see it"""
+    content = {key: value for key, value in event.items() if key != 'detected_time'}
+    return hashlib.blake2b(json.dumps(content, sort_keys=True, default=str).encode('utf-8'), digest_size=8).hexdigest()
+
+class DeduplicateEventsFn(beam.DoFn):
+    """Drop repeated deliveries of an event before enrichment
+    
+    Keeps the content fingerprint of the last emitted version per event_id.
+    An event passes only on first sight or when the source revised it. The
+    state is cleared by a processing-time timer after ttl_seconds.
+    """
+    
+    FINGERPRINT = ReadModifyWriteStateSpec('fingerprint', StrUtf8Coder())
+    EXPIRY = TimerSpec('expiry', TimeDomain.REAL_TIME)
+    
+    def __init__(self, ttl_seconds=172800):
+        self.ttl_seconds = ttl_seconds
+        self.duplicates = Metrics.counter(self.__class__, 'duplicate_events')
+        
+    def process(self, element,
+                fingerprint=beam.DoFn.StateParam(FINGERPRINT),
+                expiry=beam.DoFn.TimerParam(EXPIRY)):
+        _, event = element
+        current = event_fingerprint(event)
+        if fingerprint.read() == current:
+            self.duplicates.inc()
+            return
             
-            # Enrich with demographics data
-            demographics = self.get_demographics(event['latitude'], event['longitude'])
-            event['population_density'] = demographics.get('population_density')
+        fingerprint.write(current)
+        expiry.set(Timestamp.now() + Duration(seconds=self.ttl_seconds))
+        yield event
+        
+    @on_timer(EXPIRY)
+    def expire(self, fingerprint=beam.DoFn.StateParam(FINGERPRINT)):
+        fingerprint.clear()
+
+class DeduplicateEvents(beam.PTransform):
+    """Key events by event_id and drop duplicate deliveries"""
+    
+    def __init__(self, ttl_seconds=172800):
+        super().__init__()
+        self.ttl_seconds = ttl_seconds
+        
+    def expand(self, events):
+        return (
+            events
+            | 'Key by Event Id' >> beam.Map(lambda event: (event['event_id'], event))
+            | 'Drop Duplicates' >> beam.ParDo(DeduplicateEventsFn(self.ttl_seconds))
+        )
+
+GEOCODING_URL = "https://maps.googleapis.com/maps/api/geocode/json"
+
+class GeocodeEventsFn(beam.DoFn):
+    """Reverse-geocode batches of events
+    
+    Each batch is answered from the per-worker cache where possible, and
+    each missing cell goes to the Geocoding API once, concurrently on a
+    bounded thread pool. `geocoding_url` can point at a local stand-in (see
+    benchmarks/).
+    """
+    
+    def __init__(self, geocoding_api_key, geocoding_url=GEOCODING_URL,
+                 geocode_cache_precision=3, geocode_cache_size=10000,
+                 geocode_cache_ttl_seconds=86400, geocode_cache_path=None,
+                 geocode_concurrency=16):
+        self.geocoding_api_key = geocoding_api_key
+        self.geocoding_url = geocoding_url
+        self.geocode_cache_precision = geocode_cache_precision
+        self.geocode_cache_size = geocode_cache_size
+        self.geocode_cache_ttl_seconds = geocode_cache_ttl_seconds
+        self.geocode_cache_path = geocode_cache_path
+        self.geocode_concurrency = geocode_concurrency
+        self.geocode_cache_hits = Metrics.counter(self.__class__, 'geocode_cache_hits')
+        self.geocode_cache_misses = Metrics.counter(self.__class__, 'geocode_cache_misses')
+        self.geocode_failures = Metrics.counter(self.__class__, 'geocode_failures')
+        self.geocode_latency_ms = Metrics.distribution(self.__class__, 'geocode_latency_ms')
+        
+    def setup(self):
+        # Shared connection pool for geocoding requests and a concurrency limit
+        self.http = requests.Session()
+        self.http.mount('https://', HTTPAdapter(pool_maxsize=self.geocode_concurrency))
+        self.http.mount('http://', HTTPAdapter(pool_maxsize=self.geocode_concurrency))
+        self.executor = ThreadPoolExecutor(max_workers=self.geocode_concurrency, thread_name_prefix='geocode')
+        
+        # Per-worker reverse-geocode cache, optionally persisted to local disk
+        self.geocode_cache = GeocodeCache(
+            precision=self.geocode_cache_precision,
+            max_size=self.geocode_cache_size,
+            ttl_seconds=self.geocode_cache_ttl_seconds,
+            path=self.geocode_cache_path
+        )
+        self.warmed = False
+        
+    def teardown(self):
+        if getattr(self, 'geocode_cache', None) is not None:
+            self.geocode_cache.close()
+        if getattr(self, 'executor', None) is not None:
+            self.executor.shutdown(wait=False)
+        if getattr(self, 'http', None) is not None:
+            self.http.close()
             
-            # Convert timestamps to proper format
-            event['event_time'] = self.parse_timestamp(event['event_time'])
-            event['detected_time'] = self.parse_timestamp(event['detected_time'])
+    def process(self, batch, known_addresses=None):
+        # Seed the cache once per worker with addresses already resolved upstream (backfills)
+        if known_addresses is not None and not self.warmed:
+            self.geocode_cache.put_many(known_addresses)
+            self.warmed = True
             
+        events = list(batch)
+        
+        # Answer geocodes from the cache inline and send each missing cell to the pool once.
+        # Pool calls return their own timings; metrics are only recorded on this thread
+        # since Beam's metric context is thread-local.
+        pending_cells = {}
+        geocode_calls = {}
+        for i, event in enumerate(events):
+            lat, lng = event['latitude'], event['longitude']
+            found, address = self.geocode_cache.get(lat, lng)
+            if found:
+                self.geocode_cache_hits.inc()
+                event['address'] = address
+            else:
+                self.geocode_cache_misses.inc()
+                cell = self.geocode_cache.cell(lat, lng)
+                if cell not in geocode_calls:
+                    geocode_calls[cell] = self.executor.submit(self._timed_call, self.geocode_location, lat, lng)
+                pending_cells[i] = cell
+                
+        geocoded = {}
+        for cell, call in geocode_calls.items():
+            address, seconds, error = call.result()
+            self.geocode_latency_ms.update(int(seconds * 1000))
+            if error is not None:
+                self.geocode_failures.inc()
+                logging.warning(f"Geocoding failed: {str(error)}")
+            geocoded[cell] = address
+            
+        for i, event in enumerate(events):
+            if i in pending_cells:
+                event['address'] = geocoded[pending_cells[i]]
             yield event
             
+    @staticmethod
+    def _timed_call(fn, *args):
+        """Run fn on a pool thread and return (result, seconds, error)"""
+        start = time.perf_counter()
+        try:
+            return fn(*args), time.perf_counter() - start, None
         except Exception as e:
-            logging.error(f"Error processing event: {str(e)}")
-            # Don't fail the pipeline, just log the error
+            return None, time.perf_counter() - start, e
             
     def geocode_location(self, lat, lng):
         """Get address from coordinates using Google Geocoding API"""
+        params = {
+            'latlng': f"{lat},{lng}",
+            'key': self.geocoding_api_key
+        }
+        response = self.http.get(self.geocoding_url, params=params, timeout=10)
+        response.raise_for_status()
+        
+        data = response.json()
+        address = None
+        if data.get('results'):
+            address = data['results'][0]['formatted_address']
+        
+        # Only successful lookups are cached; failures are retried next time
+        self.geocode_cache.put(lat, lng, address)
+        return address
+
+class GeocodeEvents(beam.PTransform):
+    """Geocode stage: reshuffled away from upstream steps and batched per API fan-out
+    
+    `known_addresses`, a PCollection of (lat, lng, address), warms each
+    worker's cache in bulk before its first batch.
+    """
+    
+    def __init__(self, batch_size=100, max_wait_seconds=0.5, known_addresses=None, **geocode_options):
+        super().__init__()
+        self.batch_size = batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self.known_addresses = known_addresses
+        self.geocode_options = geocode_options
+        
+    def expand(self, events):
+        side_inputs = {}
+        if self.known_addresses is not None:
+            side_inputs['known_addresses'] = beam.pvalue.AsList(self.known_addresses)
+        return (
+            events
+            | 'Reshuffle' >> beam.Reshuffle()
+            | 'Batch' >> beam.BatchElements(
+                min_batch_size=1,
+                max_batch_size=self.batch_size,
+                max_batch_duration_secs=self.max_wait_seconds
+            )
+            | 'Geocode' >> beam.ParDo(GeocodeEventsFn(**self.geocode_options), **side_inputs)
+        )
+
+class LoadDemographics(beam.DoFn):
+    """Emit the demographics index for each impulse, reloading only when the table changed
+    
+    With `csv_path` the index is read once from a local CSV export instead.
+    """
+    
+    def __init__(self, table, project_id=None, bigquery_client=None, csv_path=None):
+        self.table = table
+        self.project_id = project_id
+        self.bigquery_client = bigquery_client
+        self.csv_path = csv_path
+        
+    def setup(self):
+        self.index = None
+        self.version = None
+        if self.csv_path:
+            return
+        if self.bigquery_client is not None:
+            self.bq_client = self.bigquery_client
+        else:
+            from google.cloud import bigquery
+            self.bq_client = bigquery.Client(project=self.project_id)
+        
+    def process(self, impulse):
+        if self.csv_path:
+            if self.index is None:
+                self.index = DemographicsIndex.from_csv(self.csv_path)
+                logging.info(f"Demographics index loaded: {len(self.index)} locations from {self.csv_path}")
+            yield self.index
+            return
         try:
-            url = "https://maps.googleapis.com/maps/api/geocode/json"
-            params = {
-                'latlng': f"{lat},{lng}",
-                'key': self.geocoding_api_key
-            }
-            
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            
-            data = response.json()
-            if data.get('results'):
-                return data['results'][0]['formatted_address']
-            return None
-            
-        except Exception as e:
-            logging.warning(f"Geocoding failed: {str(e)}")
-            return None
-            
-    def get_demographics(self, lat, lng):
-        """Get demographics data for the location"""
-        try:
-            # Simple lookup based on proximity
-            query = f"""
-            SELECT 
-                population_density,
-                hospitals_count,
-                schools_count
-            FROM `{self.project_id}.{self.dataset_id}.demographics`
-            WHERE ABS(latitude - {lat}) < 0.1 
-            AND ABS(longitude - {lng}) < 0.1
-            ORDER BY ABS(latitude - {lat}) + ABS(longitude - {lng})
-            LIMIT 1
-            """
-            
-            query_job = self.bq_client.query(query)
-            results = query_job.result()
-            
-            for row in results:
-                return {
-                    'population_density': row.population_density,
-                    'hospitals_count': row.hospitals_count,
-                    'schools_count': row.schools_count
-                }
-                
-            return {'population_density': None, 'hospitals_count': 0, 'schools_count': 0}
-            
+            version = bigquery_last_updated(self.bq_client, self.table)
+            if self.index is None or (version is not None and (self.version is None or version > self.version)):
+                self.index = DemographicsIndex.from_bigquery(self.bq_client, self.table)
+                self.version = version
+                logging.info(f"Demographics index loaded: {len(self.index)} locations as of {version}")
         except Exception as e:
-            logging.warning(f"Demographics lookup failed: {str(e)}")
-            return {'population_density': None, 'hospitals_count': 0, 'schools_count': 0}
+            logging.warning(f"Demographics index load failed: {str(e)}")
+        yield self.index
+
+class AddDemographics(beam.DoFn):
+    """Look up each event's demographics in the side-input index"""
+    
+    def __init__(self):
+        self.demographics_index_lookups = Metrics.counter(self.__class__, 'demographics_index_lookups')
+        self.demographics_unavailable = Metrics.counter(self.__class__, 'demographics_unavailable')
+        
+    def process(self, event, demographics_index):
+        if demographics_index is None:
+            self.demographics_unavailable.inc()
+            result = DEFAULT_DEMOGRAPHICS
+        else:
+            self.demographics_index_lookups.inc()
+            result = demographics_index.lookup(event['latitude'], event['longitude'])
+        event['population_density'] = result.get('population_density')
+        yield event
+
+class EnrichEvents(beam.PTransform):
+    """Enrich stage: demographics from a slowly-changing side input
+    
+    In streaming the index is re-checked every `refresh_seconds` by a
+    PeriodicImpulse and re-published as a global-window side input that
+    fires on every load and discards the previous one, so each event,
+    including a Pub/Sub backlog after a restart, sees the latest index.
+    With refresh_seconds <= 0 (batch runs) the index is loaded once. Events
+    are given default demographics only if loading the index failed,
+    counted as demographics_unavailable.
+    """
+    
+    def __init__(self, table, project_id=None, refresh_seconds=900, bigquery_client=None, csv_path=None):
+        super().__init__()
+        self.table = table
+        self.project_id = project_id
+        self.refresh_seconds = refresh_seconds
+        self.bigquery_client = bigquery_client
+        self.csv_path = csv_path
+        
+    def expand(self, events):
+        load = LoadDemographics(self.table, self.project_id, self.bigquery_client, self.csv_path)
+        events = events | 'Reshuffle' >> beam.Reshuffle()
+        
+        if self.refresh_seconds and self.refresh_seconds > 0:
+            index = (
+                events.pipeline
+                | 'Demographics Impulse' >> PeriodicImpulse(
+                    start_timestamp=time.time(),
+                    fire_interval=self.refresh_seconds
+                )
+                | 'Load Demographics' >> beam.ParDo(load)
+                | 'Latest Index' >> beam.WindowInto(
+                    window.GlobalWindows(),
+                    trigger=Repeatedly(AfterCount(1)),
+                    accumulation_mode=AccumulationMode.DISCARDING
+                )
+            )
+        else:
+            index = (
+                events.pipeline
+                | 'Demographics Once' >> beam.Create([None])
+                | 'Load Demographics' >> beam.ParDo(load)
+            )
             
-    def parse_timestamp(self, timestamp_str):
-        """Parse timestamp string to proper format"""
-        try:
-            if isinstance(timestamp_str, str):
-                dt = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
-                return dt.strftime('%Y-%m-%d %H:%M:%S UTC')
-            return timestamp_str
-        except:
-            return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S UTC')
+        return events | 'Add Demographics' >> beam.ParDo(
+            AddDemographics(), demographics_index=beam.pvalue.AsSingleton(index)
+        )
 
 class ImpactScoreCalculator(beam.DoFn):
-    """Calculate impact score using ML model"""
+    """Calculate impact scores for batches of events using ML model
     
-    def __init__(self, vertex_ai_endpoint):
+    With `model_dir` the model is loaded and run in-process. Otherwise the
+    Vertex AI endpoint is called, with features scaled by the scaler in
+    `scaler_dir` when given.
+    """
+    
+    def __init__(self, vertex_ai_endpoint=None, endpoint=None, model_dir=None, scaler_dir=None):
         self.vertex_ai_endpoint = vertex_ai_endpoint
+        self.endpoint = endpoint
+        self.model_dir = model_dir
+        self.scaler_dir = scaler_dir
+        self.prediction_latency_ms = Metrics.distribution(self.__class__, 'prediction_latency_ms')
+        self.prediction_batch_size = Metrics.distribution(self.__class__, 'prediction_batch_size')
+        self.prediction_failures = Metrics.counter(self.__class__, 'prediction_failures')
+        self.default_scores = Metrics.counter(self.__class__, 'default_scores')
         
     def setup(self):
+        if self.endpoint is not None:
+            # Injected endpoint (e.g. FakeEndpoint for local benchmarks)
+            return
+            
+        if self.model_dir:
+            # Score in-process with the train_model.py artifacts
+            self.endpoint = LocalModel.load(self.model_dir)
+            return
+            
         # Initialize Vertex AI client
         from google.cloud import aiplatform
         aiplatform.init(project=os.getenv('GOOGLE_CLOUD_PROJECT'))
         self.endpoint = aiplatform.Endpoint(self.vertex_ai_endpoint)
+        if self.scaler_dir:
+            self.endpoint = ScaledEndpoint(self.endpoint, load_scaler(self.scaler_dir))
         
-    def process(self, element):
+    def process(self, batch):
+        events = list(batch)
         try:
             # Prepare features for ML model
-            features = self.prepare_features(element)
-            
-            # Get prediction from Vertex AI
-            prediction = self.endpoint.predict([features])
-            impact_score = prediction.predictions[0][0] if prediction.predictions else 0.5
-            
-            element['impact_score'] = float(impact_score)
-            yield element
+            features = [self.prepare_features(event) for event in events]
             
+            # One Vertex AI request per batch, scores come back in instance order
+            self.prediction_batch_size.update(len(features))
+            start = time.perf_counter()
+            try:
+                prediction = self.endpoint.predict(features)
+            finally:
+                self.prediction_latency_ms.update(int((time.perf_counter() - start) * 1000))
+            scores = [prediction_value(p) for p in prediction.predictions]
+            if len(scores) != len(events):
+                raise ValueError(f"Expected {len(events)} predictions, got {len(scores)}")
+                
         except Exception as e:
             logging.error(f"ML prediction failed: {str(e)}")
-            element['impact_score'] = 0.5  # Default score
-            yield element
+            self.prediction_failures.inc()
+            self.default_scores.inc(len(events))
+            scores = [0.5] * len(events)  # Default score
+            
+        for event, score in zip(events, scores):
+            event['impact_score'] = float(score)
+            yield event
             
     def prepare_features(self, event):
         """Prepare features for ML model"""
@@ -150,6 +459,40 @@ class ImpactScoreCalculator(beam.DoFn):
             1 if event.get('event_type') == 'volcano' else 0
         ]
 
+class ScoreEvents(beam.PTransform):
+    """Batch events and score each batch with a single prediction request
+    
+    batch_size caps the number of instances per request and max_wait_seconds
+    bounds how long an event can wait for its batch to fill, trading latency
+    against throughput.
+    """
+    
+    def __init__(self, vertex_ai_endpoint=None, batch_size=64, max_wait_seconds=1.0,
+                 endpoint=None, model_dir=None, scaler_dir=None):
+        super().__init__()
+        self.vertex_ai_endpoint = vertex_ai_endpoint
+        self.batch_size = batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self.endpoint = endpoint
+        self.model_dir = model_dir
+        self.scaler_dir = scaler_dir
+        
+    def expand(self, events):
+        return (
+            events
+            | 'Batch Events' >> beam.BatchElements(
+                min_batch_size=1,
+                max_batch_size=self.batch_size,
+                max_batch_duration_secs=self.max_wait_seconds
+            )
+            | 'Predict' >> beam.ParDo(ImpactScoreCalculator(
+                vertex_ai_endpoint=self.vertex_ai_endpoint,
+                endpoint=self.endpoint,
+                model_dir=self.model_dir,
+                scaler_dir=self.scaler_dir
+            ))
+        )
+
 def run_pipeline():
     """Main pipeline function"""
 
@@ -169,9 +512,18 @@ def run_pipeline():
     missing_vars = [var for var in required_env_vars if not os.getenv(var)]
     if missing_vars:
         raise EnvironmentError(f"Missing required environment variables: {', '.join(missing_vars)}")
+    
+    scoring_mode = os.getenv('SCORING_MODE', 'remote').lower()
+    model_dir = os.getenv('MODEL_DIR')
+    if scoring_mode not in ('local', 'remote'):
+        raise EnvironmentError(f"Unknown SCORING_MODE: {scoring_mode}")
+    if scoring_mode == 'local' and not model_dir:
+        raise EnvironmentError("SCORING_MODE=local requires MODEL_DIR")
+    if scoring_mode == 'remote' and os.getenv('VERTEX_AI_ENDPOINT_NAME') and not model_dir:
+        logging.warning("MODEL_DIR not set: remote scoring sends unscaled features to a model trained on scaled ones")
 
     # Pipeline options
-    options = PipelineOptions([
+    args = [
         '--project=' + os.getenv('GOOGLE_CLOUD_PROJECT'),
         '--region=' + os.getenv('GOOGLE_CLOUD_REGION'),
         '--temp_location=' + os.getenv('DATAFLOW_TEMP_LOCATION'),
@@ -180,7 +532,16 @@ def run_pipeline():
         '--runner=DataflowRunner',
         '--job_name=' + os.getenv('DATAFLOW_JOB_NAME'),
         '--streaming'
-    ])
+    ]
+    
+    # Sampling CPU (and optionally heap) profiles of the workers in Cloud Profiler for this job
+    profiler = os.getenv('PROFILER', 'off').lower()
+    if profiler in ('cpu', 'heap'):
+        args.append('--dataflow_service_options=enable_google_cloud_profiler')
+    if profiler == 'heap':
+        args.append('--dataflow_service_options=enable_google_cloud_heap_sampling')
+    
+    options = PipelineOptions(args)
     
     with beam.Pipeline(options=options) as pipeline:
         
@@ -192,32 +553,86 @@ def run_pipeline():
             )
         )
         
-        # Process and enrich events
-        processed_events = (
+        # Parse messages and drop duplicate deliveries before any enrichment work
+        split = (
             events
-            | 'Process Events' >> beam.ParDo(DisasterEventProcessor(
+            | 'Parse Messages' >> beam.ParDo(ParseMessage())
+            | 'Deduplicate Events' >> DeduplicateEvents(
+                ttl_seconds=int(os.getenv('DEDUP_TTL_SECONDS', '172800'))
+            )
+            | 'Split Track Points' >> beam.ParDo(SplitTrackPoints()).with_outputs(
+                SplitTrackPoints.TRACK_POINTS, main='events'
+            )
+        )
+        unique_events = split.events
+        
+        # Append newly reported EONET track points for storm paths on the map
+        (
+            split[SplitTrackPoints.TRACK_POINTS]
+            | 'Write Track Points' >> WriteTrackPoints(
+                table=f"{os.getenv('GOOGLE_CLOUD_PROJECT')}.{os.getenv('BIGQUERY_DATASET')}.{os.getenv('BIGQUERY_TABLE_TRACKS', 'disaster_event_tracks')}"
+            )
+        )
+        
+        # Geocode and enrich in separate stages so each scales on its own
+        processed_events = (
+            unique_events
+            | 'Geocode Events' >> GeocodeEvents(
+                batch_size=int(os.getenv('ENRICH_BATCH_SIZE', '100')),
+                max_wait_seconds=float(os.getenv('ENRICH_MAX_WAIT_SECONDS', '0.5')),
                 geocoding_api_key=os.getenv('GOOGLE_GEOCODING_API_KEY'),
+                geocode_cache_precision=int(os.getenv('GEOCODE_CACHE_PRECISION', '3')),
+                geocode_cache_size=int(os.getenv('GEOCODE_CACHE_SIZE', '10000')),
+                geocode_cache_ttl_seconds=int(os.getenv('GEOCODE_CACHE_TTL_SECONDS', '86400')),
+                geocode_cache_path=os.getenv('GEOCODE_CACHE_PATH'),
+                geocode_concurrency=int(os.getenv('GEOCODE_CONCURRENCY', '16'))
+            )
+            | 'Enrich Events' >> EnrichEvents(
+                table=f"{os.getenv('GOOGLE_CLOUD_PROJECT')}.{os.getenv('BIGQUERY_DATASET')}.{os.getenv('BIGQUERY_TABLE_DEMOGRAPHICS', 'demographics')}",
                 project_id=os.getenv('GOOGLE_CLOUD_PROJECT'),
-                dataset_id=os.getenv('BIGQUERY_DATASET')
-            ))
+                refresh_seconds=int(os.getenv('DEMOGRAPHICS_REFRESH_SECONDS', '900'))
+            )
         )
         
-        # Calculate impact scores (if ML endpoint is available)
-        if os.getenv('VERTEX_AI_ENDPOINT_NAME'):
+        # Calculate impact scores (local model artifacts or remote Vertex AI endpoint)
+        if scoring_mode == 'local' or os.getenv('VERTEX_AI_ENDPOINT_NAME'):
             scored_events = (
                 processed_events
-                | 'Calculate Impact Score' >> beam.ParDo(ImpactScoreCalculator(
-                    vertex_ai_endpoint=os.getenv('VERTEX_AI_ENDPOINT_NAME')
-                ))
+                | 'Calculate Impact Score' >> ScoreEvents(
+                    vertex_ai_endpoint=os.getenv('VERTEX_AI_ENDPOINT_NAME'),
+                    model_dir=model_dir if scoring_mode == 'local' else None,
+                    # The endpoint serves the bare model, so remote scoring scales features here
+                    scaler_dir=model_dir if scoring_mode == 'remote' else None,
+                    batch_size=int(os.getenv('SCORING_BATCH_SIZE', '64')),
+                    max_wait_seconds=float(os.getenv('SCORING_MAX_WAIT_SECONDS', '1.0'))
+                )
             )
         else:
             scored_events = processed_events
         
-        # Write to BigQuery
+        # Write to BigQuery (streaming inserts, Storage Write API appends or upserts);
+        # events that can't be written land in the dead-letter table
         (
             scored_events
-            | 'Write to BigQuery' >> WriteToBigQuery(
+            | 'Write to BigQuery' >> WriteEvents(
                 table=f"{os.getenv('GOOGLE_CLOUD_PROJECT')}.{os.getenv('BIGQUERY_DATASET')}.{os.getenv('BIGQUERY_TABLE_EVENTS')}",
+                mode=os.getenv('EVENTS_WRITE_MODE', 'append').lower(),
+                at_least_once=os.getenv('EVENTS_WRITE_AT_LEAST_ONCE', 'false').lower() == 'true',
+                triggering_frequency=int(os.getenv('EVENTS_WRITE_TRIGGERING_SECONDS', '0'))
+            )
+            | 'Write Dead Letters' >> WriteDeadLetters(
+                table=f"{os.getenv('GOOGLE_CLOUD_PROJECT')}.{os.getenv('BIGQUERY_DATASET')}.{os.getenv('BIGQUERY_TABLE_DEAD_LETTER', 'disaster_events_dead_letter')}"
+            )
+        )
+        
+        # Maintain hourly rollups for the dashboard's per-hour activity chart
+        (
+            scored_events
+            | 'Hourly Rollups' >> HourlyRollups(
+                early_firing_seconds=int(os.getenv('ROLLUP_FIRING_SECONDS', '60'))
+            )
+            | 'Write Rollups' >> WriteToBigQuery(
+                table=f"{os.getenv('GOOGLE_CLOUD_PROJECT')}.{os.getenv('BIGQUERY_DATASET')}.{os.getenv('BIGQUERY_TABLE_ROLLUPS', 'disaster_event_rollups')}",
                 write_disposition=beam.io.BigQueryDisposition.WRITE_APPEND,
                 create_disposition=beam.io.BigQueryDisposition.CREATE_NEVER
             )
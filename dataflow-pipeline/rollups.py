@@ -0,0 +1,108 @@
+from datetime import datetime, timezone
+
+import apache_beam as beam
+from apache_beam.transforms import window
+from apache_beam.transforms.trigger import AccumulationMode, AfterCount, AfterProcessingTime, AfterWatermark
+
+from sinks import to_timestamp
+
+
+class RollupFn(beam.CombineFn):
+    """Count distinct events and sum/max their impact scores
+
+    Inputs are (event_id, detected_time, impact_score). Revisions and track
+    updates of an event within the window count once, with the score of
+    the most recently detected version.
+    """
+
+    def create_accumulator(self):
+        # event_id -> (detected_time, impact_score)
+        return {}
+
+    def add_input(self, accumulator, element):
+        event_id, detected_time, impact_score = element
+        current = accumulator.get(event_id)
+        if current is None or detected_time >= current[0]:
+            accumulator[event_id] = (detected_time, impact_score)
+        return accumulator
+
+    def merge_accumulators(self, accumulators):
+        accumulators = iter(accumulators)
+        merged = next(accumulators)
+        for accumulator in accumulators:
+            for event_id, (detected_time, impact_score) in accumulator.items():
+                self.add_input(merged, (event_id, detected_time, impact_score))
+        return merged
+
+    def extract_output(self, accumulator):
+        # (event_count, scored_count, impact_score_sum, impact_score_max)
+        scores = [float(score) for _, score in accumulator.values() if score is not None]
+        return len(accumulator), len(scores), sum(scores), max(scores, default=None)
+
+
+def with_detected_timestamp(event):
+    """Window events by their detection time rather than the publish or read time"""
+    return window.TimestampedValue(event, to_timestamp(event['detected_time']))
+
+
+class ToRollupRow(beam.DoFn):
+    """Turn a per-window aggregate into a disaster_event_rollups row"""
+
+    def process(self, element, window=beam.DoFn.WindowParam):
+        (event_type, severity), (count, scored, total, maximum) = element
+        yield {
+            'hour': window.start.to_utc_datetime().strftime('%Y-%m-%d %H:%M:%S UTC'),
+            'event_type': event_type,
+            'severity': severity,
+            'event_count': count,
+            'scored_count': scored,
+            'impact_score_sum': total,
+            'impact_score_max': maximum,
+            'computed_at': datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S.%f UTC')
+        }
+
+
+class HourlyRollups(beam.PTransform):
+    """Per-hour x event_type x severity counts and impact score sum/max
+
+    Hours are by detected_time, which is when ingestion polled the event,
+    and an event delivered several times in an hour (revisions, EONET track
+    updates) is counted once per key. An event revised in a later hour is
+    counted again in that hour, and one whose severity changed within an
+    hour is counted under both severities, so the rows describe activity per
+    hour and summing them over several hours overcounts events. Totals over
+    a time range come from the events table, deduplicated by event_id.
+
+    Windows fire early every `early_firing_seconds` and again for each late
+    event, with accumulating panes, so each firing writes the window's
+    running total. Readers keep the row with the latest computed_at per
+    (hour, event_type, severity).
+    """
+
+    def __init__(self, early_firing_seconds=60, allowed_lateness_seconds=3600):
+        super().__init__()
+        self.early_firing_seconds = early_firing_seconds
+        self.allowed_lateness_seconds = allowed_lateness_seconds
+
+    def expand(self, events):
+        return (
+            events
+            | 'Timestamp by Detection' >> beam.Map(with_detected_timestamp)
+            | 'Hourly Windows' >> beam.WindowInto(
+                window.FixedWindows(3600),
+                trigger=AfterWatermark(
+                    early=AfterProcessingTime(self.early_firing_seconds),
+                    late=AfterCount(1)
+                ),
+                accumulation_mode=AccumulationMode.ACCUMULATING,
+                allowed_lateness=self.allowed_lateness_seconds
+            )
+            | 'Key by Type and Severity' >> beam.Map(
+                lambda event: (
+                    (event.get('event_type'), event.get('severity')),
+                    (event['event_id'], event['detected_time'], event.get('impact_score'))
+                )
+            )
+            | 'Aggregate' >> beam.CombinePerKey(RollupFn())
+            | 'To Rollup Rows' >> beam.ParDo(ToRollupRow())
+        )
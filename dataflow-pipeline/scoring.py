@@ -0,0 +1,202 @@
+import json
+import logging
+import os
+import shutil
+import tempfile
+from collections import namedtuple
+
+import numpy as np
+
+Prediction = namedtuple('Prediction', ['predictions'])
+
+# Feature order produced by ImpactScoreCalculator.prepare_features; must match
+# the feature_names.json written by ml-model/train_model.py
+FEATURE_NAMES = [
+    'magnitude', 'population_density', 'severity_critical',
+    'severity_high', 'severity_medium', 'event_earthquake',
+    'event_wildfire', 'event_volcano'
+]
+
+
+def prediction_value(prediction):
+    """Extract a scalar score from one Vertex AI prediction
+
+    The sklearn serving container returns a flat list of floats for
+    regressors, while custom containers often wrap each score in a list.
+    """
+    if isinstance(prediction, (list, tuple)):
+        return prediction[0]
+    return prediction
+
+
+class LocalModel:
+    """In-process scorer built from the train_model.py artifacts
+
+    Exposes the same predict(instances) interface as aiplatform.Endpoint so
+    ImpactScoreCalculator can use either. Unlike the remote endpoint it
+    applies the scaler the model was trained with before predicting.
+    """
+
+    def __init__(self, model, scaler, feature_names):
+        if list(feature_names) != FEATURE_NAMES:
+            raise ValueError(f"Model features {feature_names} do not match pipeline features {FEATURE_NAMES}")
+        self.model = model
+        self.scaler = scaler
+        self.feature_names = list(feature_names)
+
+    def predict(self, instances):
+        features = np.asarray(instances, dtype=np.float64)
+        scores = self.model.predict(self.scaler.transform(features))
+        return Prediction(predictions=scores.tolist())
+
+    @classmethod
+    def load(cls, model_dir, n_jobs=1, flat=True):
+        """Load model.joblib, scaler.joblib and feature_names.json from a local or gs:// directory
+
+        When the directory holds a flat export (flat/meta.json) and `flat` is
+        set, a memory-mapped FlatModel is returned instead of unpickling.
+        """
+        import joblib
+
+        local_dir = model_dir
+        if '://' in model_dir:
+            local_dir = _download_artifacts(model_dir, flat=flat)
+
+        if flat and os.path.exists(os.path.join(local_dir, 'flat', 'meta.json')):
+            logging.info(f"Loaded flat scoring model from {model_dir}")
+            return FlatModel.load(os.path.join(local_dir, 'flat'))
+
+        model = joblib.load(os.path.join(local_dir, 'model.joblib'))
+        scaler = joblib.load(os.path.join(local_dir, 'scaler.joblib'))
+        with open(os.path.join(local_dir, 'feature_names.json')) as f:
+            feature_names = json.load(f)
+
+        # Beam already runs one worker process per core, so keep each model single-threaded
+        if hasattr(model, 'n_jobs'):
+            model.n_jobs = n_jobs
+
+        logging.info(f"Loaded local scoring model from {model_dir}")
+        return cls(model, scaler, feature_names)
+
+
+class ScaledEndpoint:
+    """Remote endpoint wrapper that applies the training scaler before predicting
+
+    The Vertex AI sklearn container serves model.joblib alone, while
+    train_model.py fits the model on StandardScaler output, so instances
+    are scaled here before they are sent.
+    """
+
+    def __init__(self, endpoint, scaler):
+        self.endpoint = endpoint
+        self.scaler = scaler
+
+    def predict(self, instances):
+        features = self.scaler.transform(np.asarray(instances, dtype=np.float64))
+        return self.endpoint.predict(features.tolist())
+
+
+def load_scaler(model_dir):
+    """Load scaler.joblib from a local or gs:// training artifacts directory"""
+    import joblib
+
+    local_dir = model_dir
+    if '://' in model_dir:
+        local_dir = _download_artifacts(model_dir, flat=False, names=('scaler.joblib',))
+    return joblib.load(os.path.join(local_dir, 'scaler.joblib'))
+
+
+class FlatModel:
+    """Vectorized scorer over the flat-array export written by ml-model/export_model.py
+
+    Trees are stored as contiguous node arrays (feature, threshold, left,
+    right, value, missing_left) with leaves pointing at themselves, so a
+    batch walks every tree at once for `max_depth` steps. Arrays are
+    memory-mapped, so processes on one host share the pages. Predictions
+    match the sklearn model exactly: inputs are cast to the dtype the model
+    compares against and tree outputs are summed in the same order.
+    """
+
+    ARRAYS = ('feature', 'threshold', 'left', 'right', 'value', 'missing_left', 'roots',
+              'scaler_mean', 'scaler_scale', 'coef')
+
+    def __init__(self, meta, arrays):
+        if list(meta['feature_names']) != FEATURE_NAMES:
+            raise ValueError(f"Model features {meta['feature_names']} do not match pipeline features {FEATURE_NAMES}")
+        self.meta = meta
+        self.kind = meta['kind']
+        for name in self.ARRAYS:
+            setattr(self, name, arrays.get(name))
+
+    @classmethod
+    def load(cls, directory, mmap_mode='r'):
+        with open(os.path.join(directory, 'meta.json')) as f:
+            meta = json.load(f)
+        arrays = {
+            name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode)
+            for name in meta['arrays']
+        }
+        return cls(meta, arrays)
+
+    def transform(self, X):
+        X = np.array(X, dtype=np.float64)
+        if self.scaler_mean is not None:
+            X -= self.scaler_mean
+            X /= self.scaler_scale
+        return X
+
+    def predict_scaled(self, X):
+        if self.kind == 'linear':
+            return X @ self.coef + self.meta['intercept']
+
+        X = np.ascontiguousarray(X, dtype=self.meta['input_dtype'])
+        has_missing = bool(np.isnan(X).any())
+        flat_x = X.ravel()
+        row_offsets = (np.arange(len(X)) * X.shape[1])[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), len(self.roots))).copy()
+        for _ in range(self.meta['max_depth']):
+            x = flat_x[row_offsets + self.feature[nodes]]
+            go_left = x <= self.threshold[nodes]
+            if has_missing:
+                go_left = np.where(np.isnan(x), self.missing_left[nodes], go_left)
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        values = self.value[nodes]
+
+        if self.kind == 'forest':
+            total = np.zeros(len(X), dtype=np.float64)
+            for t in range(values.shape[1]):
+                total += values[:, t]
+            return total / values.shape[1]
+
+        # boosting: baseline plus each iteration's leaf value, in order
+        total = np.full(len(X), self.meta['baseline'], dtype=np.float64)
+        for t in range(values.shape[1]):
+            total += values[:, t]
+        return total
+
+    def predict(self, instances):
+        scores = self.predict_scaled(self.transform(instances))
+        return Prediction(predictions=scores.tolist())
+
+
+def _download_artifacts(model_dir, flat=True, names=('model.joblib', 'scaler.joblib', 'feature_names.json')):
+    """Copy model artifacts from a remote filesystem into a local temp directory"""
+    from apache_beam.io.filesystems import FileSystems
+
+    def copy(name):
+        with FileSystems.open(FileSystems.join(model_dir, name)) as src, \
+                open(os.path.join(local_dir, name), 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+
+    local_dir = tempfile.mkdtemp(prefix='impact-model-')
+    if flat and FileSystems.exists(FileSystems.join(model_dir, 'flat', 'meta.json')):
+        os.makedirs(os.path.join(local_dir, 'flat'))
+        copy('flat/meta.json')
+        with open(os.path.join(local_dir, 'flat', 'meta.json')) as f:
+            for name in json.load(f)['arrays']:
+                copy(f"flat/{name}.npy")
+        return local_dir
+
+    for name in names:
+        copy(name)
+    return local_dir
@@ -4,11 +4,27 @@ setup(
     name="disaster-pipeline",
     version="1.0.0",
     packages=find_packages(),
+    py_modules=[
+        "backfill",
+        "demographics_index",
+        "geocode_cache",
+        "pipeline",
+        "raw_payloads",
+        "rollups",
+        "scoring",
+        "sinks",
+        "tracks"
+    ],
     install_requires=[
         "apache-beam[gcp]==2.*",
         "google-cloud-bigquery==3.*",
         "google-cloud-aiplatform==1.*",
-        "requests==2.*"
+        "requests==2.*",
+        "numpy==1.*",
+        "scikit-learn==1.*",
+        "joblib==1.*",
+        "orjson==3.*",
+        "zstandard==0.*"
     ],
     python_requires=">=3.8",
-) 
\ No newline at end of file
+)
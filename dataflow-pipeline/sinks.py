@@ -0,0 +1,321 @@
+import json
+import os
+from datetime import datetime, timezone
+
+import apache_beam as beam
+from apache_beam.io.gcp import bigquery_tools
+from apache_beam.metrics import Metrics
+from apache_beam.io.gcp.bigquery import WriteToBigQuery
+from apache_beam.io.gcp.bigquery_tools import RetryStrategy
+from apache_beam.typehints.row_type import RowTypeConstraint
+from apache_beam.utils.timestamp import Timestamp
+
+# Table schema shared with Terraform, read at pipeline construction time
+EVENTS_SCHEMA_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', 'infrastructure', 'schemas', 'disaster_events.json'
+)
+
+
+def load_table_schema(path=EVENTS_SCHEMA_PATH):
+    """Load a BigQuery JSON schema file as a WriteToBigQuery schema dict"""
+    with open(path) as f:
+        return {'fields': json.load(f)}
+
+
+def to_timestamp(value):
+    """Convert the pipeline's 'YYYY-MM-DD HH:MM:SS UTC' strings to Beam timestamps"""
+    if value is None or isinstance(value, Timestamp):
+        return value
+    if isinstance(value, datetime):
+        return Timestamp.from_utc_datetime(value.astimezone(timezone.utc))
+    dt = datetime.strptime(value, '%Y-%m-%d %H:%M:%S UTC').replace(tzinfo=timezone.utc)
+    return Timestamp.from_utc_datetime(dt)
+
+
+class RecordWriteLag(beam.DoFn):
+    """Record how long after detected_time each event reaches the sink"""
+
+    def __init__(self):
+        self.write_lag_seconds = Metrics.distribution(self.__class__, 'detected_to_write_lag_seconds')
+
+    def process(self, event):
+        try:
+            detected = to_timestamp(event.get('detected_time'))
+            if detected is not None:
+                self.write_lag_seconds.update(int((Timestamp.now() - detected).micros // 1000000))
+        except ValueError:
+            pass
+        yield event
+
+
+def format_timestamp(value):
+    """Inverse of to_timestamp for Beam timestamps"""
+    return value.to_utc_datetime().strftime('%Y-%m-%d %H:%M:%S UTC')
+
+
+def _json_default(value):
+    if isinstance(value, Timestamp):
+        return format_timestamp(value)
+    return str(value)
+
+
+def row_to_dict(row):
+    """A table row as a JSON-ready dict, unwrapping Beam Rows and CDC records"""
+    if not isinstance(row, dict):
+        row = row._asdict()
+        if 'row_mutation_info' in row:
+            row = row['record']._asdict()
+    return {
+        name: format_timestamp(value) if isinstance(value, Timestamp) else value
+        for name, value in row.items()
+    }
+
+
+def dead_letter_row(event, stage, error):
+    """Dead-letter table row for an event that could not be written
+
+    stage is 'encode' for events that don't fit the table schema and
+    'write' for rows BigQuery (or the client) rejected.
+    """
+    if not isinstance(error, str):
+        error = json.dumps(error, default=_json_default)
+    return {
+        'failed_time': datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S UTC'),
+        'stage': stage,
+        'event_id': event.get('event_id') if isinstance(event, dict) else None,
+        'error': error,
+        'payload': json.dumps(event, default=_json_default)
+    }
+
+
+class ToTableRow(beam.DoFn):
+    """Project an event onto the table schema and encode it for the sink
+
+    Required fields must be set and TIMESTAMP fields must parse; events that
+    don't fit go to the DEAD_LETTER output rather than failing the write.
+    With typed=True the row is a Beam Row of the schema's types, which the
+    Storage Write API sink turns into protos without a JSON round trip.
+    Otherwise it stays a JSON-ready dict for streaming inserts and loads.
+    """
+
+    DEAD_LETTER = 'dead_letter'
+
+    def __init__(self, schema, typed=False):
+        self.schema = schema
+        self.typed = typed
+        self.dead_letters = Metrics.counter(self.__class__, 'dead_letter_rows')
+
+    def setup(self):
+        # TableSchema messages don't pickle, so build it on the worker
+        self.table_schema = bigquery_tools.get_bq_tableschema(self.schema)
+        self.required_fields = [
+            field.name for field in self.table_schema.fields if (field.mode or '').upper() == 'REQUIRED'
+        ]
+        self.timestamp_fields = [
+            field.name for field in self.table_schema.fields if field.type.upper() == 'TIMESTAMP'
+        ]
+
+    def encode(self, event):
+        record = {field.name: event.get(field.name) for field in self.table_schema.fields}
+        missing = [name for name in self.required_fields if record[name] is None]
+        if missing:
+            raise ValueError(f"Missing required fields: {', '.join(missing)}")
+        for name in self.timestamp_fields:
+            timestamp = to_timestamp(record[name])
+            if self.typed:
+                record[name] = timestamp
+        if not self.typed:
+            return record
+        return bigquery_tools.beam_row_from_dict(record, self.table_schema)
+
+    def process(self, event):
+        try:
+            row = self.encode(event)
+        except Exception as e:
+            self.dead_letters.inc()
+            yield beam.pvalue.TaggedOutput(self.DEAD_LETTER, dead_letter_row(event, 'encode', str(e)))
+            return
+        yield row
+
+
+class ToCdcRow(ToTableRow):
+    """Wrap an event as a typed Storage Write API UPSERT record
+
+    The change sequence number is detected_time/write_time in hex, so a
+    newer detection wins and a re-written row (e.g. a backfill re-score)
+    supersedes the row with the same detected_time.
+    """
+
+    def __init__(self, schema):
+        super().__init__(schema, typed=True)
+
+    def encode(self, event):
+        record = super().encode(event)
+        return beam.Row(
+            row_mutation_info=beam.Row(
+                mutation_type='UPSERT',
+                change_sequence_number=f"{record.detected_time.micros:X}/{Timestamp.now().micros:X}"
+            ),
+            record=record
+        )
+
+
+class InsertRows(beam.DoFn):
+    """Insert batches of rows through a bigquery.Client-compatible client
+
+    Used in place of WriteToBigQuery when a client is injected, e.g. the
+    benchmarks' SQLite stand-in. Rows the client rejects become dead letters.
+    """
+
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.rows_written = Metrics.counter(self.__class__, 'rows_written')
+
+    def process(self, rows):
+        rows = [row_to_dict(row) for row in rows]
+        errors = self.client.insert_rows_json(self.table, rows)
+        self.rows_written.inc(len(rows) - len(errors))
+        for error in errors:
+            yield dead_letter_row(rows[error['index']], 'write', error['errors'])
+
+
+def failed_insert(failure):
+    """Dead letter for a (destination, row, errors) streaming-insert failure"""
+    _, row, errors = failure
+    return dead_letter_row(row, 'write', errors)
+
+
+def failed_storage_write(failure):
+    """Dead letter for a Storage Write API (failed_row, error_message) Row"""
+    return dead_letter_row(row_to_dict(failure.failed_row), 'write', failure.error_message)
+
+
+class WriteEvents(beam.PTransform):
+    """Write enriched events to the disaster_events table
+
+    Modes:
+      append  streaming inserts of JSON rows, the original behaviour
+      storage Storage Write API appends of schema-typed rows, exactly-once
+              unless at_least_once is set
+      upsert  Storage Write API CDC records keyed on event_id, so BigQuery
+              keeps exactly one current row per event and a revision
+              replaces the old row; detected_time orders competing upserts
+      load    batch load jobs, for bounded backfills
+
+    In streaming, triggering_frequency (seconds) micro-batches the write:
+    commits of exactly-once storage writes, load jobs, and auto-sharded
+    streaming insert batches. At-least-once storage writes stream rows
+    continuously and ignore it.
+
+    Returns a PCollection of dead-letter rows (see dead_letter_row): events
+    that don't fit the schema and rows BigQuery rejected. Load jobs fail as
+    a whole, so in load mode only the former are caught. With
+    bigquery_client, rows go through InsertRows in batches of batch_size
+    instead of WriteToBigQuery.
+    """
+
+    def __init__(self, table, mode='append', schema=None, at_least_once=False,
+                 triggering_frequency=None, bigquery_client=None, batch_size=500):
+        super().__init__()
+        if mode not in ('append', 'storage', 'upsert', 'load'):
+            raise ValueError(f"Unknown events write mode: {mode}")
+        self.table = table
+        self.mode = mode
+        self.schema = schema
+        self.at_least_once = at_least_once
+        self.triggering_frequency = triggering_frequency or None
+        self.bigquery_client = bigquery_client
+        self.batch_size = batch_size
+
+    def expand(self, events):
+        schema = self.schema or load_table_schema()
+        table_schema = bigquery_tools.get_bq_tableschema(schema)
+        record_type = RowTypeConstraint.from_fields(
+            bigquery_tools.get_beam_typehints_from_tableschema(table_schema)
+        )
+        if self.mode == 'upsert':
+            encode = ToCdcRow(schema)
+            row_type = RowTypeConstraint.from_fields([
+                ('row_mutation_info', RowTypeConstraint.from_fields([
+                    ('mutation_type', str),
+                    ('change_sequence_number', str)
+                ])),
+                ('record', record_type)
+            ])
+        elif self.mode == 'storage':
+            encode = ToTableRow(schema, typed=True)
+            row_type = record_type
+        else:
+            encode = ToTableRow(schema)
+            row_type = dict
+
+        encoded = (
+            events
+            | 'Record Write Lag' >> beam.ParDo(RecordWriteLag())
+            | 'Encode Rows' >> beam.ParDo(encode).with_output_types(row_type).with_outputs(
+                ToTableRow.DEAD_LETTER, main='rows'
+            )
+        )
+        rows = encoded.rows
+
+        if self.bigquery_client is not None:
+            write_failures = (
+                rows
+                | 'Batch Rows' >> beam.BatchElements(min_batch_size=1, max_batch_size=self.batch_size)
+                | 'Insert Rows' >> beam.ParDo(InsertRows(self.bigquery_client, self.table))
+            )
+        elif self.mode == 'append':
+            result = rows | 'Append Rows' >> WriteToBigQuery(
+                table=self.table,
+                method=WriteToBigQuery.Method.STREAMING_INSERTS,
+                insert_retry_strategy=RetryStrategy.RETRY_ON_TRANSIENT_ERROR,
+                triggering_frequency=self.triggering_frequency,
+                with_auto_sharding=self.triggering_frequency is not None,
+                write_disposition=beam.io.BigQueryDisposition.WRITE_APPEND,
+                create_disposition=beam.io.BigQueryDisposition.CREATE_NEVER
+            )
+            write_failures = result.failed_rows_with_errors | 'Failed Inserts' >> beam.Map(failed_insert)
+        elif self.mode == 'load':
+            rows | 'Load Rows' >> WriteToBigQuery(
+                table=self.table,
+                method=WriteToBigQuery.Method.FILE_LOADS,
+                triggering_frequency=self.triggering_frequency,
+                write_disposition=beam.io.BigQueryDisposition.WRITE_APPEND,
+                create_disposition=beam.io.BigQueryDisposition.CREATE_NEVER
+            )
+            return encoded[ToTableRow.DEAD_LETTER]
+        else:
+            # CDC writes are only supported with at-least-once semantics
+            at_least_once = self.at_least_once or self.mode == 'upsert'
+            result = rows | 'Storage Write Rows' >> WriteToBigQuery(
+                table=self.table,
+                method=WriteToBigQuery.Method.STORAGE_WRITE_API,
+                use_at_least_once=at_least_once,
+                triggering_frequency=None if at_least_once else self.triggering_frequency,
+                use_cdc_writes=self.mode == 'upsert',
+                primary_key=['event_id'] if self.mode == 'upsert' else None,
+                write_disposition=beam.io.BigQueryDisposition.WRITE_APPEND,
+                create_disposition=beam.io.BigQueryDisposition.CREATE_NEVER
+            )
+            write_failures = result.failed_rows_with_errors | 'Failed Writes' >> beam.Map(failed_storage_write)
+
+        return (
+            (encoded[ToTableRow.DEAD_LETTER], write_failures)
+            | 'Dead Letters' >> beam.Flatten()
+        )
+
+
+class WriteDeadLetters(beam.PTransform):
+    """Append dead-letter rows to the dead-letter table"""
+
+    def __init__(self, table):
+        super().__init__()
+        self.table = table
+
+    def expand(self, dead_letters):
+        return dead_letters | 'Append Dead Letters' >> WriteToBigQuery(
+            table=self.table,
+            write_disposition=beam.io.BigQueryDisposition.WRITE_APPEND,
+            create_disposition=beam.io.BigQueryDisposition.CREATE_NEVER
+        )
@@ -0,0 +1,52 @@
+import apache_beam as beam
+from apache_beam.io.gcp.bigquery import WriteToBigQuery
+from apache_beam.metrics import Metrics
+
+
+class SplitTrackPoints(beam.DoFn):
+    """Move an event's newly appended track points to a separate output
+
+    Ingestion in track mode sends only the EONET geometry points that were
+    not published before, each with its index in the full track. They become
+    disaster_event_tracks rows, and the event itself (positioned at its
+    latest point) continues without them.
+    """
+
+    TRACK_POINTS = 'track_points'
+
+    def __init__(self):
+        self.track_points = Metrics.counter(self.__class__, 'track_points')
+
+    def process(self, event):
+        points = event.pop('track_points', None)
+        for point in points or ():
+            self.track_points.inc()
+            yield beam.pvalue.TaggedOutput(self.TRACK_POINTS, {
+                'event_id': event['event_id'],
+                'event_type': event.get('event_type'),
+                'point_index': point['point_index'],
+                'point_time': point.get('point_time'),
+                'latitude': point['latitude'],
+                'longitude': point['longitude'],
+                'magnitude': point.get('magnitude')
+            })
+        yield event
+
+
+class WriteTrackPoints(beam.PTransform):
+    """Append track points to the tracks table
+
+    Points are appended once per publish, so a redelivered update can repeat
+    a point; readers keep one row per (event_id, point_index).
+    """
+
+    def __init__(self, table):
+        super().__init__()
+        self.table = table
+
+    def expand(self, points):
+        return points | 'Append Track Points' >> WriteToBigQuery(
+            table=self.table,
+            write_disposition=beam.io.BigQueryDisposition.WRITE_APPEND,
+            create_disposition=beam.io.BigQueryDisposition.CREATE_NEVER
+        )
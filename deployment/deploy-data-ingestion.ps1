@@ -23,6 +23,9 @@ if (-not $env:GOOGLE_CLOUD_PROJECT) {
 # Navigate to data-ingestion directory
 Set-Location ..\data-ingestion
 
+# The function imports shared/raw_payloads.py from its own directory once deployed
+Copy-Item ..\shared\raw_payloads.py .
+
 # Deploy Cloud Function
 Write-Host "Deploying Cloud Function..."
 $region = $env:GOOGLE_CLOUD_REGION
@@ -33,6 +36,20 @@ $usgsApi = $env:USGS_API_BASE_URL
 if (-not $usgsApi) { $usgsApi = "https://earthquake.usgs.gov/earthquakes/feed/v1.0" }
 $nasaApi = $env:NASA_EONET_API_BASE_URL
 if (-not $nasaApi) { $nasaApi = "https://eonet.gsfc.nasa.gov/api/v3" }
+$stateBucket = $env:INGESTION_STATE_BUCKET
+if (-not $stateBucket) { $stateBucket = "$($env:GOOGLE_CLOUD_PROJECT)-ingestion-state" }
+$rawDataStore = $env:RAW_DATA_STORE
+if (-not $rawDataStore) { $rawDataStore = "inline" }
+$rawDataBucket = $env:RAW_DATA_BUCKET
+if (-not $rawDataBucket) { $rawDataBucket = "$($env:GOOGLE_CLOUD_PROJECT)-raw-payloads" }
+$messageEncoding = $env:MESSAGE_ENCODING
+if (-not $messageEncoding) { $messageEncoding = "json" }
+$eonetTracks = $env:EONET_TRACKS
+if (-not $eonetTracks) { $eonetTracks = "false" }
+$feeds = $env:FEEDS
+if (-not $feeds) { $feeds = "usgs_all_hour;usgs_significant_day;usgs_all_week;eonet" }
+$feedJitter = $env:FEED_JITTER
+if (-not $feedJitter) { $feedJitter = "0.1" }
 $serviceAccount = $env:CLOUD_FUNCTION_SERVICE_ACCOUNT
 if (-not $serviceAccount) { $serviceAccount = "cloud-function-sa@$($env:GOOGLE_CLOUD_PROJECT).iam.gserviceaccount.com" }
 
@@ -43,20 +60,22 @@ gcloud functions deploy disaster-data-ingestion `
     --source=. `
     --entry-point=ingest_disaster_data `
     --trigger-topic=$pubsubTopic `
-    --set-env-vars="GOOGLE_CLOUD_PROJECT=$($env:GOOGLE_CLOUD_PROJECT),PUBSUB_TOPIC=$pubsubTopic,USGS_API_BASE_URL=$usgsApi,NASA_EONET_API_BASE_URL=$nasaApi" `
+    --set-env-vars="GOOGLE_CLOUD_PROJECT=$($env:GOOGLE_CLOUD_PROJECT),PUBSUB_TOPIC=$pubsubTopic,USGS_API_BASE_URL=$usgsApi,NASA_EONET_API_BASE_URL=$nasaApi,INGESTION_STATE_BUCKET=$stateBucket,RAW_DATA_STORE=$rawDataStore,RAW_DATA_BUCKET=$rawDataBucket,MESSAGE_ENCODING=$messageEncoding,EONET_TRACKS=$eonetTracks,FEEDS=$feeds,FEED_INTERVALS=$($env:FEED_INTERVALS),FEED_JITTER=$feedJitter" `
     --service-account=$serviceAccount `
     --memory=512MB `
     --timeout=540s
 
-# Create Cloud Scheduler job to trigger the function every 5 minutes
+Remove-Item raw_payloads.py
+
+# Trigger the function every minute; each feed adapter is only polled when due
 Write-Host "Creating Cloud Scheduler job..."
 try {
     gcloud scheduler jobs create pubsub disaster-data-scheduler `
-        --schedule="*/5 * * * *" `
+        --schedule="* * * * *" `
         --topic=$pubsubTopic `
         --message-body="{}" `
         --location=$region `
-        --description="Trigger disaster data ingestion every 5 minutes"
+        --description="Trigger disaster data ingestion every minute"
 } catch {
     Write-Host "Warning: Scheduler job may already exist"
 }
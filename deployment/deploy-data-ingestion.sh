@@ -21,6 +21,10 @@ fi
 # Navigate to data ingestion directory
 cd ../data-ingestion
 
+# The function imports shared/raw_payloads.py from its own directory once deployed
+cp ../shared/raw_payloads.py .
+trap 'rm -f raw_payloads.py' EXIT
+
 # Deploy Cloud Function
 echo "📦 Deploying Cloud Function..."
 gcloud functions deploy disaster-data-ingestion \
@@ -30,19 +34,19 @@ gcloud functions deploy disaster-data-ingestion \
     --source=. \
     --entry-point=ingest_disaster_data \
     --trigger-topic=${PUBSUB_TOPIC:-disaster-alerts} \
-    --set-env-vars="GOOGLE_CLOUD_PROJECT=$GOOGLE_CLOUD_PROJECT,PUBSUB_TOPIC=${PUBSUB_TOPIC:-disaster-alerts},USGS_API_BASE_URL=${USGS_API_BASE_URL:-https://earthquake.usgs.gov/earthquakes/feed/v1.0},NASA_EONET_API_BASE_URL=${NASA_EONET_API_BASE_URL:-https://eonet.gsfc.nasa.gov/api/v3}" \
+    --set-env-vars="GOOGLE_CLOUD_PROJECT=$GOOGLE_CLOUD_PROJECT,PUBSUB_TOPIC=${PUBSUB_TOPIC:-disaster-alerts},USGS_API_BASE_URL=${USGS_API_BASE_URL:-https://earthquake.usgs.gov/earthquakes/feed/v1.0},NASA_EONET_API_BASE_URL=${NASA_EONET_API_BASE_URL:-https://eonet.gsfc.nasa.gov/api/v3},INGESTION_STATE_BUCKET=${INGESTION_STATE_BUCKET:-$GOOGLE_CLOUD_PROJECT-ingestion-state},RAW_DATA_STORE=${RAW_DATA_STORE:-inline},RAW_DATA_BUCKET=${RAW_DATA_BUCKET:-$GOOGLE_CLOUD_PROJECT-raw-payloads},MESSAGE_ENCODING=${MESSAGE_ENCODING:-json},EONET_TRACKS=${EONET_TRACKS:-false},FEEDS=${FEEDS:-usgs_all_hour;usgs_significant_day;usgs_all_week;eonet},FEED_INTERVALS=${FEED_INTERVALS},FEED_JITTER=${FEED_JITTER:-0.1}" \
     --service-account=${CLOUD_FUNCTION_SERVICE_ACCOUNT:-cloud-function-sa@$GOOGLE_CLOUD_PROJECT.iam.gserviceaccount.com} \
     --memory=512MB \
     --timeout=540s
 
-# Create Cloud Scheduler job to trigger the function every 5 minutes
+# Trigger the function every minute; each feed adapter is only polled when due
 echo "⏰ Creating Cloud Scheduler job..."
 gcloud scheduler jobs create pubsub disaster-data-scheduler \
-    --schedule="*/5 * * * *" \
+    --schedule="* * * * *" \
     --topic=${PUBSUB_TOPIC:-disaster-alerts} \
     --message-body="{}" \
     --location=${GOOGLE_CLOUD_REGION:-us-central1} \
-    --description="Trigger disaster data ingestion every 5 minutes" \
+    --description="Trigger disaster data ingestion every minute" \
     || echo "⚠️  Scheduler job may already exist"
 
 echo "✅ Data ingestion deployment complete!" 
\ No newline at end of file
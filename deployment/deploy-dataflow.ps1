@@ -27,30 +27,92 @@ if (-not $env:GOOGLE_GEOCODING_API_KEY) {
 # Navigate to dataflow directory
 Set-Location ..\dataflow-pipeline
 
+# Job settings, with the same defaults as deploy-dataflow.sh
+$googleCloudRegion = $env:GOOGLE_CLOUD_REGION
+if (-not $googleCloudRegion) { $googleCloudRegion = "us-central1" }
+$dataflowServiceAccount = $env:DATAFLOW_SERVICE_ACCOUNT
+if (-not $dataflowServiceAccount) { $dataflowServiceAccount = "dataflow-sa@$($env:GOOGLE_CLOUD_PROJECT).iam.gserviceaccount.com" }
+$dataflowJobName = $env:DATAFLOW_JOB_NAME
+if (-not $dataflowJobName) { $dataflowJobName = "disaster-pipeline" }
+$bigqueryDataset = $env:BIGQUERY_DATASET
+if (-not $bigqueryDataset) { $bigqueryDataset = "disaster_monitor" }
+$pubsubTopic = $env:PUBSUB_TOPIC
+if (-not $pubsubTopic) { $pubsubTopic = "disaster-alerts" }
+$bigqueryTableEvents = $env:BIGQUERY_TABLE_EVENTS
+if (-not $bigqueryTableEvents) { $bigqueryTableEvents = "disaster_events" }
+$bigqueryTableDemographics = $env:BIGQUERY_TABLE_DEMOGRAPHICS
+if (-not $bigqueryTableDemographics) { $bigqueryTableDemographics = "demographics" }
+$demographicsRefreshSeconds = $env:DEMOGRAPHICS_REFRESH_SECONDS
+if (-not $demographicsRefreshSeconds) { $demographicsRefreshSeconds = "900" }
+$geocodeCachePrecision = $env:GEOCODE_CACHE_PRECISION
+if (-not $geocodeCachePrecision) { $geocodeCachePrecision = "3" }
+$geocodeCacheSize = $env:GEOCODE_CACHE_SIZE
+if (-not $geocodeCacheSize) { $geocodeCacheSize = "10000" }
+$geocodeCacheTtlSeconds = $env:GEOCODE_CACHE_TTL_SECONDS
+if (-not $geocodeCacheTtlSeconds) { $geocodeCacheTtlSeconds = "86400" }
+$geocodeCachePath = $env:GEOCODE_CACHE_PATH
+if (-not $geocodeCachePath) { $geocodeCachePath = "/tmp/geocode_cache.sqlite" }
+$geocodeConcurrency = $env:GEOCODE_CONCURRENCY
+if (-not $geocodeConcurrency) { $geocodeConcurrency = "16" }
+$enrichBatchSize = $env:ENRICH_BATCH_SIZE
+if (-not $enrichBatchSize) { $enrichBatchSize = "100" }
+$enrichMaxWaitSeconds = $env:ENRICH_MAX_WAIT_SECONDS
+if (-not $enrichMaxWaitSeconds) { $enrichMaxWaitSeconds = "0.5" }
+$dedupTtlSeconds = $env:DEDUP_TTL_SECONDS
+if (-not $dedupTtlSeconds) { $dedupTtlSeconds = "172800" }
+$eventsWriteMode = $env:EVENTS_WRITE_MODE
+if (-not $eventsWriteMode) { $eventsWriteMode = "append" }
+$eventsWriteAtLeastOnce = $env:EVENTS_WRITE_AT_LEAST_ONCE
+if (-not $eventsWriteAtLeastOnce) { $eventsWriteAtLeastOnce = "false" }
+$eventsWriteTriggeringSeconds = $env:EVENTS_WRITE_TRIGGERING_SECONDS
+if (-not $eventsWriteTriggeringSeconds) { $eventsWriteTriggeringSeconds = "5" }
+$bigqueryTableDeadLetter = $env:BIGQUERY_TABLE_DEAD_LETTER
+if (-not $bigqueryTableDeadLetter) { $bigqueryTableDeadLetter = "disaster_events_dead_letter" }
+$bigqueryTableRollups = $env:BIGQUERY_TABLE_ROLLUPS
+if (-not $bigqueryTableRollups) { $bigqueryTableRollups = "disaster_event_rollups" }
+$rollupFiringSeconds = $env:ROLLUP_FIRING_SECONDS
+if (-not $rollupFiringSeconds) { $rollupFiringSeconds = "60" }
+$bigqueryTableTracks = $env:BIGQUERY_TABLE_TRACKS
+if (-not $bigqueryTableTracks) { $bigqueryTableTracks = "disaster_event_tracks" }
+$scoringMode = $env:SCORING_MODE
+if (-not $scoringMode) { $scoringMode = "remote" }
+$scoringBatchSize = $env:SCORING_BATCH_SIZE
+if (-not $scoringBatchSize) { $scoringBatchSize = "64" }
+$scoringMaxWaitSeconds = $env:SCORING_MAX_WAIT_SECONDS
+if (-not $scoringMaxWaitSeconds) { $scoringMaxWaitSeconds = "1.0" }
+$profiler = $env:PROFILER
+if (-not $profiler) { $profiler = "off" }
+
 # Create staging directories in Cloud Storage
 Write-Host "Creating staging directories..."
-gsutil mb -p $env:GOOGLE_CLOUD_PROJECT -c STANDARD -l $($env:GOOGLE_CLOUD_REGION -or 'us-central1') "gs://$($env:GOOGLE_CLOUD_PROJECT)-dataflow" 2>$null
+gsutil mb -p $env:GOOGLE_CLOUD_PROJECT -c STANDARD -l $googleCloudRegion "gs://$($env:GOOGLE_CLOUD_PROJECT)-dataflow" 2>$null
 
 gsutil -m cp -r requirements.txt "gs://$($env:GOOGLE_CLOUD_PROJECT)-dataflow/staging/" 2>$null
 
 # Set environment variables for the pipeline
 $env:PYTHONPATH = "$($env:PYTHONPATH):$(Get-Location)"
 
-# Deploy the Dataflow job
-Write-Host "Deploying Dataflow job..."
-python pipeline.py `
-    --project=$($env:GOOGLE_CLOUD_PROJECT) `
-    --region=$($env:GOOGLE_CLOUD_REGION -or 'us-central1') `
-    --temp_location="gs://$($env:GOOGLE_CLOUD_PROJECT)-dataflow/temp" `
-    --staging_location="gs://$($env:GOOGLE_CLOUD_PROJECT)-dataflow/staging" `
-    --service_account_email=$($env:DATAFLOW_SERVICE_ACCOUNT -or "dataflow-sa@$($env:GOOGLE_CLOUD_PROJECT).iam.gserviceaccount.com") `
-    --runner=DataflowRunner `
-    --job_name=$($env:DATAFLOW_JOB_NAME -or 'disaster-pipeline') `
-    --streaming `
-    --setup_file=./setup.py `
-    --requirements_file=requirements.txt `
-    --save_main_session `
-    --environment_variables="GOOGLE_GEOCODING_API_KEY=$($env:GOOGLE_GEOCODING_API_KEY),GOOGLE_CLOUD_PROJECT=$($env:GOOGLE_CLOUD_PROJECT),BIGQUERY_DATASET=$($env:BIGQUERY_DATASET -or 'disaster_monitor'),PUBSUB_TOPIC=$($env:PUBSUB_TOPIC -or 'disaster-alerts'),BIGQUERY_TABLE_EVENTS=$($env:BIGQUERY_TABLE_EVENTS -or 'disaster_events'),VERTEX_AI_ENDPOINT_NAME=$($env:VERTEX_AI_ENDPOINT_NAME)"
+# Workers import shared/raw_payloads.py from the staged package
+Copy-Item ..\shared\raw_payloads.py .
+try {
+    # Deploy the Dataflow job
+    Write-Host "Deploying Dataflow job..."
+    python pipeline.py `
+        --project=$($env:GOOGLE_CLOUD_PROJECT) `
+        --region=$googleCloudRegion `
+        --temp_location="gs://$($env:GOOGLE_CLOUD_PROJECT)-dataflow/temp" `
+        --staging_location="gs://$($env:GOOGLE_CLOUD_PROJECT)-dataflow/staging" `
+        --service_account_email=$dataflowServiceAccount `
+        --runner=DataflowRunner `
+        --job_name=$dataflowJobName `
+        --streaming `
+        --setup_file=./setup.py `
+        --requirements_file=requirements.txt `
+        --save_main_session `
+        --environment_variables="GOOGLE_GEOCODING_API_KEY=$($env:GOOGLE_GEOCODING_API_KEY),GOOGLE_CLOUD_PROJECT=$($env:GOOGLE_CLOUD_PROJECT),BIGQUERY_DATASET=$bigqueryDataset,PUBSUB_TOPIC=$pubsubTopic,BIGQUERY_TABLE_EVENTS=$bigqueryTableEvents,BIGQUERY_TABLE_DEMOGRAPHICS=$bigqueryTableDemographics,DEMOGRAPHICS_REFRESH_SECONDS=$demographicsRefreshSeconds,GEOCODE_CACHE_PRECISION=$geocodeCachePrecision,GEOCODE_CACHE_SIZE=$geocodeCacheSize,GEOCODE_CACHE_TTL_SECONDS=$geocodeCacheTtlSeconds,GEOCODE_CACHE_PATH=$geocodeCachePath,GEOCODE_CONCURRENCY=$geocodeConcurrency,ENRICH_BATCH_SIZE=$enrichBatchSize,ENRICH_MAX_WAIT_SECONDS=$enrichMaxWaitSeconds,VERTEX_AI_ENDPOINT_NAME=$($env:VERTEX_AI_ENDPOINT_NAME),DEDUP_TTL_SECONDS=$dedupTtlSeconds,EVENTS_WRITE_MODE=$eventsWriteMode,EVENTS_WRITE_AT_LEAST_ONCE=$eventsWriteAtLeastOnce,EVENTS_WRITE_TRIGGERING_SECONDS=$eventsWriteTriggeringSeconds,BIGQUERY_TABLE_DEAD_LETTER=$bigqueryTableDeadLetter,BIGQUERY_TABLE_ROLLUPS=$bigqueryTableRollups,ROLLUP_FIRING_SECONDS=$rollupFiringSeconds,BIGQUERY_TABLE_TRACKS=$bigqueryTableTracks,SCORING_MODE=$scoringMode,MODEL_DIR=$($env:MODEL_DIR),SCORING_BATCH_SIZE=$scoringBatchSize,SCORING_MAX_WAIT_SECONDS=$scoringMaxWaitSeconds,PROFILER=$profiler"
+} finally {
+    Remove-Item raw_payloads.py
+}
 
 Write-Host "Dataflow pipeline deployment complete!"
 Write-Host "Monitor the job at: https://console.cloud.google.com/dataflow/jobs?project=$($env:GOOGLE_CLOUD_PROJECT)" 
\ No newline at end of file
@@ -25,6 +25,10 @@ fi
 # Navigate to dataflow directory
 cd ../dataflow-pipeline
 
+# Workers import shared/raw_payloads.py from the staged package
+cp ../shared/raw_payloads.py .
+trap 'rm -f raw_payloads.py' EXIT
+
 # Create staging directories in Cloud Storage
 echo "📦 Creating staging directories..."
 gsutil mb -p $GOOGLE_CLOUD_PROJECT -c STANDARD -l ${GOOGLE_CLOUD_REGION:-us-central1} gs://$GOOGLE_CLOUD_PROJECT-dataflow || echo "Bucket may already exist"
@@ -48,7 +52,7 @@ python pipeline.py \
     --setup_file=./setup.py \
     --requirements_file=requirements.txt \
     --save_main_session \
-    --environment_variables="GOOGLE_GEOCODING_API_KEY=$GOOGLE_GEOCODING_API_KEY,GOOGLE_CLOUD_PROJECT=$GOOGLE_CLOUD_PROJECT,BIGQUERY_DATASET=${BIGQUERY_DATASET:-disaster_monitor},PUBSUB_TOPIC=${PUBSUB_TOPIC:-disaster-alerts},BIGQUERY_TABLE_EVENTS=${BIGQUERY_TABLE_EVENTS:-disaster_events},VERTEX_AI_ENDPOINT_NAME=$VERTEX_AI_ENDPOINT_NAME"
+    --environment_variables="GOOGLE_GEOCODING_API_KEY=$GOOGLE_GEOCODING_API_KEY,GOOGLE_CLOUD_PROJECT=$GOOGLE_CLOUD_PROJECT,BIGQUERY_DATASET=${BIGQUERY_DATASET:-disaster_monitor},PUBSUB_TOPIC=${PUBSUB_TOPIC:-disaster-alerts},BIGQUERY_TABLE_EVENTS=${BIGQUERY_TABLE_EVENTS:-disaster_events},BIGQUERY_TABLE_DEMOGRAPHICS=${BIGQUERY_TABLE_DEMOGRAPHICS:-demographics},DEMOGRAPHICS_REFRESH_SECONDS=${DEMOGRAPHICS_REFRESH_SECONDS:-900},GEOCODE_CACHE_PRECISION=${GEOCODE_CACHE_PRECISION:-3},GEOCODE_CACHE_SIZE=${GEOCODE_CACHE_SIZE:-10000},GEOCODE_CACHE_TTL_SECONDS=${GEOCODE_CACHE_TTL_SECONDS:-86400},GEOCODE_CACHE_PATH=${GEOCODE_CACHE_PATH:-/tmp/geocode_cache.sqlite},GEOCODE_CONCURRENCY=${GEOCODE_CONCURRENCY:-16},ENRICH_BATCH_SIZE=${ENRICH_BATCH_SIZE:-100},ENRICH_MAX_WAIT_SECONDS=${ENRICH_MAX_WAIT_SECONDS:-0.5},VERTEX_AI_ENDPOINT_NAME=$VERTEX_AI_ENDPOINT_NAME,DEDUP_TTL_SECONDS=${DEDUP_TTL_SECONDS:-172800},EVENTS_WRITE_MODE=${EVENTS_WRITE_MODE:-append},EVENTS_WRITE_AT_LEAST_ONCE=${EVENTS_WRITE_AT_LEAST_ONCE:-false},EVENTS_WRITE_TRIGGERING_SECONDS=${EVENTS_WRITE_TRIGGERING_SECONDS:-5},BIGQUERY_TABLE_DEAD_LETTER=${BIGQUERY_TABLE_DEAD_LETTER:-disaster_events_dead_letter},BIGQUERY_TABLE_ROLLUPS=${BIGQUERY_TABLE_ROLLUPS:-disaster_event_rollups},ROLLUP_FIRING_SECONDS=${ROLLUP_FIRING_SECONDS:-60},BIGQUERY_TABLE_TRACKS=${BIGQUERY_TABLE_TRACKS:-disaster_event_tracks},SCORING_MODE=${SCORING_MODE:-remote},MODEL_DIR=$MODEL_DIR,SCORING_BATCH_SIZE=${SCORING_BATCH_SIZE:-64},SCORING_MAX_WAIT_SECONDS=${SCORING_MAX_WAIT_SECONDS:-1.0},PROFILER=${PROFILER:-off}"
 
 echo "✅ Dataflow pipeline deployment complete!"
 echo "📊 Monitor the job at: https://console.cloud.google.com/dataflow/jobs?project=$GOOGLE_CLOUD_PROJECT" 
\ No newline at end of file
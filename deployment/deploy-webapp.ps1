@@ -20,33 +20,59 @@ if (-not $env:GOOGLE_CLOUD_PROJECT) {
     exit 1
 }
 
+$serviceName = $env:WEBAPP_SERVICE_NAME
+if (-not $serviceName) { $serviceName = "disaster-monitor-webapp" }
+$region = $env:GOOGLE_CLOUD_REGION
+if (-not $region) { $region = "us-central1" }
+$port = $env:WEBAPP_PORT
+if (-not $port) { $port = "8080" }
+
 # Navigate to webapp directory
 Set-Location ..\webapp
 
 # Build and push Docker image
 Write-Host "Building Docker image..."
-$imageName = "gcr.io/$($env:GOOGLE_CLOUD_PROJECT)/$($env:WEBAPP_SERVICE_NAME -or 'disaster-monitor-webapp')"
-docker build -t $imageName .
+$imageName = "gcr.io/$($env:GOOGLE_CLOUD_PROJECT)/$serviceName"
+# Build from the repo root so the image can include the shared/ modules
+docker build -t $imageName -f Dockerfile ..
 
 Write-Host "Pushing Docker image..."
 docker push $imageName
 
+# Service settings, with the same defaults as deploy-webapp.sh
+$bigqueryDataset = $env:BIGQUERY_DATASET
+if (-not $bigqueryDataset) { $bigqueryDataset = "disaster_monitor" }
+$bigqueryTableEvents = $env:BIGQUERY_TABLE_EVENTS
+if (-not $bigqueryTableEvents) { $bigqueryTableEvents = "disaster_events" }
+$bigqueryTableRollups = $env:BIGQUERY_TABLE_ROLLUPS
+if (-not $bigqueryTableRollups) { $bigqueryTableRollups = "disaster_event_rollups" }
+$bigqueryTableTracks = $env:BIGQUERY_TABLE_TRACKS
+if (-not $bigqueryTableTracks) { $bigqueryTableTracks = "disaster_event_tracks" }
+$dashboardCacheTtlSeconds = $env:DASHBOARD_CACHE_TTL_SECONDS
+if (-not $dashboardCacheTtlSeconds) { $dashboardCacheTtlSeconds = "60" }
+$dashboardFullReloadSeconds = $env:DASHBOARD_FULL_RELOAD_SECONDS
+if (-not $dashboardFullReloadSeconds) { $dashboardFullReloadSeconds = "900" }
+$rawDataStore = $env:RAW_DATA_STORE
+if (-not $rawDataStore) { $rawDataStore = "inline" }
+$rawDataBucket = $env:RAW_DATA_BUCKET
+if (-not $rawDataBucket) { $rawDataBucket = "$($env:GOOGLE_CLOUD_PROJECT)-raw-payloads" }
+
 # Deploy to Cloud Run
 Write-Host "Deploying to Cloud Run..."
-gcloud run deploy $($env:WEBAPP_SERVICE_NAME -or 'disaster-monitor-webapp') `
+gcloud run deploy $serviceName `
     --image=$imageName `
     --platform=managed `
-    --region=$($env:GOOGLE_CLOUD_REGION -or 'us-central1') `
+    --region=$region `
     --allow-unauthenticated `
-    --port=$($env:WEBAPP_PORT -or 8080) `
+    --port=$port `
     --memory=2Gi `
     --cpu=1 `
     --max-instances=10 `
-    --set-env-vars="GOOGLE_CLOUD_PROJECT=$($env:GOOGLE_CLOUD_PROJECT),BIGQUERY_DATASET=$($env:BIGQUERY_DATASET -or 'disaster_monitor'),BIGQUERY_TABLE_EVENTS=$($env:BIGQUERY_TABLE_EVENTS -or 'disaster_events')"
+    --set-env-vars="GOOGLE_CLOUD_PROJECT=$($env:GOOGLE_CLOUD_PROJECT),BIGQUERY_DATASET=$bigqueryDataset,BIGQUERY_TABLE_EVENTS=$bigqueryTableEvents,BIGQUERY_TABLE_ROLLUPS=$bigqueryTableRollups,BIGQUERY_TABLE_TRACKS=$bigqueryTableTracks,DASHBOARD_CACHE_TTL_SECONDS=$dashboardCacheTtlSeconds,DASHBOARD_FULL_RELOAD_SECONDS=$dashboardFullReloadSeconds,RAW_DATA_STORE=$rawDataStore,RAW_DATA_BUCKET=$rawDataBucket"
 
 # Get the service URL
-$serviceUrl = gcloud run services describe $($env:WEBAPP_SERVICE_NAME -or 'disaster-monitor-webapp') `
-    --region=$($env:GOOGLE_CLOUD_REGION -or 'us-central1') `
+$serviceUrl = gcloud run services describe $serviceName `
+    --region=$region `
     --format="value(status.url)"
 
 Write-Host "Web application deployment complete!"
@@ -24,7 +24,8 @@ cd ../webapp
 # Build and push Docker image
 echo "🐳 Building Docker image..."
 IMAGE_NAME="gcr.io/$GOOGLE_CLOUD_PROJECT/${WEBAPP_SERVICE_NAME:-disaster-monitor-webapp}"
-docker build -t $IMAGE_NAME .
+# Build from the repo root so the image can include the shared/ modules
+docker build -t $IMAGE_NAME -f Dockerfile ..
 
 echo "📤 Pushing Docker image..."
 docker push $IMAGE_NAME
@@ -40,7 +41,7 @@ gcloud run deploy ${WEBAPP_SERVICE_NAME:-disaster-monitor-webapp} \
     --memory=2Gi \
     --cpu=1 \
     --max-instances=10 \
-    --set-env-vars="GOOGLE_CLOUD_PROJECT=$GOOGLE_CLOUD_PROJECT,BIGQUERY_DATASET=${BIGQUERY_DATASET:-disaster_monitor},BIGQUERY_TABLE_EVENTS=${BIGQUERY_TABLE_EVENTS:-disaster_events}"
+    --set-env-vars="GOOGLE_CLOUD_PROJECT=$GOOGLE_CLOUD_PROJECT,BIGQUERY_DATASET=${BIGQUERY_DATASET:-disaster_monitor},BIGQUERY_TABLE_EVENTS=${BIGQUERY_TABLE_EVENTS:-disaster_events},BIGQUERY_TABLE_ROLLUPS=${BIGQUERY_TABLE_ROLLUPS:-disaster_event_rollups},BIGQUERY_TABLE_TRACKS=${BIGQUERY_TABLE_TRACKS:-disaster_event_tracks},DASHBOARD_CACHE_TTL_SECONDS=${DASHBOARD_CACHE_TTL_SECONDS:-60},DASHBOARD_FULL_RELOAD_SECONDS=${DASHBOARD_FULL_RELOAD_SECONDS:-900},RAW_DATA_STORE=${RAW_DATA_STORE:-inline},RAW_DATA_BUCKET=${RAW_DATA_BUCKET:-$GOOGLE_CLOUD_PROJECT-raw-payloads}"
 
 # Get the service URL
 SERVICE_URL=$(gcloud run services describe ${WEBAPP_SERVICE_NAME:-disaster-monitor-webapp} \
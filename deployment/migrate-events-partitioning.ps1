@@ -0,0 +1,68 @@
+# Migrate disaster_events to the partitioned, clustered layout (PowerShell)
+# Run once for a table created before partitioning, before the next
+# terraform apply. The table keeps its name and rows, so Terraform finds it
+# already partitioned instead of planning to replace it.
+
+Write-Host "Migrating disaster_events to a partitioned table..."
+
+# Load environment variables from .env
+$envFile = "..\.env"
+if (Test-Path $envFile) {
+    Get-Content $envFile | Where-Object { $_ -notmatch '^#' -and $_ -match '=' } | ForEach-Object {
+        $parts = $_ -split '=', 2
+        if ($parts.Count -eq 2) {
+            [System.Environment]::SetEnvironmentVariable($parts[0].Trim(), $parts[1].Trim())
+        }
+    }
+}
+
+# Check if required variables are set
+if (-not $env:GOOGLE_CLOUD_PROJECT) {
+    Write-Host "Error: GOOGLE_CLOUD_PROJECT not set"
+    exit 1
+}
+
+$dataset = $env:BIGQUERY_DATASET
+if (-not $dataset) { $dataset = "disaster_monitor" }
+$table = $env:BIGQUERY_TABLE_EVENTS
+if (-not $table) { $table = "disaster_events" }
+$events = "$($env:GOOGLE_CLOUD_PROJECT):$dataset.$table"
+$backup = "$($env:GOOGLE_CLOUD_PROJECT):$dataset.$($table)_unpartitioned"
+
+if ((bq show --format=prettyjson $events | Out-String) -match '"timePartitioning"') {
+    Write-Host "$events is already partitioned, nothing to do"
+    exit 0
+}
+
+Write-Host "Warning: drain the Dataflow job first: rows written after the backup is taken are not copied."
+$answer = Read-Host "Continue? [y/N]"
+if ($answer -ne "y") {
+    exit 1
+}
+
+# Keep the current rows in a backup table; the migration never deletes it
+Write-Host "Backing up to $backup..."
+bq cp -n $events $backup
+if ($LASTEXITCODE -ne 0) { exit 1 }
+
+# Recreate the table with the Terraform schema, partitioning and clustering
+Write-Host "Recreating $events..."
+bq rm -f -t $events
+bq mk --table `
+    --schema=..\infrastructure\schemas\disaster_events.json `
+    --time_partitioning_type=DAY `
+    --time_partitioning_field=detected_time `
+    --clustering_fields=event_type,severity,source `
+    $events
+if ($LASTEXITCODE -ne 0) { exit 1 }
+bq query --use_legacy_sql=false `
+    "ALTER TABLE ``$($env:GOOGLE_CLOUD_PROJECT).$dataset.$table`` ADD PRIMARY KEY (event_id) NOT ENFORCED"
+
+# Copy the rows back
+Write-Host "Copying rows back..."
+bq query --use_legacy_sql=false `
+    "INSERT INTO ``$($env:GOOGLE_CLOUD_PROJECT).$dataset.$table`` SELECT * FROM ``$($env:GOOGLE_CLOUD_PROJECT).$dataset.$($table)_unpartitioned``"
+if ($LASTEXITCODE -ne 0) { exit 1 }
+
+Write-Host "Migration complete! Run terraform apply, then restart the Dataflow job."
+Write-Host "Delete $backup once the row counts match."
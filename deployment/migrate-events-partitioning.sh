@@ -0,0 +1,61 @@
+#!/bin/bash
+
+# Migrate disaster_events to the partitioned, clustered layout
+# Run once for a table created before partitioning, before the next
+# terraform apply. The table keeps its name and rows, so Terraform finds it
+# already partitioned instead of planning to replace it.
+
+set -e
+
+echo "🚚 Migrating disaster_events to a partitioned table..."
+
+# Load environment variables
+if [ -f "../env.example" ]; then
+    export $(cat ../env.example | grep -v '^#' | xargs)
+fi
+
+# Check if required variables are set
+if [ -z "$GOOGLE_CLOUD_PROJECT" ]; then
+    echo "❌ Error: GOOGLE_CLOUD_PROJECT not set"
+    exit 1
+fi
+
+DATASET=${BIGQUERY_DATASET:-disaster_monitor}
+TABLE=${BIGQUERY_TABLE_EVENTS:-disaster_events}
+EVENTS="$GOOGLE_CLOUD_PROJECT:$DATASET.$TABLE"
+BACKUP="$GOOGLE_CLOUD_PROJECT:$DATASET.${TABLE}_unpartitioned"
+
+if bq show --format=prettyjson "$EVENTS" | grep -q '"timePartitioning"'; then
+    echo "✅ $EVENTS is already partitioned, nothing to do"
+    exit 0
+fi
+
+echo "⚠️  Drain the Dataflow job first: rows written after the backup is taken are not copied."
+read -p "Continue? [y/N] " answer
+if [ "$answer" != "y" ]; then
+    exit 1
+fi
+
+# Keep the current rows in a backup table; the migration never deletes it
+echo "📦 Backing up to $BACKUP..."
+bq cp -n "$EVENTS" "$BACKUP"
+
+# Recreate the table with the Terraform schema, partitioning and clustering
+echo "🔧 Recreating $EVENTS..."
+bq rm -f -t "$EVENTS"
+bq mk --table \
+    --schema=../infrastructure/schemas/disaster_events.json \
+    --time_partitioning_type=DAY \
+    --time_partitioning_field=detected_time \
+    --clustering_fields=event_type,severity,source \
+    "$EVENTS"
+bq query --use_legacy_sql=false \
+    "ALTER TABLE \`$GOOGLE_CLOUD_PROJECT.$DATASET.$TABLE\` ADD PRIMARY KEY (event_id) NOT ENFORCED"
+
+# Copy the rows back
+echo "📥 Copying rows back..."
+bq query --use_legacy_sql=false \
+    "INSERT INTO \`$GOOGLE_CLOUD_PROJECT.$DATASET.$TABLE\` SELECT * FROM \`$GOOGLE_CLOUD_PROJECT.$DATASET.${TABLE}_unpartitioned\`"
+
+echo "✅ Migration complete! Run terraform apply, then restart the Dataflow job."
+echo "🗑️  Delete $BACKUP once the row counts match."
@@ -57,6 +57,76 @@ resource "google_bigquery_table" "disaster_events" {
 
   schema = file("${path.module}/schemas/disaster_events.json")
 
+  # Partition by detection day and cluster on the dashboard filter columns so
+  # queries only scan the selected time window and event types
+  time_partitioning {
+    type  = "DAY"
+    field = "detected_time"
+  }
+
+  clustering = ["event_type", "severity", "source"]
+
+  # Primary key (not enforced) required for the pipeline's CDC upsert write mode
+  table_constraints {
+    primary_key {
+      columns = ["event_id"]
+    }
+  }
+
+  # Partitioning can't be added in place, so a table created before it would
+  # be replaced and its history dropped. Refuse instead; migrate it with
+  # deployment/migrate-events-partitioning.sh first.
+  deletion_protection = true
+
+  lifecycle {
+    prevent_destroy = true
+  }
+}
+
+# Create BigQuery table for hourly dashboard rollups
+resource "google_bigquery_table" "disaster_event_rollups" {
+  dataset_id = google_bigquery_dataset.disaster_monitor.dataset_id
+  table_id   = var.bigquery_table_rollups
+
+  schema = file("${path.module}/schemas/disaster_event_rollups.json")
+
+  time_partitioning {
+    type  = "DAY"
+    field = "hour"
+  }
+
+  deletion_protection = false
+}
+
+# Create BigQuery table for EONET track points (storm paths, fire spread)
+resource "google_bigquery_table" "disaster_event_tracks" {
+  dataset_id = google_bigquery_dataset.disaster_monitor.dataset_id
+  table_id   = var.bigquery_table_tracks
+
+  schema = file("${path.module}/schemas/disaster_event_tracks.json")
+
+  time_partitioning {
+    type  = "DAY"
+    field = "point_time"
+  }
+
+  clustering = ["event_id"]
+
+  deletion_protection = false
+}
+
+# Create BigQuery table for events the pipeline could not write
+resource "google_bigquery_table" "disaster_events_dead_letter" {
+  dataset_id = google_bigquery_dataset.disaster_monitor.dataset_id
+  table_id   = var.bigquery_table_dead_letter
+
+  schema = file("${path.module}/schemas/disaster_events_dead_letter.json")
+
+  time_partitioning {
+    type  = "DAY"
+    field = "failed_time"
+  }
+
   deletion_protection = false
 }
 
@@ -122,4 +192,34 @@ resource "google_project_iam_member" "pubsub_publisher" {
   project = var.project_id
   role    = "roles/pubsub.publisher"
   member  = "serviceAccount:${google_service_account.cloud_function_sa.email}"
-} 
\ No newline at end of file
+}
+
+# Bucket holding the ingestion function's seen-event state
+resource "google_storage_bucket" "ingestion_state" {
+  name          = "${var.project_id}-ingestion-state"
+  location      = var.region
+  force_destroy = true
+
+  uniform_bucket_level_access = true
+}
+
+resource "google_storage_bucket_iam_member" "ingestion_state_writer" {
+  bucket = google_storage_bucket.ingestion_state.name
+  role   = "roles/storage.objectAdmin"
+  member = "serviceAccount:${google_service_account.cloud_function_sa.email}"
+}
+
+# Content-addressed raw source payloads (RAW_DATA_STORE=gcs), written once by digest
+resource "google_storage_bucket" "raw_payloads" {
+  name          = "${var.project_id}-raw-payloads"
+  location      = var.region
+  force_destroy = true
+
+  uniform_bucket_level_access = true
+}
+
+resource "google_storage_bucket_iam_member" "raw_payloads_writer" {
+  bucket = google_storage_bucket.raw_payloads.name
+  role   = "roles/storage.objectAdmin"
+  member = "serviceAccount:${google_service_account.cloud_function_sa.email}"
+}
@@ -37,4 +37,22 @@ variable "bigquery_table_demographics" {
   description = "BigQuery table name for demographics"
   type        = string
   default     = "demographics"
-} 
\ No newline at end of file
+}
+
+variable "bigquery_table_rollups" {
+  description = "BigQuery table name for hourly event rollups"
+  type        = string
+  default     = "disaster_event_rollups"
+}
+
+variable "bigquery_table_tracks" {
+  description = "BigQuery table name for event track points"
+  type        = string
+  default     = "disaster_event_tracks"
+}
+
+variable "bigquery_table_dead_letter" {
+  description = "BigQuery table name for events the pipeline could not write"
+  type        = string
+  default     = "disaster_events_dead_letter"
+}
@@ -0,0 +1,151 @@
+"""Flat-array export of the trained model and scaler
+
+Writes contiguous NumPy arrays to <model_dir>/flat/ so scoring workers can
+memory-map the model instead of unpickling model.joblib. The export covers
+RandomForestRegressor, HistGradientBoostingRegressor (squared error, no
+categorical features) and linear models. The scorer is
+dataflow-pipeline/scoring.py:FlatModel, and `verify` checks that it matches
+model.predict exactly.
+"""
+import json
+import os
+import shutil
+import sys
+
+import numpy as np
+
+from features import FEATURE_NAMES
+
+
+def _forest_nodes(model):
+    """Per-tree node arrays of a fitted RandomForestRegressor"""
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        missing = getattr(tree, 'missing_go_to_left', None)
+        yield {
+            'feature': tree.feature,
+            'threshold': tree.threshold,
+            'left': tree.children_left,
+            'right': tree.children_right,
+            'value': tree.value[:, 0, 0],
+            'missing_left': missing if missing is not None else np.zeros(tree.node_count, dtype=np.uint8),
+            'is_leaf': tree.children_left == -1,
+            'depth': tree.max_depth
+        }
+
+
+def _boosting_nodes(model):
+    """Per-iteration node arrays of a fitted HistGradientBoostingRegressor"""
+    for (predictor,) in model._predictors:
+        nodes = predictor.nodes
+        if nodes['is_categorical'].any():
+            raise ValueError("Categorical splits are not supported by the flat export")
+        yield {
+            'feature': nodes['feature_idx'],
+            'threshold': nodes['num_threshold'],
+            'left': nodes['left'].astype(np.int64),
+            'right': nodes['right'].astype(np.int64),
+            'value': nodes['value'],
+            'missing_left': nodes['missing_go_to_left'],
+            'is_leaf': nodes['is_leaf'].astype(bool),
+            'depth': int(nodes['depth'].max())
+        }
+
+
+def flatten(model, scaler):
+    """(meta, arrays) for a fitted model and StandardScaler"""
+    from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor
+
+    meta = {'feature_names': FEATURE_NAMES}
+    arrays = {}
+    if scaler is not None:
+        arrays['scaler_mean'] = np.asarray(scaler.mean_, dtype=np.float64)
+        arrays['scaler_scale'] = np.asarray(scaler.scale_, dtype=np.float64)
+
+    if isinstance(model, RandomForestRegressor):
+        # sklearn trees compare float32 inputs against float64 thresholds
+        meta.update(kind='forest', input_dtype='float32')
+        trees = list(_forest_nodes(model))
+    elif isinstance(model, HistGradientBoostingRegressor):
+        if type(model._loss).__name__ != 'HalfSquaredError':
+            raise ValueError(f"Unsupported boosting loss: {model.loss}")
+        meta.update(kind='boosting', input_dtype='float64',
+                    baseline=float(np.ravel(model._baseline_prediction)[0]))
+        trees = list(_boosting_nodes(model))
+    elif hasattr(model, 'coef_') and np.ndim(model.coef_) == 1:
+        meta.update(kind='linear', intercept=float(np.ravel(model.intercept_)[0]))
+        arrays['coef'] = np.asarray(model.coef_, dtype=np.float64)
+        meta['arrays'] = sorted(arrays)
+        return meta, arrays
+    else:
+        raise ValueError(f"Unsupported model type for flat export: {type(model).__name__}")
+
+    feature, threshold, left, right, value, missing_left, roots = [], [], [], [], [], [], []
+    offset = 0
+    for tree in trees:
+        n = len(tree['value'])
+        own = np.arange(offset, offset + n, dtype=np.int32)
+        # Leaves point at themselves so a fixed number of steps lands every row on a leaf
+        feature.append(np.where(tree['is_leaf'], 0, tree['feature']).astype(np.int32))
+        threshold.append(np.asarray(tree['threshold'], dtype=np.float64))
+        left.append(np.where(tree['is_leaf'], own, tree['left'] + offset).astype(np.int32))
+        right.append(np.where(tree['is_leaf'], own, tree['right'] + offset).astype(np.int32))
+        value.append(np.asarray(tree['value'], dtype=np.float64))
+        missing_left.append(np.asarray(tree['missing_left'], dtype=bool))
+        roots.append(offset)
+        offset += n
+
+    arrays.update(
+        feature=np.concatenate(feature),
+        threshold=np.concatenate(threshold),
+        left=np.concatenate(left),
+        right=np.concatenate(right),
+        value=np.concatenate(value),
+        missing_left=np.concatenate(missing_left),
+        roots=np.asarray(roots, dtype=np.int32)
+    )
+    meta['max_depth'] = max(tree['depth'] for tree in trees)
+    meta['arrays'] = sorted(arrays)
+    return meta, arrays
+
+
+def export_flat_model(model, scaler, model_dir):
+    """Write the flat export to <model_dir>/flat; returns the directory
+
+    Any earlier export is removed first, so if this model can't be
+    flattened scorers fall back to model.joblib instead of the old arrays.
+    """
+    directory = os.path.join(model_dir, 'flat')
+    shutil.rmtree(directory, ignore_errors=True)
+    meta, arrays = flatten(model, scaler)
+    os.makedirs(directory)
+    for name, array in arrays.items():
+        np.save(os.path.join(directory, f"{name}.npy"), np.ascontiguousarray(array))
+    with open(os.path.join(directory, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+    return directory
+
+
+def verify(model, scaler, directory, X):
+    """Raise if the flat scorer differs from model.predict on X"""
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dataflow-pipeline'))
+    from scoring import FlatModel
+
+    expected = model.predict(scaler.transform(X))
+    actual = np.asarray(FlatModel.load(directory).predict(X).predictions)
+    if not np.array_equal(expected, actual):
+        mismatches = int(np.sum(expected != actual))
+        raise AssertionError(f"Flat model differs from model.predict on {mismatches}/{len(X)} rows")
+
+
+if __name__ == "__main__":
+    import joblib
+
+    model_dir = sys.argv[1] if len(sys.argv) > 1 else './model'
+    model = joblib.load(os.path.join(model_dir, 'model.joblib'))
+    scaler = joblib.load(os.path.join(model_dir, 'scaler.joblib'))
+    directory = export_flat_model(model, scaler, model_dir)
+
+    from train_model import create_synthetic_data
+    verify(model, scaler, directory, create_synthetic_data()[FEATURE_NAMES].to_numpy())
+    print(f"Flat model written to {directory} and verified against model.predict")
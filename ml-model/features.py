@@ -0,0 +1,142 @@
+import json
+import os
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+FEATURE_NAMES = [
+    'magnitude', 'population_density', 'severity_critical',
+    'severity_high', 'severity_medium', 'event_earthquake',
+    'event_wildfire', 'event_volcano'
+]
+
+# (column, value) behind each one-hot feature, in FEATURE_NAMES order
+INDICATORS = [
+    ('severity', 'critical'), ('severity', 'high'), ('severity', 'medium'),
+    ('event_type', 'earthquake'), ('event_type', 'wildfire'), ('event_type', 'volcano')
+]
+
+RAW_COLUMNS = ['magnitude', 'population_density', 'severity', 'event_type', 'impact_score', 'detected_time']
+
+
+def _indicator(column, value):
+    """1.0 where a string column equals `value`, comparing only the dictionary when encoded"""
+    if isinstance(column, pa.ChunkedArray):
+        column = column.combine_chunks()
+    if pa.types.is_dictionary(column.type):
+        matches = np.asarray(pc.equal(column.dictionary, value).fill_null(False), dtype=np.float32)
+        indices = column.indices.fill_null(0).to_numpy()
+        result = matches[indices] if len(matches) else np.zeros(len(column), dtype=np.float32)
+        if column.null_count:
+            result[~np.asarray(column.is_valid())] = 0.0
+        return result
+    return np.asarray(pc.equal(column, value).fill_null(False), dtype=np.float32)
+
+
+def build_features(batch, target='impact_score'):
+    """Feature matrix (n, len(FEATURE_NAMES)) and target vector as float32 from a record batch"""
+    n = batch.num_rows
+    X = np.empty((n, len(FEATURE_NAMES)), dtype=np.float32)
+    X[:, 0] = batch.column('magnitude').to_numpy(zero_copy_only=False)
+    X[:, 1] = batch.column('population_density').to_numpy(zero_copy_only=False)
+    for i, (column, value) in enumerate(INDICATORS, start=2):
+        X[:, i] = _indicator(batch.column(column), value)
+    y = np.asarray(batch.column(target).to_numpy(zero_copy_only=False), dtype=np.float32)
+    return X, y
+
+
+class FeatureCache:
+    """Feature matrix cached on disk as memory-mapped .npy chunks
+
+    Each update appends one chunk holding the rows detected after the
+    previous watermark, as float32 features with the target in the last
+    column. A manifest tracks the chunks and the watermark between runs.
+
+    The cache is append-only and not keyed by event_id. Rows written with a
+    detected_time at or before the watermark (backfills, upserts of older
+    events) are never picked up, and a revised event adds a row without
+    removing its earlier version. Delete the cache directory after a
+    backfill to rebuild it from the table.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, 'manifest.json')
+        self.manifest = {'feature_names': FEATURE_NAMES, 'watermark': None, 'chunks': []}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+            if manifest.get('feature_names') == FEATURE_NAMES:
+                self.manifest = manifest
+
+    @property
+    def watermark(self):
+        return self.manifest['watermark']
+
+    @property
+    def rows(self):
+        return sum(chunk['rows'] for chunk in self.manifest['chunks'])
+
+    def update(self, batches):
+        """Stream record batches into a new chunk; returns the number of rows added"""
+        os.makedirs(self.directory, exist_ok=True)
+        raw_path = os.path.join(self.directory, 'chunk.tmp')
+        rows = 0
+        watermark = self.watermark
+        with open(raw_path, 'wb') as raw:
+            for batch in batches:
+                X, y = build_features(batch)
+                np.column_stack([X, y]).astype(np.float32, copy=False).tofile(raw)
+                rows += batch.num_rows
+                latest = pc.max(batch.column('detected_time')).as_py()
+                if latest is not None and (watermark is None or latest.isoformat() > watermark):
+                    watermark = latest.isoformat()
+
+        if rows:
+            name = f"features-{len(self.manifest['chunks']):05d}.npy"
+            source = np.memmap(raw_path, dtype=np.float32, mode='r', shape=(rows, len(FEATURE_NAMES) + 1))
+            target = np.lib.format.open_memmap(
+                os.path.join(self.directory, name), mode='w+', dtype=np.float32, shape=source.shape
+            )
+            target[:] = source
+            target.flush()
+            del source, target
+            self.manifest['chunks'].append({'file': name, 'rows': rows})
+            self.manifest['watermark'] = watermark
+            self._save_manifest()
+        os.remove(raw_path)
+        return rows
+
+    def chunks(self, start=0):
+        """Yield (X, y) memory-mapped views of each chunk from index `start`"""
+        for chunk in self.manifest['chunks'][start:]:
+            data = np.load(os.path.join(self.directory, chunk['file']), mmap_mode='r')
+            yield data[:, :-1], data[:, -1]
+
+    def matrix(self):
+        """All cached rows as one memory-mapped (X, y), merging chunks on disk first"""
+        if len(self.manifest['chunks']) > 1:
+            path = os.path.join(self.directory, 'features-merged.tmp')
+            merged = np.lib.format.open_memmap(
+                path, mode='w+', dtype=np.float32, shape=(self.rows, len(FEATURE_NAMES) + 1)
+            )
+            offset = 0
+            for X, y in self.chunks():
+                merged[offset:offset + len(X), :-1] = X
+                merged[offset:offset + len(X), -1] = y
+                offset += len(X)
+            merged.flush()
+            del merged
+            for chunk in self.manifest['chunks']:
+                os.remove(os.path.join(self.directory, chunk['file']))
+            os.replace(path, os.path.join(self.directory, 'features-00000.npy'))
+            self.manifest['chunks'] = [{'file': 'features-00000.npy', 'rows': offset}]
+            self._save_manifest()
+        return next(self.chunks())
+
+    def _save_manifest(self):
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.manifest, f)
+        os.replace(tmp_path, self.manifest_path)
@@ -1,50 +1,39 @@
 import pandas as pd
 import numpy as np
 from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import SGDRegressor
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import mean_squared_error, r2_score
 import joblib
 import os
-from google.cloud import bigquery
+import sys
 from google.cloud import aiplatform
 import json
+from datetime import datetime
 
-def load_training_data(project_id, dataset_id):
-    """Load training data from BigQuery"""
-    client = bigquery.Client(project=project_id)
-    
-    query = f"""
-    SELECT 
-        magnitude,
-        population_density,
-        CASE 
-            WHEN severity = 'critical' THEN 1 ELSE 0 
-        END as severity_critical,
-        CASE 
-            WHEN severity = 'high' THEN 1 ELSE 0 
-        END as severity_high,
-        CASE 
-            WHEN severity = 'medium' THEN 1 ELSE 0 
-        END as severity_medium,
-        CASE 
-            WHEN event_type = 'earthquake' THEN 1 ELSE 0 
-        END as event_earthquake,
-        CASE 
-            WHEN event_type = 'wildfire' THEN 1 ELSE 0 
-        END as event_wildfire,
-        CASE 
-            WHEN event_type = 'volcano' THEN 1 ELSE 0 
-        END as event_volcano,
-        COALESCE(impact_score, 0.5) as target
-    FROM `{project_id}.{dataset_id}.disaster_events`
-    WHERE impact_score IS NOT NULL
-    AND magnitude IS NOT NULL
-    AND population_density IS NOT NULL
+from export_model import export_flat_model
+from features import FEATURE_NAMES, RAW_COLUMNS, FeatureCache
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'shared'))
+import event_store
+
+def load_training_batches(project_id, dataset_id, since=None):
+    """Stream training rows from the columnar event store as Arrow record batches
+    
+    When `since` is given only rows detected after it are read.
     """
+    store = event_store.get_event_store(f"{project_id}.{dataset_id}.disaster_events", project=project_id)
+    
+    filters = [
+        ('impact_score', 'not null', None),
+        ('magnitude', 'not null', None),
+        ('population_density', 'not null', None)
+    ]
+    if since is not None:
+        filters.append(('detected_time', '>', datetime.fromisoformat(since)))
     
-    df = client.query(query).to_dataframe()
-    return df
+    return store.iter_batches(RAW_COLUMNS, filters)
 
 def create_synthetic_data():
     """Create synthetic training data if no real data exists"""
@@ -89,15 +78,105 @@ def train_model(X_train, y_train, X_val, y_val):
     model.fit(X_train, y_train)
     
     # Evaluate model
-    y_pred = model.predict(X_val)
-    mse = mean_squared_error(y_val, y_pred)
-    r2 = r2_score(y_val, y_pred)
+    evaluate_model(model, X_val, y_val, 'Validation')
+    
+    return model
+
+def evaluate_model(model, X, y, label):
+    """Print MSE and R² of the model's predictions on (X, y)"""
+    y_pred = model.predict(X)
+    print(f"{label} MSE: {mean_squared_error(y, y_pred):.4f}")
+    print(f"{label} R²: {r2_score(y, y_pred):.4f}")
+
+def update_forest(model, X_new, y_new, trees_per_update=20, max_trees=200):
+    """Grow `trees_per_update` extra trees fitted on the new rows only (warm start)
     
-    print(f"Validation MSE: {mse:.4f}")
-    print(f"Validation R²: {r2:.4f}")
+    Past `max_trees` the oldest trees are dropped first, so model size and
+    scoring cost stay bounded.
+    """
+    keep = max(0, min(len(model.estimators_), max_trees - trees_per_update))
+    model.estimators_ = model.estimators_[len(model.estimators_) - keep:]
+    model.set_params(warm_start=True, n_estimators=keep + trees_per_update)
+    model.fit(X_new, y_new)
+    return model
+
+def split_chunks(chunks, test_size=0.15):
+    """Split every cached chunk's rows into train and held-out test parts
     
+    The split is seeded by chunk position, so it is the same on every pass.
+    Returns (train_chunks, test_chunks) callables like `chunks`.
+    """
+    def part(test):
+        for i, (X, y) in enumerate(chunks()):
+            mask = (np.random.default_rng(i).random(len(X)) < test_size) == test
+            yield X[mask], y[mask]
+    return lambda: part(False), lambda: part(True)
+
+def update_sgd(model, scaler, chunks, epochs=5, batch_size=4096):
+    """Run `epochs` passes of partial_fit over memory-mapped (X, y) chunks"""
+    for _ in range(epochs):
+        for X, y in chunks():
+            for start in range(0, len(X), batch_size):
+                model.partial_fit(
+                    scaler.transform(X[start:start + batch_size]),
+                    y[start:start + batch_size]
+                )
     return model
 
+# Model type each INCREMENTAL_MODEL family updates in place
+INCREMENTAL_FAMILIES = {'forest': RandomForestRegressor, 'sgd': SGDRegressor}
+
+def train_incremental(cache, first_new_chunk, model_dir, family, trees_per_update, max_trees=200):
+    """Update the saved model with the chunks added this run
+    
+    The scaler is frozen once fitted so earlier trees/weights keep seeing the
+    same input scale. Without a saved model, the first run fits on the whole
+    cache. A saved model of another type than `family` (e.g. a
+    tune_model.py winner) is never replaced; that raises ValueError. A share
+    of the new rows is held out and returned as (X_test, y_test) for
+    evaluation.
+    """
+    if family not in INCREMENTAL_FAMILIES:
+        raise ValueError(f"Unknown INCREMENTAL_MODEL: {family}")
+    model_path = os.path.join(model_dir, 'model.joblib')
+    scaler_path = os.path.join(model_dir, 'scaler.joblib')
+    
+    if os.path.exists(model_path) and os.path.exists(scaler_path):
+        model = joblib.load(model_path)
+        scaler = joblib.load(scaler_path)
+        expected = INCREMENTAL_FAMILIES[family]
+        if not isinstance(model, expected):
+            raise ValueError(
+                f"Saved model in {model_dir} is a {type(model).__name__}, which INCREMENTAL_MODEL={family} "
+                f"can't update ({expected.__name__} expected). Retrain it with TRAINING_MODE=full or "
+                f"tune_model.py, or point MODEL_OUTPUT_DIR at a {expected.__name__}."
+            )
+        chunks = lambda: cache.chunks(first_new_chunk)
+    else:
+        model = None
+        scaler = StandardScaler()
+        for X, _ in cache.chunks():
+            scaler.partial_fit(X)
+        chunks = cache.chunks
+    
+    chunks, test_chunks = split_chunks(chunks)
+    X_test = np.concatenate([X for X, _ in test_chunks()])
+    y_test = np.concatenate([y for _, y in test_chunks()])
+    
+    if family == 'sgd':
+        if model is None:
+            model = SGDRegressor(random_state=42)
+        return update_sgd(model, scaler, chunks), scaler, (X_test, y_test)
+    
+    X_new = np.concatenate([X for X, _ in chunks()])
+    y_new = np.concatenate([y for _, y in chunks()])
+    if model is not None:
+        model = update_forest(model, scaler.transform(X_new), y_new, trees_per_update, max_trees)
+    else:
+        model = RandomForestRegressor(n_estimators=min(100, max_trees), max_depth=10, random_state=42, n_jobs=-1)
+        model.fit(scaler.transform(X_new), y_new)
+    return model, scaler, (X_test, y_test)
+
 def save_model(model, scaler, model_dir):
     """Save the trained model and scaler"""
     os.makedirs(model_dir, exist_ok=True)
@@ -109,14 +188,14 @@ def save_model(model, scaler, model_dir):
     joblib.dump(scaler, os.path.join(model_dir, 'scaler.joblib'))
     
     # Save feature names
-    feature_names = [
-        'magnitude', 'population_density', 'severity_critical',
-        'severity_high', 'severity_medium', 'event_earthquake',
-        'event_wildfire', 'event_volcano'
-    ]
-    
     with open(os.path.join(model_dir, 'feature_names.json'), 'w') as f:
-        json.dump(feature_names, f)
+        json.dump(FEATURE_NAMES, f)
+    
+    # Flat-array copy that scoring workers memory-map instead of unpickling
+    try:
+        export_flat_model(model, scaler, model_dir)
+    except ValueError as e:
+        print(f"Skipping flat model export: {e}")
     
     print(f"Model saved to {model_dir}")
 
@@ -148,50 +227,65 @@ def main():
     region = os.getenv('GOOGLE_CLOUD_REGION')
     model_name = os.getenv('VERTEX_AI_MODEL_NAME')
     
+    model_dir = os.getenv('MODEL_OUTPUT_DIR', './model')
+    training_mode = os.getenv('TRAINING_MODE', 'full').lower()
+    cache = FeatureCache(os.getenv('FEATURE_CACHE_DIR', './feature_cache'))
+    
     print("Loading training data...")
     
+    first_new_chunk = len(cache.manifest['chunks'])
     try:
-        # Try to load real data
-        df = load_training_data(project_id, dataset_id)
-        if len(df) < 100:
-            print("Not enough real data, using synthetic data...")
-            df = create_synthetic_data()
+        # Append rows detected since the last run to the on-disk feature cache;
+        # rows backfilled with an older detected_time need a fresh cache
+        # (see FeatureCache)
+        new_rows = cache.update(load_training_batches(project_id, dataset_id, since=cache.watermark))
+        print(f"Cached {new_rows} new rows ({cache.rows} total)")
     except Exception as e:
         print(f"Error loading real data: {e}")
-        print("Using synthetic data...")
-        df = create_synthetic_data()
-    
-    print(f"Training data shape: {df.shape}")
+        new_rows = 0
     
-    # Prepare features and target
-    feature_cols = [col for col in df.columns if col != 'target']
-    X = df[feature_cols]
-    y = df['target']
+    if training_mode == 'incremental' and cache.rows >= 100:
+        if new_rows == 0 and os.path.exists(os.path.join(model_dir, 'model.joblib')):
+            print("No new rows since the last run, model unchanged")
+            return
+        print("Updating model incrementally...")
+        model, scaler, (X_test, y_test) = train_incremental(
+            cache, first_new_chunk, model_dir,
+            family=os.getenv('INCREMENTAL_MODEL', 'forest').lower(),
+            trees_per_update=int(os.getenv('TREES_PER_UPDATE', '20')),
+            max_trees=int(os.getenv('MAX_TREES', '200'))
+        )
+        if len(X_test):
+            evaluate_model(model, scaler.transform(X_test), y_test, 'Test')
+    else:
+        if cache.rows >= 100:
+            X, y = cache.matrix()
+        else:
+            print("Not enough real data, using synthetic data...")
+            df = create_synthetic_data()
+            X = df[FEATURE_NAMES].to_numpy(dtype=np.float32)
+            y = df['target'].to_numpy(dtype=np.float32)
     
-    # Split data
-    X_train, X_temp, y_train, y_temp = train_test_split(X, y, test_size=0.3, random_state=42)
-    X_val, X_test, y_val, y_test = train_test_split(X_temp, y_temp, test_size=0.5, random_state=42)
+        print(f"Training data shape: {X.shape}")
     
-    # Scale features
-    scaler = StandardScaler()
-    X_train_scaled = scaler.fit_transform(X_train)
-    X_val_scaled = scaler.transform(X_val)
-    X_test_scaled = scaler.transform(X_test)
+        # Split data
+        X_train, X_temp, y_train, y_temp = train_test_split(X, y, test_size=0.3, random_state=42)
+        X_val, X_test, y_val, y_test = train_test_split(X_temp, y_temp, test_size=0.5, random_state=42)
     
-    # Train model
-    print("Training model...")
-    model = train_model(X_train_scaled, y_train, X_val_scaled, y_val)
+        # Scale features
+        scaler = StandardScaler()
+        X_train_scaled = scaler.fit_transform(X_train)
+        X_val_scaled = scaler.transform(X_val)
+        X_test_scaled = scaler.transform(X_test)
     
-    # Test model
-    y_test_pred = model.predict(X_test_scaled)
-    test_mse = mean_squared_error(y_test, y_test_pred)
-    test_r2 = r2_score(y_test, y_test_pred)
+        # Train model
+        print("Training model...")
+        model = train_model(X_train_scaled, y_train, X_val_scaled, y_val)
     
-    print(f"Test MSE: {test_mse:.4f}")
-    print(f"Test R²: {test_r2:.4f}")
+        # Test model
+        evaluate_model(model, X_test_scaled, y_test, 'Test')
     
     # Save model
-    model_dir = "./model"
     save_model(model, scaler, model_dir)
     
     # Deploy to Vertex AI
@@ -0,0 +1,206 @@
+"""Cross-validated model search for the impact model
+
+Candidates from each model family are cross-validated in a process pool.
+The candidates are then refit on the full training set one at a time, and
+each refit is benchmarked for single-event and batched inference latency and
+serialized size. Only the best in-budget refit so far is kept. The winner
+is the best CV score that fits the latency and size budgets, and it is
+saved next to the training artifacts with the benchmark numbers.
+"""
+import io
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+
+import joblib
+import numpy as np
+from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor
+from sklearn.linear_model import Ridge
+from sklearn.metrics import mean_squared_error, r2_score
+from sklearn.model_selection import KFold, train_test_split
+from sklearn.preprocessing import StandardScaler
+
+from features import FEATURE_NAMES, FeatureCache
+from train_model import create_synthetic_data, load_training_batches, save_model
+
+MODEL_FAMILIES = {
+    'random_forest': (RandomForestRegressor, {
+        'n_estimators': [50, 100, 200],
+        'max_depth': [6, 10, None],
+        'random_state': [42],
+        'n_jobs': [1]
+    }),
+    'hist_gradient_boosting': (HistGradientBoostingRegressor, {
+        'max_iter': [100, 300],
+        'learning_rate': [0.05, 0.1],
+        'max_leaf_nodes': [15, 31],
+        'random_state': [42]
+    }),
+    'linear': (Ridge, {
+        'alpha': [0.1, 1.0, 10.0]
+    })
+}
+
+
+def candidates(families=None):
+    """(family, params) for every grid point of the selected families"""
+    for family, (_, grid) in MODEL_FAMILIES.items():
+        if families and family not in families:
+            continue
+        keys = sorted(grid)
+        for values in product(*(grid[key] for key in keys)):
+            yield family, dict(zip(keys, values))
+
+
+def cross_validate(data_path, family, params, folds=5):
+    """Mean/std CV R² and mean MSE of one candidate; runs in a pool worker"""
+    data = np.load(data_path, mmap_mode='r')
+    X, y = data[:, :-1], data[:, -1]
+    estimator_cls = MODEL_FAMILIES[family][0]
+
+    r2_scores, mse_scores = [], []
+    for train_idx, test_idx in KFold(n_splits=folds, shuffle=True, random_state=42).split(X):
+        scaler = StandardScaler().fit(X[train_idx])
+        model = estimator_cls(**params).fit(scaler.transform(X[train_idx]), y[train_idx])
+        y_pred = model.predict(scaler.transform(X[test_idx]))
+        r2_scores.append(r2_score(y[test_idx], y_pred))
+        mse_scores.append(mean_squared_error(y[test_idx], y_pred))
+
+    return {
+        'family': family,
+        'params': params,
+        'cv_r2': float(np.mean(r2_scores)),
+        'cv_r2_std': float(np.std(r2_scores)),
+        'cv_mse': float(np.mean(mse_scores))
+    }
+
+
+def benchmark_model(model, scaler, X, single_repeats=200, batch_size=1000):
+    """Median single-event latency, per-event latency in batches and pickled size"""
+    rows = scaler.transform(X[:batch_size])
+
+    single = []
+    for i in range(single_repeats):
+        row = rows[i % len(rows)].reshape(1, -1)
+        start = time.perf_counter()
+        model.predict(row)
+        single.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    model.predict(rows)
+    batch_seconds = time.perf_counter() - start
+
+    buffer = io.BytesIO()
+    joblib.dump(model, buffer)
+
+    return {
+        'single_latency_ms': float(np.median(single) * 1000),
+        'single_latency_p99_ms': float(np.percentile(single, 99) * 1000),
+        'batch_latency_per_event_us': float(batch_seconds / len(rows) * 1e6),
+        'model_size_bytes': buffer.tell()
+    }
+
+
+def search(X, y, families=None, folds=5, workers=None, max_latency_ms=None, max_size_mb=None):
+    """Run the search; returns (winner_result, all_results, model, scaler, held-out metrics)"""
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.15, random_state=42)
+
+    # Workers memory-map the training rows instead of receiving pickled copies
+    with tempfile.TemporaryDirectory() as tmp:
+        data_path = os.path.join(tmp, 'train.npy')
+        np.save(data_path, np.column_stack([X_train, y_train]).astype(np.float32))
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(cross_validate, data_path, family, params, folds)
+                for family, params in candidates(families)
+            ]
+            results = [future.result() for future in futures]
+
+    def within_budget(result):
+        if max_latency_ms is not None and result['single_latency_ms'] > max_latency_ms:
+            return False
+        if max_size_mb is not None and result['model_size_bytes'] > max_size_mb * 1e6:
+            return False
+        return True
+
+    # Benchmark sequentially so timings aren't skewed by the pool. Only the
+    # best in-budget refit is kept, so peak memory is about two models.
+    scaler = StandardScaler().fit(X_train)
+    X_train_scaled = scaler.transform(X_train)
+    best, model = None, None
+    for i, result in enumerate(results):
+        candidate = MODEL_FAMILIES[result['family']][0](**result['params']).fit(X_train_scaled, y_train)
+        result.update(benchmark_model(candidate, scaler, X_test))
+        print(
+            f"{result['family']:<24} CV R² {result['cv_r2']:.4f} ± {result['cv_r2_std']:.4f}  "
+            f"{result['single_latency_ms']:.3f} ms/event  "
+            f"{result['model_size_bytes'] / 1e6:.2f} MB  {result['params']}"
+        )
+        if within_budget(result) and (best is None or result['cv_r2'] > results[best]['cv_r2']):
+            best, model = i, candidate
+        del candidate
+
+    if best is None:
+        print("No candidate meets the latency/size budget, picking the best CV score")
+        best = max(range(len(results)), key=lambda i: results[i]['cv_r2'])
+        model = MODEL_FAMILIES[results[best]['family']][0](**results[best]['params']).fit(X_train_scaled, y_train)
+
+    y_pred = model.predict(scaler.transform(X_test))
+    holdout = {
+        'test_r2': float(r2_score(y_test, y_pred)),
+        'test_mse': float(mean_squared_error(y_test, y_pred))
+    }
+    return results[best], results, model, scaler, holdout
+
+
+def main():
+    """Tune on the cached feature matrix (or synthetic data) and save the winner"""
+    project_id = os.getenv('GOOGLE_CLOUD_PROJECT')
+    dataset_id = os.getenv('BIGQUERY_DATASET')
+    model_dir = os.getenv('MODEL_OUTPUT_DIR', './model')
+    cache = FeatureCache(os.getenv('FEATURE_CACHE_DIR', './feature_cache'))
+
+    try:
+        cache.update(load_training_batches(project_id, dataset_id, since=cache.watermark))
+    except Exception as e:
+        print(f"Error loading real data: {e}")
+
+    if cache.rows >= 100:
+        X, y = cache.matrix()
+    else:
+        print("Not enough real data, using synthetic data...")
+        df = create_synthetic_data()
+        X = df[FEATURE_NAMES].to_numpy(dtype=np.float32)
+        y = df['target'].to_numpy(dtype=np.float32)
+
+    families = [f for f in os.getenv('TUNING_FAMILIES', '').split(',') if f] or None
+    max_latency_ms = os.getenv('TUNING_MAX_LATENCY_MS')
+    max_size_mb = os.getenv('TUNING_MAX_SIZE_MB')
+
+    print(f"Searching over {sum(1 for _ in candidates(families))} candidates on {X.shape[0]} rows...")
+    winner, results, model, scaler, holdout = search(
+        X, y,
+        families=families,
+        folds=int(os.getenv('TUNING_CV_FOLDS', '5')),
+        workers=int(os.getenv('TUNING_WORKERS', '0')) or None,
+        max_latency_ms=float(max_latency_ms) if max_latency_ms else None,
+        max_size_mb=float(max_size_mb) if max_size_mb else None
+    )
+
+    print(f"Winner: {winner['family']} {winner['params']}")
+    print(f"Test MSE: {holdout['test_mse']:.4f}")
+    print(f"Test R²: {holdout['test_r2']:.4f}")
+
+    save_model(model, scaler, model_dir)
+    with open(os.path.join(model_dir, 'model_benchmark.json'), 'w') as f:
+        json.dump({**winner, **holdout, 'training_rows': int(X.shape[0])}, f, indent=2)
+    with open(os.path.join(model_dir, 'tuning_results.json'), 'w') as f:
+        json.dump(sorted(results, key=lambda r: -r['cv_r2']), f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""Columnar read path for disaster_events shared by the webapp and training
+
+Events are read as Arrow record batches, from BigQuery through the Storage
+Read API or from local Parquet files as an offline stand-in, and converted to
+compact dtypes: categoricals for the low-cardinality string columns and
+float32 for coordinates and scores.
+
+Filters are given as (column, op, value) tuples so both backends can apply
+them: '=', '>', '>=', '<', '<=', 'in' and 'not null'.
+"""
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+CATEGORY_COLUMNS = ['event_type', 'severity', 'source']
+FLOAT32_COLUMNS = ['latitude', 'longitude', 'magnitude', 'population_density', 'impact_score']
+
+_COMPARISONS = {'=': '=', '>': '>', '>=': '>=', '<': '<', '<=': '<='}
+
+
+def compact_batch(batch):
+    """Cast a record batch to the compact column types"""
+    arrays = []
+    fields = []
+    for field, array in zip(batch.schema, batch.columns):
+        if field.name in FLOAT32_COLUMNS and pa.types.is_floating(field.type):
+            array = array.cast(pa.float32())
+        elif field.name in CATEGORY_COLUMNS and (pa.types.is_string(field.type) or pa.types.is_large_string(field.type)):
+            array = array.dictionary_encode()
+        arrays.append(array)
+        fields.append(pa.field(field.name, array.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=pa.schema(fields))
+
+
+def compact_frame(df):
+    """Apply the compact dtypes to a pandas frame (e.g. after concatenating frames)"""
+    for column in CATEGORY_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype('category')
+    for column in FLOAT32_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype('float32')
+    return df
+
+
+def batches_to_frame(batches, columns=None):
+    """Collect record batches into a single compact pandas frame"""
+    batches = list(batches)
+    if not batches:
+        return pd.DataFrame(columns=columns or [])
+    table = pa.Table.from_batches(batches).unify_dictionaries()
+    return table.to_pandas()
+
+
+class BigQueryEventStore:
+    """Reads events through the BigQuery Storage Read API"""
+
+    def __init__(self, table, client=None, project=None):
+        from google.cloud import bigquery
+        self.table = table
+        self.client = client or bigquery.Client(project=project)
+        self._read_client = None
+
+    def iter_batches(self, columns, filters=None, order_by=None):
+        from google.cloud import bigquery
+        from google.cloud import bigquery_storage
+
+        clauses, params = [], []
+        for i, (column, op, value) in enumerate(filters or []):
+            name = f"p{i}"
+            if op == 'not null':
+                clauses.append(f"{column} IS NOT NULL")
+            elif op == 'in':
+                clauses.append(f"{column} IN UNNEST(@{name})")
+                params.append(bigquery.ArrayQueryParameter(name, _bq_type(value[0] if value else ''), list(value)))
+            elif op in _COMPARISONS:
+                clauses.append(f"{column} {_COMPARISONS[op]} @{name}")
+                params.append(bigquery.ScalarQueryParameter(name, _bq_type(value), value))
+            else:
+                raise ValueError(f"Unsupported filter operator: {op}")
+
+        query = f"SELECT {', '.join(columns)} FROM `{self.table}`"
+        if clauses:
+            query += f" WHERE {' AND '.join(clauses)}"
+        if order_by:
+            query += f" ORDER BY {order_by}"
+
+        if self._read_client is None:
+            self._read_client = bigquery_storage.BigQueryReadClient()
+
+        job = self.client.query(query, job_config=bigquery.QueryJobConfig(query_parameters=params))
+        for batch in job.result().to_arrow_iterable(bqstorage_client=self._read_client):
+            if batch.num_rows:
+                yield compact_batch(batch)
+
+    def read_frame(self, columns, filters=None, order_by=None):
+        return batches_to_frame(self.iter_batches(columns, filters, order_by), columns)
+
+
+class ParquetEventStore:
+    """Reads events from local Parquet files (a file or a directory of files)"""
+
+    def __init__(self, path, batch_size=65536):
+        self.path = path
+        self.batch_size = batch_size
+
+    def iter_batches(self, columns, filters=None, order_by=None):
+        import pyarrow.dataset as ds
+
+        expression = None
+        for column, op, value in filters or []:
+            field = pc.field(column)
+            if op == 'not null':
+                condition = field.is_valid()
+            elif op == 'in':
+                condition = field.isin(list(value))
+            elif op == '=':
+                condition = field == value
+            elif op == '>':
+                condition = field > value
+            elif op == '>=':
+                condition = field >= value
+            elif op == '<':
+                condition = field < value
+            elif op == '<=':
+                condition = field <= value
+            else:
+                raise ValueError(f"Unsupported filter operator: {op}")
+            expression = condition if expression is None else expression & condition
+
+        dataset = ds.dataset(self.path, format='parquet')
+        if order_by:
+            # Sorting needs the whole result; fine for the local stand-in
+            column, _, direction = order_by.partition(' ')
+            table = dataset.to_table(columns=columns, filter=expression).sort_by(
+                [(column, 'descending' if direction.strip().upper() == 'DESC' else 'ascending')]
+            )
+            batches = table.to_batches(max_chunksize=self.batch_size)
+        else:
+            batches = dataset.to_batches(columns=columns, filter=expression, batch_size=self.batch_size)
+
+        for batch in batches:
+            if batch.num_rows:
+                yield compact_batch(batch)
+
+    def read_frame(self, columns, filters=None, order_by=None):
+        return batches_to_frame(self.iter_batches(columns, filters, order_by), columns)
+
+
+def get_event_store(table, client=None, project=None):
+    """Event store selected by EVENT_STORE (bigquery or parquet) and EVENT_STORE_PATH"""
+    if os.getenv('EVENT_STORE', 'bigquery').lower() == 'parquet':
+        return ParquetEventStore(os.getenv('EVENT_STORE_PATH', 'disaster_events.parquet'))
+    return BigQueryEventStore(table, client=client, project=project)
+
+
+def _bq_type(value):
+    from datetime import datetime
+    if isinstance(value, bool):
+        return 'BOOL'
+    if isinstance(value, int):
+        return 'INT64'
+    if isinstance(value, float):
+        return 'FLOAT64'
+    if isinstance(value, datetime) or hasattr(value, 'to_pydatetime'):
+        return 'TIMESTAMP'
+    return 'STRING'
@@ -0,0 +1,139 @@
+"""Content-addressed storage for raw source payloads and the Pub/Sub message codec
+
+With offloading enabled, ingestion stores each event's raw source payload
+once under its SHA-256 digest, in a GCS bucket or a local directory as an
+offline stand-in. Only a 'sha256:<hex>' reference then travels in the
+message and the raw_data column. Readers resolve a reference lazily, e.g.
+when someone drills into a single event.
+
+Messages are JSON by default or zstd-compressed JSON. Decoders can tell
+them apart by the zstd frame magic, so no message attributes are needed.
+"""
+import hashlib
+import json
+import os
+
+REFERENCE_PREFIX = 'sha256:'
+
+# First bytes of every zstd frame; JSON messages start with '{'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+
+def serialize_payload(payload):
+    """Compact, key-sorted JSON bytes so equal payloads hash equally"""
+    return json.dumps(payload, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+def payload_digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def is_reference(raw_data):
+    return isinstance(raw_data, str) and raw_data.startswith(REFERENCE_PREFIX)
+
+
+class LocalPayloadStore:
+    """Payloads as files named by digest under a local directory"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, digest):
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def put(self, data):
+        """Store payload bytes if not already present and return their reference"""
+        digest = payload_digest(data)
+        path = self._path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return REFERENCE_PREFIX + digest
+
+    def get(self, reference):
+        with open(self._path(reference[len(REFERENCE_PREFIX):]), 'rb') as f:
+            return f.read()
+
+
+class GcsPayloadStore:
+    """Payloads as objects named by digest in a GCS bucket
+
+    Uploads are conditional on the object not existing yet, so re-storing a
+    known payload costs one rejected request and never rewrites the object.
+    """
+
+    def __init__(self, bucket, prefix='raw/', client=None):
+        self.bucket_name = bucket
+        self.prefix = prefix
+        self.client = client
+        self._bucket = None
+
+    def _blob(self, digest):
+        if self._bucket is None:
+            if self.client is None:
+                from google.cloud import storage
+                self.client = storage.Client()
+            self._bucket = self.client.bucket(self.bucket_name)
+        return self._bucket.blob(f"{self.prefix}{digest}")
+
+    def put(self, data):
+        """Store payload bytes if not already present and return their reference"""
+        from google.api_core.exceptions import PreconditionFailed
+
+        digest = payload_digest(data)
+        try:
+            self._blob(digest).upload_from_string(data, content_type='application/json', if_generation_match=0)
+        except PreconditionFailed:
+            pass
+        return REFERENCE_PREFIX + digest
+
+    def get(self, reference):
+        return self._blob(reference[len(REFERENCE_PREFIX):]).download_as_bytes()
+
+
+def get_payload_store():
+    """Payload store selected by RAW_DATA_STORE (inline, gcs or local); None for inline"""
+    backend = os.getenv('RAW_DATA_STORE', 'inline')
+    if backend == 'gcs':
+        return GcsPayloadStore(os.getenv('RAW_DATA_BUCKET'), prefix=os.getenv('RAW_DATA_PREFIX', 'raw/'))
+    if backend == 'local':
+        return LocalPayloadStore(os.getenv('RAW_DATA_PATH', '/tmp/raw_payloads'))
+    return None
+
+
+def resolve_raw_data(raw_data, store=None):
+    """Return the raw payload as a dict, fetching it from `store` if it is a reference"""
+    if raw_data is None:
+        return None
+    if is_reference(raw_data):
+        if store is None:
+            raise ValueError(f"No payload store configured to resolve {raw_data}")
+        raw_data = store.get(raw_data)
+    return json.loads(raw_data)
+
+
+def encode_message(event, encoding='json', level=3):
+    """Serialize an event for Pub/Sub as JSON or zstd-compressed JSON"""
+    data = json.dumps(event, separators=(',', ':')).encode('utf-8')
+    if encoding == 'zstd':
+        import zstandard
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    return data
+
+
+def decode_message(data, decompressor=None, loads=json.loads):
+    """Inverse of encode_message for either encoding
+
+    Hot paths can pass a reusable zstandard.ZstdDecompressor and a faster
+    `loads` such as orjson.loads.
+    """
+    if data[:4] == ZSTD_MAGIC:
+        if decompressor is None:
+            import zstandard
+            decompressor = zstandard.ZstdDecompressor()
+        data = decompressor.decompress(data)
+    return loads(data)
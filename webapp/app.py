@@ -1,12 +1,21 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from google.cloud import bigquery
 import os
-from datetime import datetime, timedelta
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
 import json
 
+# shared/ modules are copied next to app.py in the image; locally they sit in ../shared
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'shared'))
+import event_store
+import raw_payloads
+
 # Page configuration
 st.set_page_config(
     page_title="Disaster Monitor",
@@ -20,54 +29,282 @@ st.set_page_config(
 def get_bq_client():
     return bigquery.Client(project=os.getenv('GOOGLE_CLOUD_PROJECT'))
 
-def load_disaster_data(hours=24):
-    """Load disaster events from BigQuery"""
+# Longest window the dashboard offers; the shared cache always holds this much
+MAX_HOURS = 168
+
+# Above this many events the map renders aggregated grid cells instead of points
+MAP_MAX_POINTS = int(os.getenv('MAP_MAX_POINTS', '2000'))
+
+EVENT_COLUMNS = [
+    'event_id', 'event_type', 'title', 'description', 'latitude', 'longitude', 'address',
+    'magnitude', 'severity', 'event_time', 'detected_time', 'source', 'population_density',
+    'impact_score'
+]
+
+@st.cache_resource
+def get_event_store():
+    table = f"{os.getenv('GOOGLE_CLOUD_PROJECT')}.{os.getenv('BIGQUERY_DATASET')}.{os.getenv('BIGQUERY_TABLE_EVENTS')}"
+    return event_store.get_event_store(table, project=os.getenv('GOOGLE_CLOUD_PROJECT'))
+
+def load_disaster_data(hours=24, since=None):
+    """Load disaster events through the columnar event store
+    
+    The time window is applied in SQL so the partitioned table only scans
+    the partitions it needs. When `since` is given only rows detected after
+    it are fetched. Rows arrive as Arrow record batches with compact dtypes.
+    Errors propagate so the caller can keep what it already has.
+    """
+    if since is not None:
+        filters = [('detected_time', '>', since)]
+    else:
+        filters = [('detected_time', '>=', datetime.now(timezone.utc) - timedelta(hours=hours))]
+    
+    return get_event_store().read_frame(EVENT_COLUMNS, filters, order_by='detected_time DESC')
+
+@st.cache_resource
+def get_payload_store():
+    return raw_payloads.get_payload_store()
+
+@st.cache_data(ttl=3600, max_entries=256)
+def load_raw_payload(event_id, detected_time):
+    """Fetch one event's raw source payload on demand
+    
+    raw_data is left out of the cached frame; it is read for a single event
+    and resolved through the payload store when it holds a digest reference.
+    A day either side of the event's detected_time bounds the scan to a few
+    partitions.
+    """
+    detected_time = pd.Timestamp(detected_time)
+    frame = get_event_store().read_frame(['raw_data'], [
+        ('event_id', '=', event_id),
+        ('detected_time', '>=', detected_time - pd.Timedelta(days=1)),
+        ('detected_time', '<=', detected_time + pd.Timedelta(days=1))
+    ])
+    if frame.empty:
+        return None
+    return raw_payloads.resolve_raw_data(frame['raw_data'].iloc[0], get_payload_store())
+
+class EventFrameCache:
+    """Server-side frame of the last MAX_HOURS of events shared by all sessions
+    
+    After the initial load, each refresh only fetches rows detected after the
+    cached high-water mark (minus a small overlap for late-arriving rows) and
+    appends them, keeping the latest row per event_id. Rows that land later
+    than the overlap (pipeline lag, backfills of older ranges) are picked up
+    by a full reload every `full_reload_seconds`. A load that fails keeps
+    the previous frame.
+    """
+    
+    def __init__(self, max_hours=MAX_HOURS, ttl_seconds=60, overlap_seconds=300, full_reload_seconds=900):
+        self.max_hours = max_hours
+        self.ttl_seconds = ttl_seconds
+        self.overlap = timedelta(seconds=overlap_seconds)
+        self.full_reload_seconds = full_reload_seconds
+        self.frame = None
+        self.loaded_at = 0
+        self.fully_loaded_at = 0
+        self._lock = threading.Lock()
+    
+    def get(self):
+        with self._lock:
+            if self.frame is None or time.time() - self.loaded_at >= self.ttl_seconds:
+                self.refresh()
+            return self.frame
+    
+    def refresh(self):
+        now = time.time()
+        # A failed load keeps the previous frame for every session; it is retried after the TTL
+        self.loaded_at = now
+        try:
+            if self.frame is None or self.frame.empty or now - self.fully_loaded_at >= self.full_reload_seconds:
+                frame = load_disaster_data(self.max_hours)
+                self.fully_loaded_at = now
+            else:
+                new_rows = load_disaster_data(since=self.frame['detected_time'].max() - self.overlap)
+                frame = event_store.compact_frame(pd.concat([new_rows, self.frame], ignore_index=True))
+        except Exception as e:
+            st.error(f"Error loading data, showing the last loaded events: {e}")
+            if self.frame is None:
+                self.frame = pd.DataFrame()
+            return
+        
+        if not frame.empty:
+            cutoff = pd.Timestamp.now(tz='UTC') - pd.Timedelta(hours=self.max_hours)
+            frame = frame[frame['detected_time'] >= cutoff]
+            frame = (
+                frame
+                .sort_values('detected_time', ascending=False)
+                .drop_duplicates('event_id', keep='first')
+                .reset_index(drop=True)
+            )
+        
+        self.frame = frame
+
+@st.cache_resource
+def get_event_cache():
+    return EventFrameCache(
+        ttl_seconds=int(os.getenv('DASHBOARD_CACHE_TTL_SECONDS', '60')),
+        full_reload_seconds=int(os.getenv('DASHBOARD_FULL_RELOAD_SECONDS', '900'))
+    )
+
+@st.cache_data(ttl=int(os.getenv('DASHBOARD_CACHE_TTL_SECONDS', '60')))
+def load_rollups(hours=MAX_HOURS):
+    """Load the current hourly rollup rows maintained by the pipeline"""
     client = get_bq_client()
     
     query = f"""
     SELECT 
-        event_id,
+        hour,
         event_type,
-        title,
-        description,
-        latitude,
-        longitude,
-        address,
-        magnitude,
         severity,
-        event_time,
-        detected_time,
-        source,
-        population_density,
-        impact_score
-    FROM `{os.getenv('GOOGLE_CLOUD_PROJECT')}.{os.getenv('BIGQUERY_DATASET')}.{os.getenv('BIGQUERY_TABLE_EVENTS')}`
-    WHERE detected_time >= TIMESTAMP_SUB(CURRENT_TIMESTAMP(), INTERVAL {hours} HOUR)
-    ORDER BY detected_time DESC
+        event_count,
+        scored_count,
+        impact_score_sum,
+        impact_score_max
+    FROM `{os.getenv('GOOGLE_CLOUD_PROJECT')}.{os.getenv('BIGQUERY_DATASET')}.{os.getenv('BIGQUERY_TABLE_ROLLUPS', 'disaster_event_rollups')}`
+    WHERE hour >= TIMESTAMP_TRUNC(TIMESTAMP_SUB(CURRENT_TIMESTAMP(), INTERVAL @hours HOUR), HOUR)
+    QUALIFY ROW_NUMBER() OVER (PARTITION BY hour, event_type, severity ORDER BY computed_at DESC) = 1
     """
     
     try:
-        df = client.query(query).to_dataframe()
-        return df
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[bigquery.ScalarQueryParameter('hours', 'INT64', hours)]
+        )
+        return client.query(query, job_config=job_config).to_dataframe()
     except Exception as e:
-        st.error(f"Error loading data: {e}")
+        st.warning(f"Rollups unavailable, computing hourly activity from cached events: {e}")
         return pd.DataFrame()
 
-def create_map(df):
-    """Create an interactive map of disaster events"""
+@st.cache_data(ttl=int(os.getenv('DASHBOARD_CACHE_TTL_SECONDS', '60')))
+def load_tracks(hours=MAX_HOURS):
+    """Load track points appended by the pipeline for events with a path"""
+    client = get_bq_client()
+    
+    query = f"""
+    SELECT 
+        event_id,
+        point_index,
+        point_time,
+        latitude,
+        longitude
+    FROM `{os.getenv('GOOGLE_CLOUD_PROJECT')}.{os.getenv('BIGQUERY_DATASET')}.{os.getenv('BIGQUERY_TABLE_TRACKS', 'disaster_event_tracks')}`
+    WHERE event_id IN (
+        SELECT event_id
+        FROM `{os.getenv('GOOGLE_CLOUD_PROJECT')}.{os.getenv('BIGQUERY_DATASET')}.{os.getenv('BIGQUERY_TABLE_TRACKS', 'disaster_event_tracks')}`
+        WHERE point_time >= TIMESTAMP_SUB(CURRENT_TIMESTAMP(), INTERVAL @hours HOUR)
+    )
+    QUALIFY ROW_NUMBER() OVER (PARTITION BY event_id, point_index ORDER BY point_time) = 1
+    ORDER BY event_id, point_index
+    """
+    
+    try:
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[bigquery.ScalarQueryParameter('hours', 'INT64', hours)]
+        )
+        return client.query(query, job_config=job_config).to_dataframe()
+    except Exception as e:
+        st.warning(f"Event tracks unavailable: {e}")
+        return pd.DataFrame()
+
+def filter_events(df, hours, event_types=None, severities=None):
+    """Slice the cached frame to the selected window and filters"""
+    if df.empty:
+        return df
+    
+    df = df[df['detected_time'] >= pd.Timestamp.now(tz='UTC') - pd.Timedelta(hours=hours)]
+    if event_types:
+        df = df[df['event_type'].isin(event_types)]
+    if severities:
+        df = df[df['severity'].isin(severities)]
+    return df
+
+def aggregate_cells(df, zoom=2, max_cells=MAP_MAX_POINTS):
+    """Bin events into lat/lng grid cells sized for the map zoom level
+    
+    Cells start at roughly 16 screen pixels for the given zoom and are
+    coarsened until there are at most max_cells of them. Each cell reports
+    its event count, max impact score and the centroid of its events.
+    """
+    lat = df['latitude'].to_numpy(dtype=np.float64)
+    lng = df['longitude'].to_numpy(dtype=np.float64)
+    impact = df['impact_score'].to_numpy(dtype=np.float64, na_value=np.nan)
+    
+    cell_deg = 22.5 / 2 ** zoom
+    while True:
+        rows = np.floor((lat + 90) / cell_deg).astype(np.int64)
+        cols = np.floor((lng + 180) / cell_deg).astype(np.int64)
+        keys = rows * (int(360 / cell_deg) + 1) + cols
+        cells, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+        if len(cells) <= max_cells:
+            break
+        cell_deg *= 2
+    
+    max_impact = np.full(len(cells), -np.inf)
+    np.maximum.at(max_impact, inverse, np.where(np.isnan(impact), -np.inf, impact))
+    max_impact[np.isinf(max_impact)] = np.nan
+    
+    return pd.DataFrame({
+        'latitude': np.bincount(inverse, weights=lat) / counts,
+        'longitude': np.bincount(inverse, weights=lng) / counts,
+        'event_count': counts,
+        'max_impact_score': max_impact
+    })
+
+def add_tracks(fig, df, tracks):
+    """Draw the paths of events in `df` that have more than one track point
+    
+    All paths go into a single line trace, separated by gaps, so the map
+    gets one trace no matter how many events are moving.
+    """
+    tracks = tracks[tracks['event_id'].isin(df['event_id'])]
+    if tracks.empty:
+        return
+    
+    lats, lngs = [], []
+    for _, points in tracks.groupby('event_id', sort=False):
+        if len(points) < 2:
+            continue
+        lats.extend(points['latitude'].tolist() + [None])
+        lngs.extend(points['longitude'].tolist() + [None])
+    if lats:
+        fig.add_trace(go.Scattermapbox(lat=lats, lon=lngs, mode='lines', name='Tracks', hoverinfo='skip'))
+
+def create_map(df, zoom=2, tracks=None):
+    """Create an interactive map of disaster events
+    
+    Large result sets are drawn as aggregated cells so the payload sent to
+    the browser stays bounded regardless of data volume. Events with a
+    track are drawn at their latest position with their path.
+    """
     if df.empty:
         return None
     
-    fig = px.scatter_mapbox(
-        df,
-        lat='latitude',
-        lon='longitude',
-        color='event_type',
-        size='impact_score',
-        hover_name='title',
-        hover_data=['severity', 'magnitude', 'address', 'impact_score'],
-        zoom=2,
-        title="Real-time Disaster Events"
-    )
+    if len(df) > MAP_MAX_POINTS:
+        cells = aggregate_cells(df, zoom)
+        fig = px.scatter_mapbox(
+            cells,
+            lat='latitude',
+            lon='longitude',
+            color='max_impact_score',
+            size='event_count',
+            hover_data=['event_count', 'max_impact_score'],
+            zoom=zoom,
+            title=f"Real-time Disaster Events ({len(df)} events in {len(cells)} areas)"
+        )
+    else:
+        fig = px.scatter_mapbox(
+            df,
+            lat='latitude',
+            lon='longitude',
+            color='event_type',
+            size='impact_score',
+            hover_name='title',
+            hover_data=['severity', 'magnitude', 'address', 'impact_score'],
+            zoom=zoom,
+            title="Real-time Disaster Events"
+        )
+        if tracks is not None and not tracks.empty:
+            add_tracks(fig, df, tracks)
     
     fig.update_layout(
         mapbox_style="open-street-map",
@@ -109,11 +346,41 @@ def create_summary_stats(df):
         'severity_distribution': df['severity'].value_counts().to_dict(),
         'avg_impact_score': df['impact_score'].mean(),
         'max_impact_score': df['impact_score'].max(),
-        'recent_events': len(df[df['detected_time'] >= datetime.now() - timedelta(hours=1)])
+        'recent_events': len(df[df['detected_time'] >= pd.Timestamp.now(tz='UTC') - pd.Timedelta(hours=1)])
     }
     
     return stats
 
+def create_hourly_chart(rollups, df, hours, event_types=None, severities=None):
+    """Events detected per hour by type, from the pipeline's hourly rollups
+    
+    An event revised in several hours counts once in each of them, so this
+    shows activity per hour; totals come from the deduplicated frame. Without
+    rollups, events are counted in the hour of their latest detection.
+    """
+    cutoff = (pd.Timestamp.now(tz='UTC') - pd.Timedelta(hours=hours)).floor('h')
+    if not rollups.empty:
+        rollups = rollups[rollups['hour'] >= cutoff]
+        if event_types:
+            rollups = rollups[rollups['event_type'].isin(event_types)]
+        if severities:
+            rollups = rollups[rollups['severity'].isin(severities)]
+    if rollups.empty:
+        if df.empty:
+            return None
+        rollups = df.assign(hour=df['detected_time'].dt.floor('h'), event_count=1)
+    
+    hourly = rollups.groupby(['hour', 'event_type'], as_index=False)['event_count'].sum()
+    fig = px.bar(
+        hourly,
+        x='hour',
+        y='event_count',
+        color='event_type',
+        title="Events Detected per Hour"
+    )
+    fig.update_layout(height=400)
+    return fig
+
 def main():
     st.title("🌍 Real-Time Disaster Monitor")
     st.markdown("Live monitoring of natural disasters and their impact assessment")
@@ -124,7 +391,7 @@ def main():
     hours = st.sidebar.slider(
         "Time Range (hours)",
         min_value=1,
-        max_value=168,  # 1 week
+        max_value=MAX_HOURS,  # 1 week
         value=24,
         step=1
     )
@@ -143,20 +410,13 @@ def main():
     
     # Load data
     with st.spinner("Loading disaster data..."):
-        df = load_disaster_data(hours)
+        df = filter_events(get_event_cache().get(), hours, event_types, severity_filter)
     
     if df.empty:
         st.warning("No disaster events found in the selected time range.")
         return
     
-    # Apply filters
-    if event_types:
-        df = df[df['event_type'].isin(event_types)]
-    
-    if severity_filter:
-        df = df[df['severity'].isin(severity_filter)]
-    
-    # Summary statistics
+    # Summary statistics from the frame, which holds one row per event
     stats = create_summary_stats(df)
     
     # Display summary metrics
@@ -179,7 +439,8 @@ def main():
     
     with tab1:
         st.subheader("Geographic Distribution")
-        map_fig = create_map(df)
+        map_zoom = st.slider("Map detail (zoom level)", min_value=1, max_value=10, value=2)
+        map_fig = create_map(df, map_zoom, load_tracks(hours))
         if map_fig:
             st.plotly_chart(map_fig, use_container_width=True)
         else:
@@ -192,6 +453,10 @@ def main():
             st.plotly_chart(timeline_fig, use_container_width=True)
         else:
             st.info("No data to display in timeline")
+        
+        hourly_fig = create_hourly_chart(load_rollups(), df, hours, event_types, severity_filter)
+        if hourly_fig:
+            st.plotly_chart(hourly_fig, use_container_width=True)
     
     with tab3:
         st.subheader("Event Details")
@@ -221,6 +486,24 @@ def main():
                 use_container_width=True,
                 hide_index=True
             )
+            
+            # Raw source data is only fetched for the event being inspected
+            titles = dict(zip(df_filtered['event_id'].head(1000), df_filtered['title'].head(1000)))
+            detected_times = dict(zip(df_filtered['event_id'].head(1000), df_filtered['detected_time'].head(1000)))
+            selected = st.selectbox(
+                "Inspect raw source data",
+                [None] + list(titles),
+                format_func=lambda event_id: "Select an event" if event_id is None else titles[event_id]
+            )
+            if selected is not None:
+                try:
+                    payload = load_raw_payload(selected, detected_times[selected])
+                    if payload is None:
+                        st.info("No raw data stored for this event")
+                    else:
+                        st.json(payload)
+                except Exception as e:
+                    st.error(f"Error loading raw data: {e}")
         else:
             st.info("No events match the search criteria")
     